@@ -1,44 +1,34 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import requests
 import json
-from datetime import datetime, timedelta
+import os
+from datetime import datetime, timedelta, timezone
+import dashboard_data
+import downsample
+import exp_table
+import metrics
+import targets
 
 # 페이지 기본 설정
 st.set_page_config(page_title="메이플 랭커 경험치 추적기", layout="wide")
 
 # ==========================================
-# [설정] 깃허브 정보
+# [설정] 깃허브 정보 (targets.json 의 "github", 환경변수 GITHUB_OWNER / GITHUB_REPO / GITHUB_BRANCH 로 변경)
 # ==========================================
-GITHUB_OWNER = "djhfkgsk"
-GITHUB_REPO = "maple-exp-tracker"
-WORKFLOW_FILE = "main.yml" 
+GITHUB = targets.github_settings()
+# 로컬 개발 시 HISTORY_URL=./history 처럼 디렉터리를 지정할 수도 있음
+HISTORY_URL = os.environ.get("HISTORY_URL", f"https://raw.githubusercontent.com/{GITHUB['owner']}/{GITHUB['repo']}/{GITHUB['branch']}/history")
+# 조회 API 서버(history_api.py) 주소. 설정하면 저장소 파일을 직접 읽지 않고 필요한 행만 API 로 받아옴
+HISTORY_API_URL = os.environ.get("HISTORY_API_URL")
 
-# ==========================================
-# [핵심] 경험치 테이블
-# ==========================================
-LEVEL_BASE_EXP = {
-    275: 57545329506825,
-    276: 68922440762335,
-    277: 81437263143396,
-    278: 95203567762563,
-    279: 110346502843647,
-    280: 127003731431838, # 목표 지점 (280레벨 0%)
-    281: 143660960021029
-}
-
-LEVEL_REQ_EXP = {
-    275: 11377111255510,
-    276: 12514822381061,
-    277: 13766304619167,
-    278: 15142935081083,
-    279: 16657228589191,
-    280: 18322951448110,
-}
-
-# 280레벨 달성 기준 총 경험치
-TARGET_EXP_280 = LEVEL_BASE_EXP[280]
+# 조회 기간 (일). 선택한 기간에 걸치는 파티션 파일만 내려받음
+LOAD_WINDOW_OPTIONS = {"최근 1일": 1, "최근 3일": 3, "최근 7일": 7, "최근 30일": 30, "전체": None}
+
+# 경험치 테이블은 exp_table.py, 데이터 로딩은 dashboard_data.py 참고
+DEFAULT_TARGET_LEVEL = 280
+
+# 현황표 범위 (None = 추적 중인 전체 캐릭터)
+TABLE_SCOPE_OPTIONS = {"Top 15": 15, "Top 50": 50, "전체": None}
 
 # 제목
 st.title("🍁 챌린저스 월드 경험치 추이 대시보드")
@@ -49,42 +39,151 @@ st.title("🍁 챌린저스 월드 경험치 추이 대시보드")
 st.sidebar.header("🕹️ 데이터 업데이트")
 
 def trigger_github_action():
-    url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/actions/workflows/{WORKFLOW_FILE}/dispatches"
+    import requests # 수집 요청 버튼을 누를 때만 필요
+    url = f"https://api.github.com/repos/{GITHUB['owner']}/{GITHUB['repo']}/actions/workflows/{GITHUB['workflow']}/dispatches"
     headers = {
         "Accept": "application/vnd.github.v3+json",
         "Authorization": f"token {st.secrets['GITHUB_TOKEN']}"
     }
-    data = {"ref": "master"}
+    data = {"ref": GITHUB['branch']}
     response = requests.post(url, headers=headers, data=json.dumps(data))
     return response.status_code
 
-@st.cache_data(ttl=60) 
-def load_data():
-    url = f"https://raw.githubusercontent.com/{GITHUB_OWNER}/{GITHUB_REPO}/master/exp_history.csv"
+@st.cache_resource
+def get_loader(days):
+    # 세션끼리 공유되는 증분 로더 (60초마다 매니페스트만 확인하고 새 파일만 추가로 읽음)
+    return dashboard_data.IncrementalLoader(HISTORY_URL, days, min_interval_sec=60)
+
+def load_data(days=None):
     try:
-        df = pd.read_csv(url)
-        df['timestamp'] = pd.to_datetime(df['timestamp']) + timedelta(hours=9) # KST 변환
-        
-        def process_user_data(row):
-            base = LEVEL_BASE_EXP.get(row['level'], 0)
-            req = LEVEL_REQ_EXP.get(row['level'], 1)
-            total_exp = base + row['exp']
-            percent = (row['exp'] / req) * 100
-            return pd.Series([total_exp, percent])
-        
-        df[['total_exp', 'exp_percent']] = df.apply(process_user_data, axis=1)
-        df['exp_percent_str'] = df['exp_percent'].map('{:.3f}%'.format)
-        
-        return df
-    except:
+        return get_loader(days).refresh()
+    except Exception:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_rollup(resolution, days=None):
+    # 긴 구간 그래프용 시간/일 롤업 (수집 주기보다 길게 캐시할 필요 없음)
+    try:
+        return dashboard_data.load_rollup(HISTORY_URL, resolution, days)
+    except Exception:
         return pd.DataFrame()
 
-df = load_data()
+@st.cache_data(ttl=600, show_spinner=False)
+def load_raw_days():
+    # 보관 정책이 원본을 남겨 두는 기간 (retention.json, 아직 적용 전이면 None)
+    return dashboard_data.load_raw_days(HISTORY_URL)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_run_metrics():
+    # 수집기 실행 보고서 (수집 1회 = 1행)
+    try:
+        if HISTORY_API_URL:
+            return get_api().run_metrics()
+        return dashboard_data.load_run_metrics(HISTORY_URL)
+    except Exception:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_analytics():
+    # 순위 분석 배치 결과 (rank_analytics.py 가 매시 갱신). 화면에서는 읽기만 함
+    try:
+        return dashboard_data.load_analytics(HISTORY_URL)
+    except Exception:
+        return None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_cohorts():
+    # 추적 그룹 이름 -> 구성원 (targets.json 으로 설정, 수집기가 history/cohorts.json 에 기록)
+    try:
+        if HISTORY_API_URL:
+            return get_api().cohorts()
+        return dashboard_data.load_cohorts(HISTORY_URL)
+    except Exception:
+        return {}
+
+# ---- 조회 API 모드 (HISTORY_API_URL). 무거운 계산/캐시는 서버가 하므로 여기서는 짧게만 캐시 ----
+@st.cache_resource
+def get_api():
+    return dashboard_data.HistoryApiClient(HISTORY_API_URL)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def api_leaderboard(cohort=None):
+    try:
+        return get_api().leaderboard(cohort)
+    except Exception:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def api_series(nicknames, days=None, resolution=None):
+    try:
+        return get_api().series(nicknames, days, resolution)
+    except Exception:
+        return pd.DataFrame(columns=dashboard_data.SERIES_COLUMNS)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def api_character_metrics(data_key, target_level, days, start_time, end_time, top, cohort=None):
+    try:
+        return get_api().character_metrics(target_level, days, start_time, end_time, top, cohort)
+    except Exception:
+        return pd.DataFrame()
+
+def load_series(nicknames, days=None):
+    # 선택한 캐릭터의 원본 스냅샷 행 (원본 보관 기간 이전은 롤업 행)
+    if HISTORY_API_URL:
+        return with_older_rollups(api_series(tuple(nicknames), days), days, nicknames)
+    return history_df[history_df['nickname'].isin(nicknames)]
+
+def load_chart_rollup(resolution, days, nicknames=None):
+    # 선택한 캐릭터(None = 전체)의 시간/일 롤업 행
+    if HISTORY_API_URL:
+        return api_series(tuple(nicknames), days, resolution)
+    chart_df = load_rollup(resolution, days)
+    return chart_df[chart_df['nickname'].isin(nicknames)] if nicknames is not None and not chart_df.empty else chart_df
+
+def with_older_rollups(frame, days, nicknames=None):
+    # 조회 기간이 원본 보관 기간(raw_days)보다 길면 원본이 없는 앞 구간을 시간 -> 일 롤업 행으로 채움
+    raw_days = load_raw_days()
+    if raw_days is None or (days is not None and days <= raw_days):
+        return frame
+    daily = load_chart_rollup("daily", days, nicknames)
+    hourly = dashboard_data.extend_with_rollup(load_chart_rollup("hourly", days, nicknames), daily)
+    return dashboard_data.extend_with_rollup(frame, hourly)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_history(_df, data_key, days):
+    # 표 / 그래프가 쓰는 전체 구간 프레임 (원본 + 그 이전 롤업). 데이터가 바뀔 때만 다시 붙임
+    return with_older_rollups(_df, days)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_character_metrics(_df, _ranks, data_key, cohort, start_time, end_time, target_level, nicknames):
+    # (데이터 버전, 그룹, 구간, 목표 레벨, 대상 캐릭터) 별로 캐시 -> 슬라이더를 되돌리면 재계산 없음
+    return metrics.compute_character_metrics(
+        _df, start_time, end_time, exp_table.target_total_exp(target_level), _ranks, list(nicknames)
+    )
+
+load_window = st.sidebar.selectbox("조회 기간", list(LOAD_WINDOW_OPTIONS), index=2)
+load_days = LOAD_WINDOW_OPTIONS[load_window]
+# 추적 그룹 (월드 랭킹 / 관심 목록 / 길드). 그룹을 고르면 순위는 그룹 안에서 다시 매김
+cohorts = load_cohorts()
+cohort = st.sidebar.selectbox("👥 추적 그룹", ["전체"] + list(cohorts)) if len(cohorts) > 1 else "전체"
+cohort = None if cohort == "전체" else cohort
+if HISTORY_API_URL: # 순위표만 받아오고 시계열은 선택한 캐릭터 것만 나중에 요청
+    df = history_df = None
+    board = api_leaderboard(cohort)
+    ranks = pd.Series(board['rank'].to_numpy(), index=board['nickname'].to_numpy(), name='rank') if not board.empty else None
+    last_update = board['timestamp'].max() if not board.empty else None
+else:
+    df = load_data(load_days)
+    ranks = metrics.latest_ranking(df) if not df.empty else None
+    if ranks is not None and cohort:
+        ranks = dashboard_data.cohort_ranks(ranks, cohorts[cohort])
+        ranks = ranks if not ranks.empty else None
+    last_update = df['timestamp'].max() if not df.empty else None
+    history_df = get_history(df, (len(df), last_update), load_days) if not df.empty else df
 
 # 쿨타임 로직
-if not df.empty:
-    last_update = df['timestamp'].max()
-    current_time_kst = datetime.now() + timedelta(hours=9)
+if last_update is not None:
+    current_time_kst = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=9)
     time_diff = current_time_kst - last_update
     
     if time_diff < timedelta(minutes=15):
@@ -107,37 +206,42 @@ if not df.empty:
 
 st.write("30분 간격으로 수집된 랭커들의 경험치 변화를 보여줍니다.")
 
-if df.empty:
+if ranks is None:
     st.warning("아직 수집된 데이터가 없습니다.")
 else:
-    # 1. 랭킹 산정 (Top 15 기준)
-    latest_time = df['timestamp'].max()
-    latest_ranking_df = df[df['timestamp'] == latest_time].sort_values(by='total_exp', ascending=False)
-    
-    rank_map = {row['nickname']: i+1 for i, row in enumerate(latest_ranking_df.to_dict('records'))}
-    top_15_df = latest_ranking_df.head(15)
-    top_15_nicknames = top_15_df['nickname'].tolist()
-    
-    st.subheader(f"🏆 현재 Top 15 랭커 현황")
+    # 1. 랭킹 산정 (가장 최근 스냅샷 기준)
+    rank_map = ranks.to_dict()
+    data_key = (0 if history_df is None else len(history_df), last_update) # 데이터가 바뀌면 집계 캐시도 새로 계산
     
     # 사이드바
     st.sidebar.header("검색 옵션")
+    scope_label = st.sidebar.selectbox("📊 표에 표시할 범위", list(TABLE_SCOPE_OPTIONS))
+    scope_size = TABLE_SCOPE_OPTIONS[scope_label]
+    scope_nicknames = ranks.index[:scope_size].tolist() if scope_size else ranks.index.tolist()
+    
+    st.subheader(f"🏆 현재 {scope_label} 랭커 현황")
+    
     def format_func(nickname):
         rank = rank_map.get(nickname, 999)
         return f"{rank}위 {nickname}"
 
     selected_users = st.sidebar.multiselect(
-        "확인할 유저를 선택하세요 (Top 15 한정)",
-        top_15_nicknames, 
-        default=top_15_nicknames[:15],
+        "그래프로 확인할 유저를 선택하세요",
+        scope_nicknames, 
+        default=scope_nicknames[:15],
         format_func=format_func
     )
 
+    # 목표 레벨 (기본 280). 누적 경험치 테이블에서 바로 목표 경험치를 꺼냄
+    target_level = int(st.sidebar.number_input(
+        "🏁 목표 레벨", min_value=exp_table.EXACT_MIN_LEVEL + 1, max_value=exp_table.EXACT_MAX_LEVEL + 1,
+        value=DEFAULT_TARGET_LEVEL, step=1
+    ))
+    target_exp = exp_table.target_total_exp(target_level)
+    target_col = f"🏁 {target_level}까지"
+
     if selected_users:
-        user_filtered_df = df[df['nickname'].isin(selected_users)].copy()
-        user_filtered_df['display_name'] = user_filtered_df.apply(
-            lambda x: f"{rank_map.get(x['nickname'], 999)}위 {x['nickname']}", axis=1
-        )
+        user_filtered_df = load_series(selected_users, load_days)
 
         st.divider()
         st.subheader("⏳ 분석 구간 설정")
@@ -159,140 +263,72 @@ else:
             st.caption(f"선택 구간: {start_time.strftime('%m/%d %H:%M')} ~ {end_time.strftime('%m/%d %H:%M')}")
         
         # -------------------------------------------------------
-        # Top 15 전체 백그라운드 속도 & 280 달성 예측
+        # 표 범위 전체의 속도 & 목표 레벨 달성 & 역전 예측 (groupby 한 번, 구간/대상별 캐시)
         # -------------------------------------------------------
-        top_15_all_data = df[
-            (df['nickname'].isin(top_15_nicknames)) &
-            (df['timestamp'] >= start_time) &
-            (df['timestamp'] <= end_time)
-        ].copy()
-
-        user_metrics = {} 
-        
-        for nick in top_15_nicknames:
-            u_data = top_15_all_data[top_15_all_data['nickname'] == nick].sort_values('timestamp')
-            if len(u_data) < 2:
-                continue
-            
-            s_row = u_data.iloc[0]
-            e_row = u_data.iloc[-1]
-            
-            hours = (e_row['timestamp'] - s_row['timestamp']).total_seconds() / 3600
-            if hours == 0: hours = 0.001
-            
-            exp_diff = e_row['total_exp'] - s_row['total_exp']
-            speed = exp_diff / hours
-            
-            # [신규 기능] 280까지 남은 시간 계산
-            if e_row['total_exp'] >= TARGET_EXP_280:
-                time_to_280_str = "🎉 달성 완료!"
-            elif speed <= 0:
-                time_to_280_str = "측정 불가 (멈춤)"
-            else:
-                remaining = TARGET_EXP_280 - e_row['total_exp']
-                hours_left = remaining / speed
-                
-                days_280 = int(hours_left // 24)
-                rem_hours_280 = int(hours_left % 24)
-                
-                if days_280 > 999: # 너무 오래 걸리면
-                    time_to_280_str = "측정 불가 (너무 느림)"
-                else:
-                    time_to_280_str = f"D-{days_280}일 {rem_hours_280}시간"
-
-            user_metrics[nick] = {
-                'nickname': nick,
-                'rank': rank_map.get(nick, 999),
-                'current_total_exp': e_row['total_exp'],
-                'speed': speed,
-                'level_info': f"{e_row['level']} ({e_row['exp_percent_str']})",
-                'gained_exp': exp_diff,
-                'time_to_280': time_to_280_str # 결과 저장
-            }
-
-        sorted_metrics = sorted(user_metrics.values(), key=lambda x: x['rank'])
-        overtake_info = {} 
-        
-        for i in range(1, len(sorted_metrics)):
-            me = sorted_metrics[i]
-            target = sorted_metrics[i-1]
-            gap = target['current_total_exp'] - me['current_total_exp']
-            speed_gap = me['speed'] - target['speed']
-            
-            msg = "-"
-            target_name = f"{target['rank']}위 {target['nickname']}"
-            
-            if gap <= 0:
-                msg = "이미 역전함"
-            elif speed_gap <= 0:
-                msg = "추월 불가 (느림)"
-            else:
-                hours_needed = gap / speed_gap
-                days = int(hours_needed // 24)
-                rem_hours = int(hours_needed % 24)
-                mins = int((hours_needed * 60) % 60)
-                
-                time_str = []
-                if days > 0: time_str.append(f"{days}일")
-                if rem_hours > 0: time_str.append(f"{rem_hours}시간")
-                time_str.append(f"{mins}분")
-                msg = " ".join(time_str) + " 후"
-            
-            overtake_info[me['nickname']] = {"target": target_name, "time": msg, "gap": gap}
-            
-        if sorted_metrics:
-            overtake_info[sorted_metrics[0]['nickname']] = {"target": "-", "time": "독주 중 👑", "gap": 0}
+        if HISTORY_API_URL: # 슬라이더가 전체 구간이면 구간 없이 요청 -> 서버가 미리 계산해 둔 응답을 그대로 받음
+            full_range = (start_time, end_time) == (min_time.to_pydatetime(), max_time.to_pydatetime())
+            m = api_character_metrics(
+                data_key, target_level, load_days,
+                None if full_range else start_time, None if full_range else end_time, scope_size, cohort
+            )
+        else:
+            m = get_character_metrics(history_df, ranks, data_key, cohort, start_time, end_time, target_level, tuple(scope_nicknames))
 
         # -------------------------------------------------------
         # 표 만들기
         # -------------------------------------------------------
         st.subheader("📊 사냥 효율 및 추격 현황표")
-        
-        display_rows = []
-        for nick in selected_users:
-            if nick not in user_metrics:
-                continue
-            u = user_metrics[nick]
-            o_info = overtake_info.get(nick, {"target": "?", "time": "?", "gap": 0})
-            
-            current_req = LEVEL_REQ_EXP.get(int(u['level_info'].split()[0]), 1)
-            percent_speed = (u['speed'] / current_req) * 100
             
-            display_rows.append({
-                "순위": u['rank'],
-                "닉네임": nick,
-                "레벨 (현재%)": u['level_info'],
-                "획득 경험치": f"{int(u['gained_exp']):,}",
-                "⚡ 속도 (%/hr)": f"+{percent_speed:.3f}%",
-                "⏱️ 역전 예상": o_info['time'], # 이름 줄임
-                "🏁 280까지": u['time_to_280'] # [신규 컬럼]
+        if not m.empty:
+            final_table_df = pd.DataFrame({
+                "순위": m['rank'],
+                "닉네임": m.index,
+                "레벨 (현재%)": m['estimated'].map({True: "≈ ", False: ""}) + m['level'].astype(str) + " (" + m['exp_percent'].map('{:.3f}%'.format) + ")",
+                "획득 경험치": m['gained_exp'].map('{:,}'.format),
+                "⚡ 속도 (%/hr)": m['speed_percent'].map('+{:.3f}%'.format),
+                "⏱️ 역전 예상": m.apply(metrics.format_overtake, axis=1), # 이름 줄임
+                target_col: m['hours_to_target'].map(metrics.format_eta),
             })
-            
-        if display_rows:
-            final_table_df = pd.DataFrame(display_rows).sort_values("순위")
             st.dataframe(
                 final_table_df, 
                 hide_index=True, 
                 use_container_width=True,
                 column_config={
                     "순위": st.column_config.NumberColumn(format="%d위"),
+                    "레벨 (현재%)": st.column_config.TextColumn(
+                        help=f"≈ : 경험치 테이블이 추정치인 레벨 ({exp_table.EXACT_MIN_LEVEL}~{exp_table.EXACT_MAX_LEVEL} 밖) -> 퍼센트 / 속도(%) / 목표 ETA 도 추정치"
+                    ),
                     "⏱️ 역전 예상": st.column_config.TextColumn(help="바로 윗 등수를 잡는데 걸리는 시간"),
-                    "🏁 280까지": st.column_config.TextColumn(help="현재 속도로 280레벨 달성까지 남은 시간")
+                    target_col: st.column_config.TextColumn(help=f"현재 속도로 {target_level}레벨 달성까지 남은 시간")
                 }
             )
         else:
             st.info("데이터가 부족하여 계산할 수 없습니다.")
 
         # -------------------------------------------------------
-        # 그래프 그리기
+        # 그래프 그리기 (구간이 길면 원본 대신 시간/일 롤업을 씀)
         # -------------------------------------------------------
-        final_df = user_filtered_df[
-            (user_filtered_df['timestamp'] >= start_time) & 
-            (user_filtered_df['timestamp'] <= end_time)
+        resolution = dashboard_data.chart_resolution(end_time - start_time)
+        chart_df = load_chart_rollup(resolution, load_days, selected_users) if resolution else pd.DataFrame()
+        if resolution == "hourly": # 시간 롤업 보관 기간(hourly_days)이 지난 앞 구간은 일 롤업으로
+            chart_df = dashboard_data.extend_with_rollup(chart_df, load_chart_rollup("daily", load_days, selected_users))
+        if chart_df.empty: # 롤업이 없으면 원본으로
+            resolution, chart_df = None, user_filtered_df
+
+        final_df = chart_df[
+            (chart_df['timestamp'] >= start_time) & 
+            (chart_df['timestamp'] <= end_time)
         ].copy()
+        # 표시용 이름은 그래프에 그리는 행에만 만듦 (nickname 은 category)
+        final_df['display_name'] = (
+            final_df['nickname'].map(rank_map).astype(float).fillna(999).astype(int).astype(str)
+            + "위 " + final_df['nickname'].astype(str)
+        )
         
         if not final_df.empty:
             st.subheader("📈 경험치 경쟁 그래프")
+            if resolution:
+                st.caption(f"선택 구간이 길어서 {'1시간' if resolution == 'hourly' else '1일'} 단위 요약 데이터로 그립니다.")
             
             view_mode = st.radio(
                 "그래프 모드:",
@@ -304,21 +340,19 @@ else:
             
             # 툴팁용 속도 계산
             plot_df = plot_df.sort_values(by=['nickname', 'timestamp'])
-            plot_df['dt'] = plot_df.groupby('nickname')['timestamp'].diff().dt.total_seconds() / 3600
-            plot_df['d_exp'] = plot_df.groupby('nickname')['total_exp'].diff()
+            by_nickname = plot_df.groupby('nickname', observed=True)
+            plot_df['dt'] = by_nickname['timestamp'].diff().dt.total_seconds() / 3600
+            plot_df['d_exp'] = by_nickname['total_exp'].diff()
             
-            def get_speed_tooltip(row):
-                if pd.isna(row['dt']) or row['dt'] <= 0:
-                    return "-"
-                speed_per_hour = row['d_exp'] / row['dt']
-                req_exp = LEVEL_REQ_EXP.get(row['level'], 1)
-                percent_speed = (speed_per_hour / req_exp) * 100
-                return f"+{percent_speed:.3f}%/hr"
-
-            plot_df['speed_tooltip'] = plot_df.apply(get_speed_tooltip, axis=1)
+            if resolution: # 롤업은 직전 버킷 대비 속도를 이미 들고 있음
+                speed, has_speed = plot_df['speed'], plot_df['speed'].notna()
+            else:
+                speed, has_speed = plot_df['d_exp'] / plot_df['dt'], plot_df['dt'] > 0
+            percent_speed = exp_table.exp_percent(plot_df['level'].to_numpy(), speed)
+            plot_df['speed_tooltip'] = percent_speed.map('+{:.3f}%/hr'.format).where(has_speed, "-")
 
             if "기간 내 획득" in view_mode:
-                plot_df['value'] = plot_df.groupby('nickname')['total_exp'].transform(lambda x: x - x.min())
+                plot_df['value'] = plot_df['total_exp'] - by_nickname['total_exp'].transform('min')
                 y_title = '구간 획득 경험치 (+)'
                 title_text = f'누가 제일 많이 먹었나? ({start_time.strftime("%H:%M")} ~)'
             elif "1등과의 격차" in view_mode:
@@ -331,8 +365,16 @@ else:
                 y_title = '총 누적 경험치'
                 title_text = '순위 변동 그래프'
 
+            # 선마다 그래프 너비에 맞는 점 개수로 줄여서 보냄 (구간을 좁히면 원본 그대로)
+            point_budget = dashboard_data.chart_point_budget()
+            total_points = len(plot_df)
+            plot_df = downsample.downsample_lines(plot_df, 'timestamp', 'value', 'nickname', point_budget)
+            if len(plot_df) < total_points:
+                st.caption(f"점 {total_points:,}개 중 모양이 드러나는 {len(plot_df):,}개만 그립니다 (선당 최대 {point_budget}개). 구간을 좁히면 전부 보입니다.")
+
             sorted_legends = sorted(plot_df['display_name'].unique(), key=lambda x: int(x.split('위')[0]))
 
+            import plotly.express as px # 그래프를 그릴 때만 불러옴 (무거운 모듈)
             fig = px.line(
                 plot_df, 
                 x='timestamp', 
@@ -343,7 +385,7 @@ else:
                 hover_data={
                     'timestamp': '|%m-%d %H:%M', 
                     'level': True, 
-                    'exp_percent_str': True, 
+                    'exp_percent': ':.3f', 
                     'speed_tooltip': True,
                     'value': True, 
                     'display_name': False,
@@ -357,7 +399,7 @@ else:
                 hovertemplate="<br>".join([
                     "<b>%{x}</b>",
                     "Level: %{customdata[1]}",
-                    "Exp: %{customdata[2]}",
+                    "Exp: %{customdata[2]:.3f}%",
                     "<b>⚡ 속도: %{customdata[3]}</b>",
                     "Value: %{y}"
                 ])
@@ -368,6 +410,90 @@ else:
                 fig.update_yaxes(autorange="reversed")
             
             st.plotly_chart(fig, use_container_width=True)
-            
+
+        # -------------------------------------------------------
+        # 순위 변동 / 전체 쌍 역전 예상 (rank_analytics.py 배치 결과)
+        # -------------------------------------------------------
+        analytics = load_analytics()
+        st.subheader("🔀 순위 변동 분석")
+        if analytics is None:
+            st.info("아직 순위 분석 결과가 없습니다. (rank_analytics.py 실행 후 표시)")
+        else:
+            meta = analytics['meta']
+            generated_at = datetime.strptime(meta['generated_at'], "%Y-%m-%d %H:%M:%S") + timedelta(hours=9)
+            st.caption(f"{generated_at:%m-%d %H:%M} 계산 · 스냅샷 {meta['snapshots']:,}개 × 캐릭터 {meta['characters']:,}명 "
+                       f"· 속도는 최근 {meta['speed_hours']}시간 기준 (전체 캐릭터 순위, 그룹 필터와 무관)")
+
+            rank_df = analytics['rank_history']
+            rank_df = rank_df[
+                rank_df['nickname'].isin(selected_users)
+                & (rank_df['timestamp'] >= start_time) & (rank_df['timestamp'] <= end_time)
+            ].sort_values(['nickname', 'timestamp'])
+            if not rank_df.empty:
+                rank_df = downsample.downsample_lines(rank_df, 'timestamp', 'rank', 'nickname', dashboard_data.chart_point_budget())
+                import plotly.express as px
+                fig = px.line(rank_df.assign(nickname=rank_df['nickname'].astype(str)), x='timestamp', y='rank', color='nickname',
+                              title='스냅샷별 전체 순위', category_orders={"nickname": list(selected_users)})
+                fig.update_yaxes(autorange="reversed")
+                fig.update_layout(yaxis_title='순위', xaxis_title=None)
+                st.plotly_chart(fig, use_container_width=True)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                stats = analytics['rank_stats']
+                stats = stats[stats['nickname'].isin(selected_users)].sort_values('mean_rank')
+                st.dataframe(pd.DataFrame({
+                    "닉네임": stats['nickname'].astype(str),
+                    "현재": stats['rank'].map(lambda r: f"{r}위" if r else "-"),
+                    "최고 / 최저": stats['best_rank'].astype(str) + " / " + stats['worst_rank'].astype(str),
+                    "평균": stats['mean_rank'].map('{:.1f}'.format),
+                    "변동성 (σ)": stats['rank_std'].map('{:.2f}'.format),
+                    "순위 변동": stats['rank_changes'],
+                    f"{meta['speed_hours']}시간 변화": stats['rank_delta'].map('{:+d}'.format),
+                }), hide_index=True, use_container_width=True)
+            with col2:
+                overtakes = analytics['overtakes']
+                involved = overtakes['nickname'].isin(selected_users) | overtakes['target_nickname'].isin(selected_users)
+                overtakes = overtakes[involved].head(50) # 이미 빠른 순으로 정렬돼 있음
+                st.dataframe(pd.DataFrame({
+                    "추격자": overtakes['nickname'].astype(str),
+                    "대상": overtakes['target_nickname'].astype(str),
+                    "역전 예상": overtakes.apply(metrics.format_overtake, axis=1) if not overtakes.empty else [],
+                }), hide_index=True, use_container_width=True,
+                    column_config={"역전 예상": st.column_config.TextColumn(help=f"{meta['horizon_hours']:.0f}시간 안에 역전하는 모든 쌍 (바로 윗 순위만이 아님)")})
+
+    else:
+        st.info("왼쪽 사이드바에서 유저를 선택해주세요.")
+
+# ==========================================
+# [기능 3] 수집기 상태 (실행별 단계 시간 / API 응답 시간 / 실패 수)
+# ==========================================
+with st.expander("🩺 수집기 상태"):
+    health_df = load_run_metrics()
+    if health_df.empty:
+        st.info("아직 수집기 실행 기록이 없습니다.")
     else:
-        st.info("왼쪽 사이드바에서 유저를 선택해주세요.")
\ No newline at end of file
+        last_run = health_df.iloc[-1].fillna(0)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("마지막 실행 소요", f"{last_run['total_sec']:.1f}초")
+        col2.metric("처리량", f"{last_run.get('items_per_sec', 0):.1f}명/초")
+        col3.metric("API 재시도", int(last_run.get('counts.api_retried', 0)))
+        col4.metric("최종 누락", int(last_run.get('counts.api_dropped', 0)))
+
+        def plot_columns(prefix, title, y_title, suffix=''):
+            # 'stages.collect' 처럼 펼쳐진 컬럼들을 항목별 선으로 그림 (범례는 prefix/suffix 를 뗀 이름)
+            columns = [c for c in health_df.columns if c.startswith(prefix) and c.endswith(suffix)]
+            if not columns:
+                return
+            long_df = health_df.melt(id_vars='run_at', value_vars=columns, var_name='항목', value_name='value')
+            long_df['항목'] = long_df['항목'].str[len(prefix):]
+            if suffix:
+                long_df['항목'] = long_df['항목'].str[:-len(suffix)]
+            import plotly.express as px
+            fig = px.line(long_df, x='run_at', y='value', color='항목', markers=True, title=title)
+            fig.update_layout(yaxis_title=y_title, xaxis_title=None)
+            st.plotly_chart(fig, use_container_width=True)
+
+        plot_columns('stages.', '단계별 소요 시간', '초')
+        plot_columns('endpoints.', '엔드포인트별 응답 시간 (p95)', '초', suffix='.p95')
+        plot_columns('counts.api_', 'API 호출 / 실패 / 재시도', '건')
@@ -0,0 +1,172 @@
+"""
+수집기 벤치마크 (로컬 mock Nexon API 서버 사용, 네트워크 불필요)
+
+    python bench_collector.py compare --worlds 8 --per-world 200 --latency 0.05
+    python bench_collector.py pipeline --worlds 4 --per-world 25000 --population 100000 --runs 3 --error-rate 0.01
+    python bench_collector.py cohorts --worlds 4 --per-world 500 --watch 1000
+
+compare : 기존 스레드풀 방식과 비동기 엔진(+OCID 캐시)의 1~3단계 소요 시간 비교
+pipeline: 임시 저장 위치(TRACKER_DATA_DIR)에서 maple_exp_tracker.main() 전체를 runs 번 실행하고
+          회차별 처리량 / API 응답 시간(p50/p95/p99) / 최대 메모리(RSS)를 출력
+          (run_metrics.jsonl 보고서를 그대로 읽으므로 실제 수집기와 같은 계측 값)
+cohorts : 랭킹 그룹만 / + 관심 목록 watch 명 (절반은 랭킹 그룹과 겹침) / + 길드 그룹 설정별로
+          OCID 캐시가 찬 상태의 회차당 API 호출 수 비교 (그룹을 더해도 캐릭터당 호출은 한 번인지 확인)
+mock 서버 옵션(--latency, --error-rate, --throttle-rate, --rate-limit, --population ...)은 mock_nexon_api.py 참고
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import mock_nexon_api
+
+def setup_env(args, data_dir=None):
+    """수집기는 import 시점에 URL/경로를 읽으므로 import 전에 환경변수를 세팅"""
+    os.environ["NEXON_API_BASE"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("NEXON_API_KEY", "bench")
+    os.environ["NEXON_RATE_LIMIT"] = str(args.rate)
+    os.environ["MAX_CONCURRENCY"] = str(args.concurrency)
+    if data_dir is not None:
+        os.environ["TRACKER_DATA_DIR"] = data_dir
+
+    import maple_exp_tracker as tracker
+    tracker.TARGET_WORLDS = [f"world{i}" for i in range(args.worlds)]
+    tracker.RANKER_LIMIT_PER_WORLD = args.per_world
+    return tracker
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # 리눅스는 KB 단위
+
+# ==========================================
+# 1. 스레드풀 vs 비동기
+# ==========================================
+def bench_compare(args):
+    tracker = setup_env(args)
+    from ocid_cache import OcidCache
+
+    t0 = time.perf_counter()
+    threaded = tracker.collect_threaded()
+    t_threaded = time.perf_counter() - t0
+
+    # 실제 캐시 파일은 건드리지 않도록 빈 메모리 캐시 사용
+    cache = OcidCache(path=os.devnull)
+    t0 = time.perf_counter()
+    pooled = asyncio.run(tracker.collect_async(cache))
+    t_async = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    warm = asyncio.run(tracker.collect_async(cache))
+    t_warm = time.perf_counter() - t0
+
+    print()
+    print(f"스레드풀      : {len(threaded):>6}명 {t_threaded:8.2f}s")
+    print(f"비동기        : {len(pooled):>6}명 {t_async:8.2f}s  (x{t_threaded / max(t_async, 1e-9):.1f})")
+    print(f"비동기+캐시   : {len(warm):>6}명 {t_warm:8.2f}s  (x{t_threaded / max(t_warm, 1e-9):.1f})")
+
+# ==========================================
+# 2. main() 전체 파이프라인
+# ==========================================
+def bench_pipeline(args, server_stats):
+    data_dir = tempfile.mkdtemp(prefix="tracker_bench_")
+    try:
+        tracker = setup_env(args, data_dir)
+        import run_metrics
+        os.makedirs(tracker.HISTORY_DIR, exist_ok=True)
+
+        print(f"{'회차':>4} {'수집':>8} {'저장':>8} {'전체':>8} {'처리량':>10} "
+              f"{'basic p50':>10} {'p95':>8} {'p99':>8} {'호출':>8} {'재시도':>6} {'누락':>5} {'RSS':>8}")
+        for run in range(1, args.runs + 1):
+            if run > 1:
+                time.sleep(max(0.0, args.interval)) # 그 사이 active 캐릭터 경험치가 오름
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with quiet:
+                tracker.main()
+
+            with open(os.path.join(tracker.HISTORY_DIR, run_metrics.RUN_METRICS_NAME), encoding='utf-8') as f:
+                report = json.loads(f.read().splitlines()[-1])
+            counts = report["counts"]
+            basic = report["endpoints"].get("/character/basic", {})
+            ms = lambda key: f"{basic[key] * 1000:.0f}ms" if key in basic else "-"
+            print(f"{run:>4} {counts.get('collected', 0):>8,} {counts.get('stored', 0):>8,} {report['total_sec']:>7.2f}s "
+                  f"{report['items_per_sec'] or 0:>8.0f}/s {ms('p50'):>10} {ms('p95'):>8} {ms('p99'):>8} "
+                  f"{counts.get('api_requests', 0):>8,} {counts.get('api_retried', 0):>6} {counts.get('api_dropped', 0):>5} "
+                  f"{peak_rss_mb():>6.0f}MB")
+
+        history_bytes = sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(tracker.HISTORY_DIR) for name in names
+        )
+        print(f"\nmock 서버: 요청 {server_stats['requests']:,}건 (5xx {server_stats['errors']:,}, 429 {server_stats['throttled']:,})"
+              f" / 저장소 {history_bytes / 1024:,.0f} KB")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+# ==========================================
+# 3. 추적 그룹 (targets.py) 추가 비용
+# ==========================================
+def bench_cohorts(args):
+    tracker = setup_env(args)
+    import targets
+    from ocid_cache import OcidCache
+    from run_metrics import RunMetrics
+
+    worlds = tracker.TARGET_WORLDS
+    ranking = targets.Cohort("랭킹", worlds=worlds, limit=args.per_world)
+    half = args.watch // 2
+    watch = targets.Cohort("관심", nicknames=[
+        *(f"{worlds[i % len(worlds)]}_{i // len(worlds)}" for i in range(half)), # 랭킹 그룹과 겹침
+        *(f"{worlds[0]}_{args.per_world + i}" for i in range(args.watch - half)), # 랭킹 그룹 밖
+    ])
+    guild = targets.Cohort("길드", guild="bench", world=worlds[-1])
+
+    def requests_per_run(cohorts):
+        registry = targets.TargetRegistry(cohorts)
+        cache = OcidCache(path=os.devnull)
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(tracker.collect_async(cache, registry=registry)) # OCID 캐시 채우기
+            metrics = RunMetrics()
+            status = asyncio.run(tracker.collect_async(cache, metrics=metrics, registry=registry))
+        return metrics.counts["api_requests"], len(status)
+
+    print(f"{'설정':<24} {'캐릭터':>8} {'호출/회차':>10} {'추가 호출':>10}")
+    base, _ = requests_per_run([ranking])
+    for label, cohorts in (("랭킹", [ranking]), (f"+ 관심 {args.watch}명", [ranking, watch]),
+                           ("+ 관심 + 길드", [ranking, watch, guild])):
+        calls, collected = requests_per_run(cohorts)
+        print(f"{label:<24} {collected:>8,} {calls:>10,} {calls - base:>+10,}")
+
+def main():
+    parser = argparse.ArgumentParser(description="수집기 벤치마크 (로컬 mock Nexon API)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("compare", "스레드풀 vs 비동기 엔진"), ("pipeline", "main() 전체 실행 계측"),
+                            ("cohorts", "추적 그룹 추가 시 API 호출 수")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--worlds", type=int, default=4)
+        p.add_argument("--per-world", type=int, default=50)
+        p.add_argument("--rate", type=float, default=100000, help="수집기 초당 호출 제한")
+        p.add_argument("--concurrency", type=int, default=20, help="수집기 동시 요청 수")
+        p.add_argument("--port", type=int, default=18080)
+        mock_nexon_api.add_arguments(p)
+        if name == "pipeline":
+            p.add_argument("--runs", type=int, default=3)
+            p.add_argument("--interval", type=float, default=1.0, help="회차 사이 대기 (초)")
+            p.add_argument("--verbose", action="store_true", help="수집기 출력 그대로 보기")
+        if name == "cohorts":
+            p.add_argument("--watch", type=int, default=1000, help="관심 목록 인원")
+    args = parser.parse_args()
+
+    server_stats = mock_nexon_api.start_in_thread(args.port, **mock_nexon_api.server_options(args))
+    if args.command == "compare":
+        bench_compare(args)
+    elif args.command == "pipeline":
+        bench_pipeline(args, server_stats)
+    elif args.command == "cohorts":
+        bench_cohorts(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+대시보드 데이터 경로 벤치마크
+
+    python bench_dashboard.py load --scales 1,10,100
+    python bench_dashboard.py enrich --scales 1,10
+    python bench_dashboard.py api --scales 1,10 --viewers 20
+    python bench_dashboard.py memory --scales 1,10
+    python bench_dashboard.py chart --scales 1,10,100
+    python bench_dashboard.py analytics --scales 1,10,100 --workers 1,2,4
+    python bench_dashboard.py retention --scales 4,12,24
+    python bench_dashboard.py check                      # CI: 기준값 검사 (실패하면 종료 코드 1)
+
+load: 현재 history/ 를 N배로 부풀린 저장소를 로컬 HTTP 서버로 띄워서
+      (1) 매번 전체 다시 읽기  (2) 증분 로더의 새 스냅샷 1개 반영  (3) 변경 없음(304)
+      세 경우의 소요 시간을 비교
+enrich: 예전 행 단위 df.apply 가공과 현재 배열 인덱싱 가공의 소요 시간 비교
+api: 대시보드 첫 화면(순위표 + 상위 15명 시계열 + 속도/ETA)을 viewers 명이 동시에 열 때
+     (1) 세션마다 저장소를 직접 읽고 계산  (2) 조회 API(history_api.py) 요청  의 화면당 소요 시간 비교
+chart: 상위 15명 전체 구간 그래프(원본 스냅샷)를 그대로 그릴 때와 선마다 LTTB 로 줄였을 때의
+       Plotly 그림 JSON 크기 / 그림 생성+직렬화 시간 비교
+analytics: 순위 분석 배치(rank_analytics.analyze)의 프로세스 수별 소요 시간 (풀은 미리 띄워 둔 상태로 측정)
+retention: N배로 부풀린 기록(원본 약 8일 × N)에 보관 정책(retention.py)을 적용하기 전/후의
+           원본(대시보드가 읽는 부분) / 아카이브 크기와 '전체' 기간 첫 로드 시간 비교 (두 번째 적용은 바뀌는 게 없어야 함)
+check: CI(.github/workflows/check.yml)에서 실행하는 회귀 검사. 현재 history/ 로
+       벡터화 가공 결과가 행 단위 기준과 같은지, 행 단위 대비 CHECK_MIN_ENRICH_SPEEDUP 배 이상 빠른지,
+       대시보드 프레임이 행당 CHECK_MAX_BYTES_PER_ROW 바이트 이하인지,
+       일부 캐릭터만 저장한 회차 뒤에도 순위표 / 순위 분석이 전체 캐릭터를 유지하는지 확인
+memory: 대시보드 프레임의 행당 메모리 (예전 문자열/64비트 컬럼 vs 현재 category/축소 정수) 와 첫 화면 계산 시간 비교
+"""
+import argparse
+import functools
+import http.server
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import dashboard_data
+import downsample
+import exp_table
+import history_store
+import metrics
+import rank_analytics
+import retention
+
+# ==========================================
+# 1. 합성 데이터
+# ==========================================
+def build_scaled_history(scale, out_dir, src_dir=history_store.HISTORY_DIR):
+    """원본 기록을 시간축으로 scale번 이어 붙인 저장소를 out_dir 에 생성"""
+    table = pa.concat_tables([
+        pq.read_table(os.path.join(src_dir, e["path"]), schema=history_store.SCHEMA)
+        for e in history_store.load_manifest(src_dir)["files"]
+    ]).unify_dictionaries()
+    ts = table.column("timestamp")
+    span = pc.max(ts).as_py() - pc.min(ts).as_py() + timedelta(minutes=30)
+
+    manifest = {"files": []}
+    for k in range(scale):
+        shifted = table.set_column(0, "timestamp", pc.add(ts, pa.scalar(span * k, pa.duration("s"))))
+        dates = pc.strftime(shifted.column("timestamp"), format="%Y-%m-%d")
+        for date in pc.unique(dates).to_pylist():
+            part = shifted.filter(pc.equal(dates, date))
+            manifest["files"].append(history_store.write_table(part, f"date={date}/part-{k:04d}.parquet", out_dir))
+    history_store.save_manifest(manifest, out_dir)
+    return table.num_rows * scale
+
+def serve_directory(directory, port):
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+# ==========================================
+# 2. 시나리오
+# ==========================================
+def bench_load(scales, port):
+    print(f"{'배율':>6} {'행 수':>12} {'전체 로드':>10} {'증분(+1회)':>12} {'변경 없음':>10}")
+    for scale in scales:
+        out_dir = tempfile.mkdtemp(prefix=f"history_x{scale}_")
+        try:
+            rows = build_scaled_history(scale, out_dir)
+            server = serve_directory(out_dir, port)
+            base = f"http://127.0.0.1:{port}"
+
+            _, t_full = timed(lambda: dashboard_data.load_full(base))
+
+            loader = dashboard_data.IncrementalLoader(base, min_interval_sec=0)
+            loader.refresh()
+
+            # Last-Modified 는 초 단위라 1초 넘게 기다렸다가 새 수집분 추가
+            time.sleep(1.1)
+            last_ts = datetime.strptime(history_store.load_manifest(out_dir)["files"][-1]["max_ts"], history_store.TS_FORMAT)
+            latest = loader.df[loader.df['timestamp'] == loader.df['timestamp'].max()]
+            snapshot = list(zip(latest['nickname'], latest['world'], latest['level'], latest['exp'] + 1))
+            history_store.append_snapshot(snapshot, last_ts + timedelta(minutes=30), out_dir)
+
+            _, t_incr = timed(lambda: loader.refresh(force=True))
+            _, t_noop = timed(lambda: loader.refresh(force=True))
+            assert (loader.df['timestamp'] == loader.df['timestamp'].max()).sum() == len(snapshot)
+
+            print(f"{scale:>6}x {rows:>12,} {t_full:>9.2f}s {t_incr:>11.3f}s {t_noop:>9.3f}s")
+            server.shutdown()
+            server.server_close()
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+def enrich_rowwise(df):
+    """비교 기준: 예전 load_data 의 행 단위 가공 (테이블 조회만 전체 레벨 배열로 바꿈)"""
+    def process_user_data(row):
+        level = exp_table.clip_level(row['level'])
+        total_exp = exp_table.LEVEL_BASE_EXP[level] + row['exp']
+        percent = (row['exp'] / max(exp_table.LEVEL_REQ_EXP[level], 1)) * 100
+        return pd.Series([total_exp, percent])
+
+    df[['total_exp', 'exp_percent']] = df.apply(process_user_data, axis=1)
+    df['exp_percent_str'] = df['exp_percent'].map('{:.3f}%'.format)
+    return df
+
+def enrich_matches_rowwise(df):
+    """벡터화 가공(enrich_history)과 행 단위 기준의 결과 비교 -> 다른 점 목록 (같으면 빈 목록)"""
+    vec = dashboard_data.enrich_history(df.copy())
+    ref = enrich_rowwise(df.copy())
+    problems = []
+    if not (vec['total_exp'].to_numpy() == ref['total_exp'].to_numpy(dtype='int64')).all():
+        problems.append("total_exp 가 행 단위 기준과 다름")
+    # exp_percent 는 float32 (화면은 소수 셋째 자리까지) -> 표시 자릿수 기준으로 비교
+    if not np.allclose(vec['exp_percent'].to_numpy(dtype='float64'), ref['exp_percent'].to_numpy(dtype='float64'), rtol=0, atol=5e-4):
+        problems.append("exp_percent 가 행 단위 기준과 소수 셋째 자리 안에서 다름")
+    return problems
+
+def bench_enrich(scales):
+    raw = history_store.read_history()
+    print(f"{'배율':>6} {'행 수':>12} {'행 단위':>10} {'벡터화':>10} {'배속':>8}")
+    for scale in scales:
+        df = pd.concat([raw] * scale, ignore_index=True)
+        _, t_row = timed(lambda: enrich_rowwise(df.copy()))
+        _, t_vec = timed(lambda: dashboard_data.enrich_history(df.copy()))
+        print(f"{scale:>6}x {len(df):>12,} {t_row:>9.2f}s {t_vec:>9.3f}s {t_row / t_vec:>7.0f}x")
+
+def chart_json(plot_df):
+    """app.py 그래프와 같은 설정으로 그림을 만들고 브라우저로 보낼 JSON 으로 직렬화"""
+    import plotly.express as px
+    fig = px.line(plot_df, x='timestamp', y='value', color='nickname', markers=True,
+                  hover_data={'level': True, 'exp_percent': ':.3f'})
+    return fig.to_json()
+
+def bench_chart(scales):
+    budget = dashboard_data.chart_point_budget()
+    print(f"{'배율':>6} {'점 수':>10} {'원본 JSON':>11} {'원본 시간':>10} {'줄인 점':>8} {'줄인 JSON':>11} {'줄인 시간':>10}  (선당 {budget}개)")
+    for scale in scales:
+        out_dir = tempfile.mkdtemp(prefix=f"history_x{scale}_")
+        try:
+            build_scaled_history(scale, out_dir)
+            df = dashboard_data.load_full(out_dir)
+            top = metrics.latest_ranking(df).index[:15]
+            plot_df = df[df['nickname'].isin(top)].sort_values(['nickname', 'timestamp'])
+            plot_df = plot_df.assign(value=plot_df['total_exp'])
+
+            raw_json, t_raw = timed(lambda: chart_json(plot_df))
+            small, t_lttb = timed(lambda: downsample.downsample_lines(plot_df, 'timestamp', 'value', 'nickname', budget))
+            small_json, t_small = timed(lambda: chart_json(small))
+            print(f"{scale:>6}x {len(plot_df):>10,} {len(raw_json) / 2**20:>9.2f}MB {t_raw:>9.2f}s "
+                  f"{len(small):>8,} {len(small_json) / 2**20:>9.2f}MB {t_lttb + t_small:>9.2f}s")
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+def bench_analytics(scales, workers_list):
+    from concurrent.futures import ProcessPoolExecutor
+    print(f"{'배율':>6} {'스냅샷':>8} {'캐릭터':>6} " + " ".join(f"{str(w) + '프로세스':>10}" for w in workers_list))
+    for scale in scales:
+        out_dir = tempfile.mkdtemp(prefix=f"history_x{scale}_")
+        try:
+            build_scaled_history(scale, out_dir)
+            df = history_store.carry_forward(history_store.read_history(out_dir))
+            times = []
+            for workers in workers_list:
+                if workers > 1:
+                    with ProcessPoolExecutor(workers) as pool:
+                        list(pool.map(abs, range(workers))) # 프로세스 기동 시간은 빼고 측정
+                        (_, stats, _), t = timed(lambda: rank_analytics.analyze(df, pool=pool))
+                else:
+                    (_, stats, _), t = timed(lambda: rank_analytics.analyze(df))
+                times.append(t)
+            print(f"{scale:>6}x {df['timestamp'].nunique():>8,} {stats.num_rows:>6,} " + " ".join(f"{t:>9.2f}s" for t in times))
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+def tree_bytes(directory):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files)
+
+def bench_retention(scales, raw_days, hourly_days):
+    policy = retention.RetentionPolicy(raw_days, hourly_days)
+    print(f"정책: {policy}")
+    print(f"{'배율':>6} {'기간':>6} {'원본(전)':>10} {'로드(전)':>9} {'원본(후)':>10} {'아카이브':>10} {'로드(후)':>9} {'적용':>7} {'재적용':>7}")
+    for scale in scales:
+        out_dir = tempfile.mkdtemp(prefix=f"history_x{scale}_")
+        try:
+            build_scaled_history(scale, out_dir)
+            manifest = history_store.load_manifest(out_dir)
+            first = datetime.strptime(manifest["files"][0]["min_ts"], history_store.TS_FORMAT)
+            now = datetime.strptime(manifest["files"][-1]["max_ts"], history_store.TS_FORMAT) + timedelta(minutes=30)
+            archive_dir = os.path.join(out_dir, history_store.ARCHIVE_DIR)
+
+            size_before = tree_bytes(out_dir)
+            _, t_before = timed(lambda: dashboard_data.load_full(out_dir))
+            _, t_apply = timed(lambda: retention.apply(policy, now, out_dir))
+            again, t_again = timed(lambda: retention.apply(policy, now, out_dir))
+            assert not any(again.values()), again
+            size_archive = tree_bytes(archive_dir)
+            _, t_after = timed(lambda: dashboard_data.load_full(out_dir))
+            print(f"{scale:>6}x {(now - first).days:>5}일 {size_before / 2**20:>9.2f}MB {t_before:>8.2f}s "
+                  f"{(tree_bytes(out_dir) - size_archive) / 2**20:>9.2f}MB {size_archive / 2**20:>9.2f}MB {t_after:>8.2f}s "
+                  f"{t_apply:>6.2f}s {t_again:>6.2f}s")
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+def widen_frame(df):
+    """비교 기준: 예전 대시보드 프레임 (nickname/world 문자열, 64비트 숫자, 행마다 퍼센트 문자열)"""
+    df = df.astype({'nickname': object, 'world': object, 'level': 'int64', 'exp_percent': 'float64'})
+    df['exp_percent_str'] = df['exp_percent'].map('{:.3f}%'.format)
+    return df
+
+def first_page(df):
+    ranks = metrics.latest_ranking(df)
+    metrics.compute_character_metrics(df, df['timestamp'].min(), df['timestamp'].max(), exp_table.target_total_exp(280), ranks, ranks.index[:15])
+
+def bench_memory(scales):
+    print(f"{'배율':>6} {'행 수':>12} {'예전 B/행':>10} {'현재 B/행':>10} {'감소':>6} {'예전 화면':>10} {'현재 화면':>10}")
+    for scale in scales:
+        out_dir = tempfile.mkdtemp(prefix=f"history_x{scale}_")
+        try:
+            build_scaled_history(scale, out_dir)
+            compact = dashboard_data.load_full(out_dir)
+            wide = widen_frame(compact)
+            rows = len(compact)
+            b_wide = wide.memory_usage(deep=True).sum() / rows
+            b_compact = compact.memory_usage(deep=True).sum() / rows
+            _, t_wide = timed(lambda: first_page(wide))
+            _, t_compact = timed(lambda: first_page(compact))
+            print(f"{scale:>6}x {rows:>12,} {b_wide:>10.0f} {b_compact:>10.0f} {1 - b_compact / b_wide:>6.0%} "
+                  f"{t_wide:>9.3f}s {t_compact:>9.3f}s")
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+def serve_history_api(base, port, timeout=300):
+    """history_api 서버를 별도 프로세스로 실행 (대시보드와 GIL 을 나눠 쓰지 않도록). 첫 색인이 끝나면 반환"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "history_api.py"),
+         "--port", str(port), "--history", base],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise TimeoutError("조회 API 서버가 뜨지 않았습니다")
+
+def open_page_direct(base):
+    """API 없이 세션 하나가 첫 화면을 그릴 때 하는 일"""
+    df = dashboard_data.load_full(base)
+    ranks = metrics.latest_ranking(df)
+    top = ranks.index[:15]
+    series = df[df['nickname'].isin(top)]
+    metrics.compute_character_metrics(df, df['timestamp'].min(), df['timestamp'].max(), exp_table.target_total_exp(280), ranks, top)
+    return len(series)
+
+def open_page_api(client):
+    board = client.leaderboard()
+    series = client.series(board['nickname'][:15].tolist())
+    client.character_metrics(280, top=15)
+    return len(series)
+
+def bench_api(scales, viewers, port):
+    print(f"{'배율':>6} {'행 수':>12} {'직접 (화면당)':>14} {'API 첫 요청':>12} {'API (화면당)':>13} {'동시 ' + str(viewers) + '명':>10}")
+    for scale in scales:
+        out_dir = tempfile.mkdtemp(prefix=f"history_x{scale}_")
+        try:
+            rows = build_scaled_history(scale, out_dir)
+            _, t_direct = timed(lambda: open_page_direct(out_dir))
+
+            server = serve_history_api(out_dir, port)
+            try:
+                client = dashboard_data.HistoryApiClient(f"http://127.0.0.1:{port}")
+                _, t_first = timed(lambda: open_page_api(client)) # 시계열은 첫 요청, 순위표/속도는 미리 계산됨
+                with ThreadPoolExecutor(viewers) as pool:
+                    _, t_all = timed(lambda: list(pool.map(lambda _: open_page_api(client), range(viewers))))
+            finally:
+                server.terminate()
+                server.wait()
+
+            print(f"{scale:>6}x {rows:>12,} {t_direct:>13.2f}s {t_first:>11.3f}s {t_all / viewers:>12.4f}s {t_all:>9.2f}s")
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+# ==========================================
+# 3. 회귀 검사 (CI)
+# ==========================================
+CHECK_SAMPLE_ROWS = 5000 # 행 단위 기준은 느리므로 앞부분만 비교
+CHECK_MIN_ENRICH_SPEEDUP = 20 # 현재 약 300배. 공유 러너 흔들림을 감안해 넉넉하게
+CHECK_MAX_BYTES_PER_ROW = 48 # 현재 약 34 B/행 (예전 문자열/64비트 컬럼은 약 236 B/행)
+
+def run_checks(history_dir=history_store.HISTORY_DIR):
+    """기준값 검사 -> 실패 메시지 목록 (통과하면 빈 목록)"""
+    raw = history_store.read_history(history_dir)
+    sample = raw.head(CHECK_SAMPLE_ROWS)
+    failures = enrich_matches_rowwise(sample)
+
+    _, t_row = timed(lambda: enrich_rowwise(sample.copy()))
+    t_vec = min(timed(lambda: dashboard_data.enrich_history(sample.copy()))[1] for _ in range(3))
+    speedup = t_row / t_vec
+    print(f"가공 {len(sample):,}행: 행 단위 {t_row:.2f}s, 벡터화 {t_vec:.4f}s ({speedup:.0f}배)")
+    if speedup < CHECK_MIN_ENRICH_SPEEDUP:
+        failures.append(f"벡터화 가공이 행 단위보다 {speedup:.0f}배 빠름 (기준 {CHECK_MIN_ENRICH_SPEEDUP}배 이상)")
+
+    frame = history_store.carry_forward(dashboard_data.enrich_history(raw))
+    bytes_per_row = frame.memory_usage(deep=True).sum() / len(frame)
+    print(f"대시보드 프레임 {len(frame):,}행: {bytes_per_row:.0f} B/행")
+    if bytes_per_row > CHECK_MAX_BYTES_PER_ROW:
+        failures.append(f"대시보드 프레임이 행당 {bytes_per_row:.0f}바이트 (기준 {CHECK_MAX_BYTES_PER_ROW}바이트 이하)")
+    return failures + check_partial_snapshot(frame)
+
+def check_partial_snapshot(frame):
+    """
+    마지막 회차가 일부 캐릭터만 저장해도 (그룹별 주기 / 빠른 상위 수집) 순위표와 순위 분석이 전체 캐릭터를 유지하는지.
+    마지막 스냅샷 앞 2명만 30분 뒤에 한 번 더 저장한 프레임으로 확인
+    """
+    latest = frame[frame['timestamp'] == frame['timestamp'].max()]
+    partial = latest.head(2).assign(timestamp=latest['timestamp'].max() + timedelta(minutes=30))
+    df = history_store.concat_frames([frame, partial])
+    expected = frame['nickname'].nunique()
+
+    failures = []
+    ranked = len(metrics.latest_ranking(df))
+    if ranked != expected:
+        failures.append(f"일부만 저장한 회차 뒤 순위표가 {ranked}명 (전체 {expected}명)")
+    _, stats, _ = rank_analytics.analyze(df)
+    current = pc.sum(pc.greater(stats['rank'], 0)).as_py()
+    if current != expected:
+        failures.append(f"일부만 저장한 회차 뒤 순위 분석의 현재 순위가 {current}명 (전체 {expected}명)")
+    print(f"일부만 저장한 회차 뒤 순위: 순위표 {ranked}명, 순위 분석 {current}명 (전체 {expected}명)")
+    return failures
+
+def bench_check(history_dir=history_store.HISTORY_DIR):
+    failures = run_checks(history_dir)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ 기준값 검사 통과")
+
+def main():
+    parser = argparse.ArgumentParser(description="대시보드 데이터 경로 벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_load = sub.add_parser("load", help="전체 로드 vs 증분 로드")
+    p_load.add_argument("--scales", default="1,10,100")
+    p_load.add_argument("--port", type=int, default=18081)
+
+    p_enrich = sub.add_parser("enrich", help="행 단위 vs 벡터화 가공")
+    p_enrich.add_argument("--scales", default="1,10")
+
+    p_api = sub.add_parser("api", help="세션별 직접 로드 vs 조회 API")
+    p_api.add_argument("--scales", default="1,10")
+    p_api.add_argument("--viewers", type=int, default=20)
+    p_api.add_argument("--port", type=int, default=18082)
+
+    p_chart = sub.add_parser("chart", help="그래프 JSON 크기: 원본 vs LTTB")
+    p_chart.add_argument("--scales", default="1,10,100")
+
+    p_analytics = sub.add_parser("analytics", help="순위 분석 배치: 프로세스 수별 시간")
+    p_analytics.add_argument("--scales", default="1,10,100")
+    p_analytics.add_argument("--workers", default="1,2,4")
+
+    p_retention = sub.add_parser("retention", help="보관 정책 적용 전/후 저장소 크기와 첫 로드 시간")
+    p_retention.add_argument("--scales", default="4,12,24")
+    p_retention.add_argument("--raw-days", type=int, default=retention.RAW_DAYS)
+    p_retention.add_argument("--hourly-days", type=int, default=retention.HOURLY_DAYS)
+
+    p_check = sub.add_parser("check", help="CI 회귀 검사 (가공 결과 / 속도 / 메모리 기준)")
+    p_check.add_argument("--history", default=history_store.HISTORY_DIR)
+
+    p_memory = sub.add_parser("memory", help="대시보드 프레임 행당 메모리")
+    p_memory.add_argument("--scales", default="1,10")
+
+    args = parser.parse_args()
+    if args.command == "check":
+        bench_check(args.history)
+        return
+    scales = [int(s) for s in args.scales.split(",")]
+    if args.command == "load":
+        bench_load(scales, args.port)
+    elif args.command == "enrich":
+        bench_enrich(scales)
+    elif args.command == "api":
+        bench_api(scales, args.viewers, args.port)
+    elif args.command == "chart":
+        bench_chart(scales)
+    elif args.command == "analytics":
+        bench_analytics(scales, [int(w) for w in args.workers.split(",")])
+    elif args.command == "retention":
+        bench_retention(scales, args.raw_days, args.hourly_days)
+    elif args.command == "memory":
+        bench_memory(scales)
+
+if __name__ == "__main__":
+    main()
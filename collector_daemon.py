@@ -0,0 +1,226 @@
+"""
+수집기 상주(데몬) 모드
+
+    python maple_exp_tracker.py daemon --every 30 --offset 17
+    python maple_exp_tracker.py daemon --cron "17,47 * * * *" --top 20 --top-every 5
+    python maple_exp_tracker.py daemon                     # targets.json 그룹 주기(every)의 최대공약수마다
+
+GitHub Actions 처럼 회차마다 새 프로세스로 실행하면 파이썬/pandas 로딩, OCID 캐시·상태 파일 읽기,
+커넥션(TLS) 수립을 매번 처음부터 다시 함. 데몬은 한 번 뜬 뒤 내부 스케줄러로 수집을 반복하면서
+    - aiohttp 커넥션 풀 / 호출량 제한기 / 같은 기준일 랭킹 페이지 (maple_exp_tracker.WarmSession)
+    - OCID 캐시, 조회 주기 상태 (캐릭터별 마지막 값 = 직전 스냅샷, 변화 판단에 사용)
+를 메모리에 유지함. 상태 파일(ocid_cache.json, poll_state.json)은 회차마다 저장하므로 내렸다 올려도 이어서 동작.
+
+회차마다 targets.json 을 다시 읽고 주기가 된 그룹만 수집함 (targets.py). --every 를 주지 않으면
+그룹 주기(every)들의 최대공약수마다 실행 (주기가 지정된 그룹이 없으면 30분)
+--top N --top-every M: 정규 수집 사이사이에 월드별 상위 N명만 M분마다 수집 (정규 수집과 겹치면 정규 수집만)
+    나머지 추적 캐릭터는 직전 값을 이어 쓴 표시 행으로 남겨서 빠른 수집 스냅샷에도 전원이 있음
+스냅샷 칸(history_store.SNAPSHOT_SLOT_MINUTES)은 수집 주기에 맞춰 줄임 (같은 칸의 회차는 한 파일로 합쳐지므로).
+--cron 은 실행 분 사이 간격의 최대공약수를 주기로 봄 (예: '*/5 * * * *' -> 5분 칸)
+
+시각은 모두 UTC 기준 (GitHub Actions schedule 과 같음).
+cron 은 '분 시 일 월 요일' 5개 필드, `*` `,` `-` `/` 를 지원.
+"""
+import argparse
+import asyncio
+import math
+import signal
+from datetime import datetime, timedelta, timezone
+
+import history_store
+import maple_exp_tracker as tracker
+import snapshot_writer
+import targets
+from ocid_cache import OcidCache
+from poll_scheduler import PollScheduler
+
+KST_OFFSET = timedelta(hours=9) # 로그 출력용
+
+# ==========================================
+# 1. 스케줄 (interval / cron)
+# ==========================================
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7)) # 분 시 일 월 요일(0, 7 = 일요일)
+
+def _parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        base, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-", 1))
+        else:
+            start = int(base)
+            end = high if step > 1 else start # "5/15" = 5분부터 15분마다
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"cron 필드 범위 오류: {field!r} ({low}-{high})")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 표현식은 필드 5개여야 합니다: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)
+        )
+        self.weekdays = {d % 7 for d in weekdays}
+        # 일/요일이 둘 다 지정되면 둘 중 하나만 맞아도 실행 (표준 cron 규칙)
+        self.any_day = fields[2].startswith("*") or fields[4].startswith("*")
+
+    def _day_matches(self, t):
+        day = t.day in self.days
+        weekday = (t.weekday() + 1) % 7 in self.weekdays
+        return (day and weekday) if self.any_day else (day or weekday)
+
+    def interval_minutes(self):
+        """실행 분(minute 필드) 사이 간격의 최대공약수 (시간 경계를 넘는 간격 포함). 스냅샷 칸 크기 계산용"""
+        minutes = sorted(self.minutes)
+        gaps = [b - a for a, b in zip(minutes, minutes[1:])] + [minutes[0] + 60 - minutes[-1]]
+        return math.gcd(*gaps)
+
+    def next_after(self, t):
+        """t 이후 첫 실행 시각 (분 단위)"""
+        t = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5) # 2월 29일 같은 표현식도 찾을 수 있도록
+        while t < limit:
+            if t.month not in self.months or not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"실행 시각이 없는 cron 표현식: {self.expr!r}")
+
+    def __str__(self):
+        return f"cron '{self.expr}'"
+
+class IntervalSchedule:
+    """minutes 분마다, UTC 자정 + offset 분 기준으로 정렬 (minutes=30, offset=17 -> 매시 17, 47분)"""
+
+    def __init__(self, minutes, offset=0):
+        if minutes <= 0:
+            raise ValueError("주기는 1분 이상이어야 합니다")
+        self.minutes = minutes
+        self.offset = offset % minutes
+
+    def next_after(self, t):
+        midnight = t.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = (t - midnight).total_seconds() / 60 - self.offset
+        return midnight + timedelta(minutes=self.offset + (math.floor(elapsed / self.minutes) + 1) * self.minutes)
+
+    def __str__(self):
+        return f"{self.minutes}분마다" + (f" (+{self.offset}분)" if self.offset else "")
+
+# ==========================================
+# 2. 데몬
+# ==========================================
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class CollectorDaemon:
+    def __init__(self, schedule, top=None, top_schedule=None):
+        self.schedule = schedule
+        self.top = top
+        self.top_schedule = top_schedule if top else None
+        self.cache = OcidCache().load()
+        self.scheduler = PollScheduler().load()
+        self.warm = tracker.WarmSession()
+        self.last_due = None
+
+    def next_run(self, now):
+        """-> (다음 실행 시각, 월드별 추적 인원 (None = 정규 수집))"""
+        if self.last_due is not None:
+            now = max(now, self.last_due) # 타이머가 조금 일찍 깨도 같은 회차를 두 번 돌지 않도록
+        due, limit = self.schedule.next_after(now), None
+        if self.top_schedule is not None:
+            top_due = self.top_schedule.next_after(now)
+            if top_due < due:
+                due, limit = top_due, self.top
+        return due, limit
+
+    async def run_once(self, limit=None):
+        """수집 1회. OCID 캐시 / 조회 주기 상태 / 커넥션 풀은 이전 회차 것을 그대로 사용"""
+        self.cache.reset_stats()
+        self.scheduler.reset_stats()
+        try:
+            with snapshot_writer.collector_lock():
+                await tracker.run_collection_async(self.cache, self.scheduler, self.warm, limit)
+        except TimeoutError as e:
+            print(f"🔒 {e}")
+        except Exception as e: # 한 회차가 실패해도 데몬은 계속 실행
+            print(f"❌ 수집 실패: {e!r}")
+
+    async def serve(self, once=False):
+        """스케줄대로 수집을 반복 (SIGINT/SIGTERM 으로 종료). once 면 바로 1회만 수집하고 종료"""
+        if once:
+            try:
+                return await self.run_once()
+            finally:
+                await self.warm.close()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError): # Windows
+                pass
+
+        print(f"🛰️ 수집기 데몬 시작: {self.schedule}"
+              + (f" + 상위 {self.top}명 {self.top_schedule}" if self.top_schedule else "")
+              + f" / 스냅샷 칸 {history_store.SNAPSHOT_SLOT_MINUTES}분")
+        try:
+            while not stop.is_set():
+                now = _utcnow()
+                due, limit = self.next_run(now)
+                label = "정규 수집" if limit is None else f"상위 {limit}명 수집"
+                print(f"💤 다음 {label}: {(due + KST_OFFSET):%m-%d %H:%M} KST")
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=max(0.0, (due - now).total_seconds()))
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                self.last_due = due
+                await self.run_once(limit)
+        finally:
+            await self.warm.close()
+            print("🛑 수집기 데몬 종료")
+
+def slot_minutes(*intervals):
+    """같은 칸에 두 회차가 들어가지 않도록 스냅샷 칸을 수집 주기의 공약수로 줄임"""
+    return math.gcd(history_store.SNAPSHOT_SLOT_MINUTES, *(m for m in intervals if m))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="maple_exp_tracker.py daemon", description="수집기 상주 모드")
+    when = parser.add_mutually_exclusive_group()
+    when.add_argument("--every", type=int, help="정규 수집 주기 (분, 기본: targets.json 그룹 주기의 최대공약수 또는 30)")
+    when.add_argument("--cron", help="정규 수집 cron 표현식 (UTC), 예: '17,47 * * * *'")
+    parser.add_argument("--offset", type=int, default=0, help="--every 주기의 시작 분 (요청이 몰리는 정각 회피)")
+    parser.add_argument("--top", type=int, default=0, help="빠른 수집 대상: 월드별 상위 N명 (0 = 사용 안 함)")
+    parser.add_argument("--top-every", type=int, default=5, help="빠른 수집 주기 (분)")
+    parser.add_argument("--once", action="store_true", help="스케줄 없이 바로 1회 수집 후 종료 (점검용)")
+    args = parser.parse_args(argv)
+
+    if not tracker.API_KEY:
+        print("🚨 API Key가 없습니다. NEXON_API_KEY 환경변수를 확인하세요.")
+        return
+
+    if not args.cron and args.every is None:
+        args.every = targets.load_registry().tick_minutes() or 30
+    schedule = CronSchedule(args.cron) if args.cron else IntervalSchedule(args.every, args.offset)
+    top_schedule = IntervalSchedule(args.top_every, args.offset) if args.top else None
+    history_store.SNAPSHOT_SLOT_MINUTES = slot_minutes(
+        schedule.interval_minutes() if args.cron else args.every, args.top_every if args.top else None
+    )
+
+    daemon = CollectorDaemon(schedule, args.top, top_schedule)
+    asyncio.run(daemon.serve(once=args.once))
+
+if __name__ == "__main__":
+    main()
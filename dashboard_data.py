@@ -0,0 +1,310 @@
+"""
+대시보드 데이터 로딩/가공
+
+- enrich_history: 저장소에서 읽은 원본 행에 total_exp / exp_percent 등을 붙임
+- IncrementalLoader: 가공이 끝난 DataFrame 을 메모리에 들고 있다가,
+  매니페스트에 새로 생긴 파일(= 새 수집분)만 읽어서 뒤에 붙임.
+  매니페스트는 ETag / Last-Modified 조건부 요청이라 새 데이터가 없으면 304 한 번으로 끝남.
+- 수집기는 값이 바뀐 캐릭터만 값을 저장하므로, 읽은 뒤 history_store.carry_forward 로 표시 행(추적했지만 그대로)을 직전 값으로 채움
+- load_rollup: 긴 구간 그래프용 시간/일 롤업(rollups.py) 읽기
+- load_raw_days / extend_with_rollup: 보관 정책(retention.py)이 원본을 옮긴 구간은 롤업 행으로 이어 붙임
+- chart_point_budget: 그래프 선 하나에 그릴 점 개수 상한 (downsample.py 로 줄임)
+- load_run_metrics: 수집기 실행 보고서(run_metrics.py) 읽기
+- load_cohorts / cohort_ranks: 추적 그룹(targets.py) 구성원 읽기 / 그룹 안 순위
+- load_analytics: 순위 분석 배치 결과(rank_analytics.py) 읽기
+- HistoryApiClient: 조회 API 서버(history_api.py)를 쓰는 경우 위 함수들 대신 사용 (반환 형태는 같음)
+"""
+import io
+import json
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import exp_table
+import history_store
+import rank_analytics
+import retention
+import rollups
+import run_metrics
+import targets
+
+KST_OFFSET = timedelta(hours=9)
+
+# ==========================================
+# 1. 가공
+# ==========================================
+def enrich_history(df):
+    """
+    저장소 원본 행(UTC) -> 대시보드용 행(KST, 총 경험치, 퍼센트)
+    레벨 테이블 배열을 레벨로 바로 인덱싱하므로 행 단위 반복이 없음.
+    세션끼리 공유하는 큰 프레임이라 행당 크기를 줄임:
+    - nickname / world 는 category (Parquet dictionary 를 그대로 받아서 문자열은 이름당 한 번만 저장)
+    - level 은 int16, exp / total_exp 는 int64, exp_percent 는 float32 (화면에는 소수 셋째 자리까지만 씀)
+    - 퍼센트 / 순위 표시 문자열은 만들지 않음 (화면에 그리는 행에만 포맷)
+    """
+    df['nickname'] = df['nickname'].astype('category')
+    df['world'] = df['world'].astype('category')
+    df['timestamp'] = pd.to_datetime(df['timestamp']) + KST_OFFSET # KST 변환
+
+    level = df['level'].to_numpy(dtype='int16')
+    exp = df['exp'].to_numpy(dtype='int64')
+    df['level'] = level
+    df['total_exp'] = exp_table.to_total_exp(level, exp)
+    df['exp_percent'] = exp_table.exp_percent(level, exp).astype('float32')
+    return df
+
+def load_full(base, days=None):
+    """구간 전체를 처음부터 읽고 가공 (증분 로더를 쓰지 않는 경우 / 벤치마크 기준값)"""
+    start = None if days is None else datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    df = history_store.carry_forward(enrich_history(history_store.read_history(base, start=history_store.lead_in(start))))
+    return df if start is None else df[df['timestamp'] >= start + KST_OFFSET].reset_index(drop=True)
+
+# ==========================================
+# 2. 증분 로더
+# ==========================================
+def _partition_of(path):
+    return path.split("/", 1)[0]
+
+class IncrementalLoader:
+    def __init__(self, base, days=None, min_interval_sec=60):
+        self.base = base
+        self.days = days
+        self.min_interval_sec = min_interval_sec # 이 시간 안에는 매니페스트도 다시 보지 않음
+        self.df = None
+        self.loaded = {} # 이미 읽은 파일 경로 -> 매니페스트 항목 (같은 경로가 다시 쓰였는지 비교용)
+        self.validator = None
+        self.last_stored = None # 캐릭터별 마지막 저장 행 (새 수집분을 채울 때 이어받음)
+        self.lead = None # 조회 기간 앞(잘라 낸 구간)의 캐릭터별 마지막 저장 행 (기간 첫 부분을 다시 채울 때 이어받음)
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"full_loads": 0, "incremental": 0, "not_modified": 0, "rows_appended": 0}
+
+    def _window_start(self):
+        # 저장소 시간은 UTC 기준 (서버 시간대와 상관없이)
+        return None if self.days is None else datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=self.days)
+
+    def refresh(self, force=False):
+        """최신 데이터를 반영한 DataFrame 반환 (여러 세션이 공유하므로 반환값은 수정하지 말 것)"""
+        with self.lock:
+            if not force and self.df is not None and time.monotonic() - self.checked_at < self.min_interval_sec:
+                return self.df
+            self.checked_at = time.monotonic()
+
+            manifest, self.validator = history_store.read_manifest_if_changed(self.base, self.validator)
+            start = self._window_start()
+            if manifest is None:
+                self.stats["not_modified"] += 1
+                self._trim(start)
+                return self.df
+
+            if self.df is None:
+                self.stats["full_loads"] += 1
+                # 기간 첫 부분의 표시 행을 채울 값이 기간 앞에 있으므로 lead_in 부터 읽고 채운 뒤 잘라 냄
+                lead_start = history_store.lead_in(start)
+                raw = enrich_history(history_store.read_history(self.base, start=lead_start, manifest=manifest))
+                self.last_stored = history_store.last_stored(raw)
+                self.df = history_store.carry_forward(raw)
+                self.loaded = {e["path"]: e for e in history_store.select_files(manifest, lead_start)}
+                self._trim(start)
+                return self.df
+
+            # compact 등으로 사라졌거나 같은 칸 재실행으로 다시 쓰인 파일이 있으면 그 날짜 파티션만 다시 읽음
+            manifest_entries = {e["path"]: e for e in manifest["files"]}
+            stale = {_partition_of(p) for p, e in self.loaded.items() if manifest_entries.get(p) != e}
+            if stale:
+                utc_dates = (self.df['timestamp'] - KST_OFFSET).dt.strftime("date=%Y-%m-%d")
+                self.df = self.df[~utc_dates.isin(stale)]
+                self.loaded = {p: e for p, e in self.loaded.items() if _partition_of(p) not in stale}
+
+            new_entries = [e for e in history_store.select_files(manifest, start)
+                           if e["path"] not in self.loaded]
+            if new_entries:
+                self.stats["incremental"] += 1
+                new_df = enrich_history(history_store.read_entries(self.base, new_entries, start=start))
+                if stale: # 다시 읽은 파티션은 중간에 끼어들어야 하므로 전체를 정렬해서 다시 채움
+                    self.df = history_store.concat_frames([self.df, new_df])
+                    self.df = history_store.carry_forward(self.df.sort_values('timestamp', kind='stable', ignore_index=True), previous=self.lead)
+                    self.last_stored = history_store.last_stored(self.df)
+                else: # 새 수집분은 앞 구간 각 캐릭터의 마지막 저장 값을 이어받음
+                    filled = history_store.carry_forward(new_df, previous=self.last_stored)
+                    self.last_stored = history_store.last_stored(new_df, previous=self.last_stored)
+                    self.df = history_store.concat_frames([self.df, filled])
+                self.loaded.update((e["path"], e) for e in new_entries)
+                self.stats["rows_appended"] += len(new_df)
+
+            self._trim(start)
+            return self.df
+
+    def _trim(self, start):
+        """조회 기간 밖으로 밀려난 오래된 행 제거 (잘라 낸 행의 마지막 저장 값은 lead 에 남김)"""
+        if start is not None and not self.df.empty and self.df['timestamp'].iloc[0] < start + KST_OFFSET:
+            inside = self.df['timestamp'] >= start + KST_OFFSET
+            self.lead = history_store.last_stored(self.df[~inside], previous=self.lead)
+            self.df = self.df[inside].reset_index(drop=True)
+
+# ==========================================
+# 3. 롤업 (긴 구간 그래프)
+# ==========================================
+# (그래프 구간 상한, 해상도). None = 원본 30분 스냅샷
+CHART_RESOLUTIONS = [(timedelta(days=2), None), (timedelta(days=21), "hourly"), (None, "daily")]
+
+# 그래프 너비(px)와 점 간격. 선 하나당 CHART_WIDTH_PX / CHART_PX_PER_POINT 개까지만 그림
+CHART_WIDTH_PX = int(os.environ.get("CHART_WIDTH_PX", 1400)) # layout="wide" 기준
+CHART_PX_PER_POINT = 4
+
+def chart_point_budget(width_px=CHART_WIDTH_PX):
+    """그래프 너비 -> 선 하나당 점 개수 상한 (이보다 촘촘하면 마커가 겹쳐서 구분되지 않음)"""
+    return max(3, width_px // CHART_PX_PER_POINT)
+
+def chart_resolution(span):
+    """그래프 구간 길이 -> 사용할 롤업 해상도 (점 개수가 구간 길이와 상관없이 비슷하게 유지되도록)"""
+    for limit, resolution in CHART_RESOLUTIONS:
+        if limit is None or span <= limit:
+            return resolution
+
+def load_rollup(base, resolution, days=None):
+    """
+    {base}/rollup/{resolution} 롤업을 그래프용 행으로 가공.
+    timestamp 는 버킷 안 마지막 스냅샷 시각(KST), speed 는 직전 버킷 대비 시간당 경험치
+    """
+    rollup_base = f"{base}/rollup/{resolution}"
+    start = None if days is None else datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    manifest = history_store.read_manifest(rollup_base)
+    df = history_store.read_entries(rollup_base, history_store.select_files(manifest, start), start, schema=rollups.SCHEMA)
+    df['timestamp'] = df['last_ts']
+    return enrich_history(df[['timestamp', 'nickname', 'world', 'level', 'exp', 'speed']].copy())
+
+def load_raw_days(base):
+    """retention.json 에 기록된 원본 보관 기간 (일). 보관 정책을 아직 적용하지 않았으면 None (원본이 전부 남아 있음)"""
+    try:
+        return int(json.loads(history_store.read_bytes(base, retention.STATE_NAME))["policy"]["raw_days"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def extend_with_rollup(df, older):
+    """
+    df 가 시작하기 전 구간을 더 거친 해상도의 행(older)으로 채움 (겹치는 구간은 df 우선).
+    원본은 raw_days, 시간 롤업은 hourly_days 까지만 남으므로 원본 -> 시간 롤업 -> 일 롤업 순으로 이어 붙이면
+    조회 기간이 보관 기간보다 길어도 앞부분이 잘리지 않음. 컬럼은 df 기준 (원본에 붙이면 speed 는 빠지고 carried=False)
+    """
+    if older.empty:
+        return df
+    if df.empty:
+        return older
+    older = older[older['timestamp'] < df['timestamp'].min()]
+    if older.empty:
+        return df
+    if 'carried' in df:
+        older = older.assign(carried=False)
+    return history_store.concat_frames([older[[c for c in df.columns if c in older]], df])
+
+# ==========================================
+# 4. 수집기 상태
+# ==========================================
+def load_run_metrics(base):
+    """
+    run_metrics.jsonl -> 실행 1회 = 1행 (run_at 은 KST)
+    중첩 항목은 'stages.collect', 'endpoints./character/basic.p95', 'counts.api_failed' 처럼 펼침
+    """
+    lines = history_store.read_bytes(base, run_metrics.RUN_METRICS_NAME).decode('utf-8').splitlines()
+    return _run_metrics_frame([json.loads(line) for line in lines if line.strip()])
+
+def _run_metrics_frame(reports):
+    df = pd.json_normalize(reports)
+    if not df.empty:
+        df['run_at'] = pd.to_datetime(df['run_at']) + KST_OFFSET
+    return df
+
+# ==========================================
+# 5. 추적 그룹
+# ==========================================
+def load_cohorts(base):
+    """그룹 이름 -> 현재 구성원 목록 (history/cohorts.json, 없으면 빈 dict)"""
+    return targets.read_cohorts(base)
+
+def cohort_ranks(ranks, members):
+    """전체 순위(metrics.latest_ranking) -> 그룹 구성원만 남겨서 1위부터 다시 매긴 순위"""
+    kept = ranks.index[ranks.index.isin(list(members))]
+    return pd.Series(range(1, len(kept) + 1), index=kept, name='rank')
+
+# ==========================================
+# 6. 순위 분석 (배치 결과)
+# ==========================================
+def load_analytics(base):
+    """
+    rank_analytics.py 가 미리 계산한 결과 -> {"meta", "rank_history", "rank_stats", "overtakes"} (아직 없으면 None)
+    화면을 그릴 때는 파일만 읽고 계산하지 않음. timestamp 는 KST
+    """
+    try:
+        meta = json.loads(history_store.read_bytes(base, rank_analytics.META_NAME))
+    except (OSError, ValueError):
+        return None
+    result = {"meta": meta}
+    for name, entry in meta["files"].items():
+        df = pq.read_table(io.BytesIO(history_store.read_bytes(base, entry["path"]))).to_pandas()
+        df['timestamp'] = pd.to_datetime(df['timestamp']) + KST_OFFSET
+        result[name] = df
+    return result
+
+# ==========================================
+# 7. 조회 API 클라이언트
+# ==========================================
+SERIES_COLUMNS = ['timestamp', 'nickname', 'world', 'level', 'exp', 'total_exp', 'exp_percent']
+
+class HistoryApiClient:
+    """
+    history_api.py 서버에 구간/캐릭터를 지정해서 필요한 행만 받아옴 (시각은 서버가 KST 로 줌)
+    반환 DataFrame 은 저장소를 직접 읽는 함수들(IncrementalLoader, load_rollup, metrics.compute_character_metrics)과 같은 모양
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        params = {k: v for k, v in params.items() if v is not None}
+        url = f"{self.url}{path}" + (f"?{urlencode(params, doseq=True)}" if params else "")
+        with urllib.request.urlopen(url, timeout=self.timeout) as res:
+            return json.loads(res.read())
+
+    @staticmethod
+    def _frame(rows, columns=None):
+        """{"columns", "data"} -> DataFrame (행이 없어도 columns 는 유지)"""
+        df = pd.DataFrame(rows["data"], columns=rows["columns"])
+        if columns is not None:
+            df = df.reindex(columns=columns)
+        if 'timestamp' in df:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format=history_store.TS_FORMAT)
+        return df
+
+    def leaderboard(self, cohort=None):
+        """최근 스냅샷 기준 순위 (rank 오름차순, cohort 가 있으면 그룹 안 순위)"""
+        return self._frame(self._get("/leaderboard", cohort=cohort)["rows"], ['rank'] + SERIES_COLUMNS)
+
+    def series(self, nicknames, days=None, resolution=None):
+        """캐릭터별 시계열 (resolution 이 있으면 롤업, speed 컬럼 포함)"""
+        columns = SERIES_COLUMNS + (['speed'] if resolution else [])
+        data = self._get("/series", nickname=list(nicknames), days=days, resolution=resolution)
+        return self._frame(data["rows"], columns)
+
+    def character_metrics(self, target_level, days=None, start=None, end=None, top=None, cohort=None):
+        """metrics.compute_character_metrics 결과 (nickname 인덱스). start/end 가 없으면 days 구간 전체"""
+        fmt = lambda t: None if t is None else t.strftime(history_store.TS_FORMAT)
+        data = self._get("/metrics", days=days, start=fmt(start), end=fmt(end), top=top, target_level=target_level, cohort=cohort)
+        df = self._frame(data["rows"])
+        if df.empty:
+            return df
+        df['hours_to_target'] = df['hours_to_target'].fillna(float('inf')) # JSON 에는 inf 가 없어서 null 로 옴
+        return df.set_index('nickname')
+
+    def run_metrics(self):
+        return _run_metrics_frame(self._get("/run_metrics")["rows"])
+
+    def cohorts(self):
+        return self._get("/cohorts")["rows"]
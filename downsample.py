@@ -0,0 +1,50 @@
+"""
+그래프용 시계열 줄이기 (Largest-Triangle-Three-Buckets)
+
+브라우저로 보내는 점 개수를 그래프 너비에 맞춰 캐릭터(선)마다 points 개 이하로 줄임.
+구간을 points-2 개 버킷으로 나누고, 버킷마다 "직전에 고른 점 - 이 점 - 다음 버킷 평균" 삼각형 넓이가
+가장 큰 점 하나를 고름 -> 레벨업/사냥 시작·중단 같은 꺾이는 지점이 남음. 첫 점과 마지막 점은 항상 남김.
+점이 points 개 이하인 선(짧은 구간)은 그대로 두므로 구간을 좁히면 원본 스냅샷이 다 보임.
+"""
+import numpy as np
+
+def lttb_indices(x, y, points):
+    """x 오름차순 (x, y) 중 남길 점의 위치 (오름차순 정수 배열, 길이 min(len(x), points))"""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    # 버킷 [edges[i], edges[i+1]) : 첫/마지막 점을 뺀 1 .. n-2 를 points-2 개로 나눔
+    edges = np.linspace(1, n - 1, points - 1).astype('int64')
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # 버킷 i 의 점을 고를 때 쓰는 "다음 버킷 평균" (마지막 버킷은 마지막 점)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    picked = np.empty(points, dtype='int64')
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+def downsample_lines(df, x, y, by, points):
+    """
+    df 를 by 컬럼(캐릭터)별 선으로 보고 선마다 lttb_indices 로 줄인 행만 반환.
+    df 는 by, x 순으로 정렬돼 있어야 함 (선 안에서 x 오름차순)
+    """
+    rows_of = df.groupby(by, sort=False, observed=True).indices
+    if all(len(rows) <= points for rows in rows_of.values()):
+        return df
+    xs = df[x].to_numpy().astype('int64') if df[x].dtype.kind == 'M' else df[x].to_numpy()
+    ys = df[y].to_numpy()
+    keep = np.concatenate([rows[lttb_indices(xs[rows], ys[rows], points)] for rows in rows_of.values()])
+    return df.iloc[np.sort(keep)]
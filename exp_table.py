@@ -0,0 +1,139 @@
+"""
+레벨별 경험치 테이블 (1 ~ 300레벨)
+
+LEVEL_REQ_EXP[L]  : L레벨에서 L+1레벨이 되는 데 필요한 경험치
+LEVEL_BASE_EXP[L] : L레벨 0% 시점의 누적 경험치 (1레벨 0% = 0)
+둘 다 레벨을 인덱스로 바로 쓰는 numpy int64 배열이라 행 단위 반복 없이 df['level'] 로 한 번에 조회 가능.
+수집기와 대시보드가 같이 import 해서 씀.
+
+실제 값은 275 ~ 279 필요 경험치와 275레벨 누적 경험치뿐이고 나머지는 추정치:
+- 280레벨 필요 경험치는 279레벨의 2.02배 (수집된 280레벨 경험치 최대값 33.58조와 일치)
+- 1 ~ 274, 281 ~ 300 은 구간별 증가율로 만든 값. 210 ~ 274 구간은 275레벨 누적 경험치에 맞도록 배율을 보정했고
+  정수 내림 오차는 274레벨에 몰아줌 (레벨별 값은 실제와 다름)
+-> 레벨이 EXACT_MIN_LEVEL ~ EXACT_MAX_LEVEL 밖이면 누적 경험치 / 퍼센트 / 속도 / ETA 가 추정치 (is_exact 로 구분).
+   같은 레벨 안의 경험치 차이(획득 경험치)는 테이블과 상관없이 정확함.
+   목표 레벨(target_total_exp)은 0% 누적 경험치가 실제 값인 EXACT_MIN_LEVEL ~ EXACT_MAX_LEVEL + 1 만 받음
+"""
+import numpy as np
+
+MIN_LEVEL = 1
+MAX_LEVEL = 300
+EXACT_MIN_LEVEL = 275 # 0% 누적 경험치와 필요 경험치가 모두 실제 값인 레벨 구간
+EXACT_MAX_LEVEL = 279
+
+# 실제 값 (기준점)
+BASE_EXP_275 = 57545329506825
+REQ_EXP_KNOWN = {
+    275: 11377111255510,
+    276: 12514822381061,
+    277: 13766304619167,
+    278: 15142935081083,
+    279: 16657228589191,
+    280: 33647601750165,
+}
+
+REQ_EXP_1_TO_9 = [15, 34, 57, 92, 135, 372, 560, 840, 1242]
+REQ_EXP_200 = 2207026470
+
+def _growth(level):
+    """level 필요 경험치 = (level-1) 필요 경험치 × 배율"""
+    if level <= 14 or 30 <= level <= 34 or 60 <= level <= 64 or 100 <= level <= 104:
+        return 1.0
+    if level <= 39:
+        return 1.2
+    if level <= 59:
+        return 1.08
+    if level <= 74:
+        return 1.075
+    if level <= 159:
+        return 1.07
+    if level <= 199:
+        return 1.06
+    if level <= 204:
+        return 1.12
+    if level == 210:
+        return 2.1
+    if level == 280:
+        return 2.02
+    if level >= 275:
+        return 1.1
+    if level % 10 == 0:
+        return 1.6
+    if level % 10 == 5:
+        return 1.3
+    return 1.06
+
+def _chain(start, levels, adjust=1.0):
+    """start 에서 시작해 levels 순서대로 배율(× adjust)을 곱해 나간 필요 경험치 목록"""
+    values, value = [], start
+    for level in levels:
+        value = int(value * _growth(level) * adjust)
+        values.append(value)
+    return values
+
+def _build_tables():
+    req = [0] * (MAX_LEVEL + 1) # 인덱스 = 레벨 (0번은 비워둠)
+    req[1:10] = REQ_EXP_1_TO_9
+    req[10:200] = _chain(req[9], range(10, 200))
+    req[200] = REQ_EXP_200
+    req[201:210] = _chain(REQ_EXP_200, range(201, 210))
+
+    # 210 ~ 274 구간은 배율 전체에 같은 보정값을 곱해서 275레벨 누적 경험치(실제 값)에 맞춤
+    target = BASE_EXP_275 - sum(req[1:210])
+    lo, hi = 0.5, 1.5
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if sum(_chain(req[209], range(210, 275), mid)) < target:
+            lo = mid
+        else:
+            hi = mid
+    req[210:275] = _chain(req[209], range(210, 275), lo)
+    req[274] += target - sum(req[210:275]) # 정수 내림 오차는 274레벨에 몰아줌
+
+    for level, value in REQ_EXP_KNOWN.items():
+        req[level] = value
+    req[281:MAX_LEVEL] = _chain(req[280], range(281, MAX_LEVEL))
+
+    req_arr = np.array(req, dtype=np.int64)
+    base_arr = np.zeros(MAX_LEVEL + 1, dtype=np.int64)
+    base_arr[2:] = np.cumsum(req_arr[1:MAX_LEVEL])
+    return base_arr, req_arr
+
+# import 시점에 한 번만 계산
+LEVEL_BASE_EXP, LEVEL_REQ_EXP = _build_tables()
+LEVEL_BASE_EXP.setflags(write=False)
+LEVEL_REQ_EXP.setflags(write=False)
+
+def is_exact(level):
+    """레벨의 누적 / 필요 경험치가 실제 값인지 (False 면 그 레벨의 누적 경험치 / 퍼센트는 추정치)"""
+    level = np.asarray(level)
+    return (level >= EXACT_MIN_LEVEL) & (level <= EXACT_MAX_LEVEL)
+
+def clip_level(level):
+    """테이블 범위 밖의 레벨을 1 ~ 300 으로 자름 (배열/스칼라 모두 가능)"""
+    return np.clip(level, MIN_LEVEL, MAX_LEVEL)
+
+# ==========================================
+# 변환 함수 (스칼라 / numpy 배열 / pandas Series 모두 가능)
+# ==========================================
+def to_total_exp(level, exp):
+    """(레벨, 현재 레벨 경험치) -> 누적 경험치 (is_exact 가 False 인 레벨은 추정치)"""
+    return LEVEL_BASE_EXP[clip_level(level)] + exp
+
+def exp_percent(level, exp):
+    """(레벨, 현재 레벨 경험치) -> 현재 레벨 진행률(%)"""
+    return exp / np.maximum(LEVEL_REQ_EXP[clip_level(level)], 1) * 100
+
+def from_total_exp(total_exp):
+    """누적 경험치 -> (레벨, 진행률%)"""
+    total_exp = np.asarray(total_exp, dtype=np.int64)
+    level = np.searchsorted(LEVEL_BASE_EXP[MIN_LEVEL:], total_exp, side='right') # LEVEL_BASE_EXP[1:] 기준 위치 = 레벨
+    level = clip_level(level)
+    return level, exp_percent(level, total_exp - LEVEL_BASE_EXP[level])
+
+def target_total_exp(target_level):
+    """목표 레벨 0% 에 해당하는 누적 경험치 (실제 값이 있는 EXACT_MIN_LEVEL ~ EXACT_MAX_LEVEL + 1 만, 그 밖은 ValueError)"""
+    target_level = int(target_level)
+    if not EXACT_MIN_LEVEL <= target_level <= EXACT_MAX_LEVEL + 1:
+        raise ValueError(f"목표 레벨은 {EXACT_MIN_LEVEL} ~ {EXACT_MAX_LEVEL + 1} 만 지원합니다 (그 밖은 추정 테이블): {target_level}")
+    return int(LEVEL_BASE_EXP[target_level])
@@ -0,0 +1,298 @@
+"""
+경험치 기록 조회 API 서버 (대시보드용 JSON)
+
+    python history_api.py --port 8502 --history ./history
+    HISTORY_API_URL=http://127.0.0.1:8502 streamlit run app.py
+
+대시보드 세션마다 저장소 파일을 내려받아 pandas 로 거르던 일을 서버 프로세스 하나가 맡음.
+- 데이터는 dashboard_data.IncrementalLoader 로 메모리에 들고 있고, REFRESH_SEC 마다 새 수집분만 붙임
+- 데이터가 바뀔 때마다 캐릭터별 행 번호(색인)를 만들어 두므로 캐릭터 시계열 조회가 전체 행을 훑지 않음
+- 응답(JSON 바이트)은 (경로, 쿼리) 기준 LRU 캐시, 데이터가 바뀌면 비움. 같은 요청이 동시에 오면 계산은 한 번만
+- 대시보드 첫 화면이 쓰는 순위표 / 속도·ETA(WARM_QUERIES)는 데이터가 바뀌면 미리 계산해 둠
+
+응답은 {"meta": {...}, "rows": {"columns": [...], "data": [[...], ...]}}
+(/run_metrics 의 rows 는 보고서 목록 그대로)
+
+엔드포인트 (시각은 모두 KST 'YYYY-MM-DD HH:MM:SS', days 는 최근 N일, 없으면 전체)
+    GET /health
+    GET /leaderboard[?cohort=]                     최근 스냅샷 기준 순위 (+ 데이터 시작/끝 시각). cohort 가 있으면 그룹 안 순위
+    GET /series?nickname=A&nickname=B&days=7[&resolution=hourly|daily]
+                                                   캐릭터별 시계열 (resolution 이 없으면 원본 스냅샷)
+    GET /metrics?days=7&top=15&target_level=280[&start=&end=][&nickname=A...][&cohort=]
+                                                   속도 / 목표 레벨 ETA / 역전 예상 (metrics.compute_character_metrics)
+                                                   start/end 가 없으면 days 구간 전체, top/nickname 이 없으면 전원
+    GET /run_metrics                               수집기 실행 보고서 (run_metrics.jsonl)
+    GET /cohorts                                   추적 그룹 이름 -> 구성원 (history/cohorts.json, targets.py)
+"""
+import argparse
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+import dashboard_data
+import exp_table
+import history_store
+import metrics
+import run_metrics
+import targets
+
+KST_OFFSET = dashboard_data.KST_OFFSET
+CACHE_SIZE = int(os.environ.get("HISTORY_API_CACHE_SIZE", 256)) # 응답 캐시 항목 수
+REFRESH_SEC = float(os.environ.get("HISTORY_API_REFRESH_SEC", 60)) # 새 수집분 확인 주기
+DEFAULT_TARGET_LEVEL = 280
+
+# 데이터가 바뀌면 미리 계산해 두는 요청 (대시보드 기본 화면: 최근 7일, Top 15, 목표 280)
+WARM_QUERIES = [
+    ("/leaderboard", {}),
+    ("/metrics", {"days": "7", "top": "15", "target_level": str(DEFAULT_TARGET_LEVEL)}),
+]
+
+def _format_ts(value):
+    return None if pd.isna(value) else pd.Timestamp(value).strftime(history_store.TS_FORMAT)
+
+def _json_rows(df):
+    """DataFrame -> {"columns": [...], "data": [[...], ...]} (행마다 키를 반복하지 않음. 시각은 문자열, inf/NaN 은 null)"""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime(history_store.TS_FORMAT)
+    return df.replace([np.inf, -np.inf], np.nan).to_json(orient="split", index=False, double_precision=6)
+
+def _json_body(meta, rows_json):
+    return f'{{"meta": {json.dumps(meta, ensure_ascii=False)}, "rows": {rows_json}}}'.encode("utf-8")
+
+# ==========================================
+# 1. 색인 (데이터 버전 1개 = HistoryIndex 1개)
+# ==========================================
+class HistoryIndex:
+    def __init__(self, df, base, version):
+        self.base = base
+        self.version = version
+        self.source = df # 로더가 돌려준 원본 (다음 갱신 때 바뀌었는지 비교)
+        self.df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+        self.times = self.df['timestamp'].to_numpy()
+        self.rows_of = self.df.groupby('nickname', sort=False, observed=True).indices # nickname -> 행 번호 (시간순)
+        self.latest = metrics.latest_rows(self.df) # 캐릭터별 마지막 행 (일부 그룹만 수집한 회차가 마지막이어도 전원)
+        self.ranks = metrics.latest_ranking(self.latest) if not self.df.empty else pd.Series(dtype='int64')
+        self.rollups = {} # resolution -> (롤업 DataFrame, 행 번호 색인). 처음 요청될 때 읽음
+        self.cohorts = targets.read_cohorts(base) # 그룹 이름 -> 구성원
+        self.cohort_ranks = {}
+
+    def ranks_of(self, cohort=None):
+        """전체 순위 또는 그룹 안 순위 (없는 그룹이면 KeyError -> 400)"""
+        if not cohort:
+            return self.ranks
+        if cohort not in self.cohort_ranks:
+            self.cohort_ranks[cohort] = dashboard_data.cohort_ranks(self.ranks, self.cohorts[cohort])
+        return self.cohort_ranks[cohort]
+
+    def window(self, days=None, start=None, end=None):
+        """조회 구간 (KST). days 가 있으면 지금 기준 최근 N일 (대시보드의 조회 기간과 같은 기준)"""
+        if start is None and days is not None:
+            start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days) + KST_OFFSET
+        return start, end
+
+    def _slice(self, start, end):
+        """시간순 정렬을 이용해 [start, end] 행 범위만 잘라냄 (전체 행 비교 없음)"""
+        lo = 0 if start is None else np.searchsorted(self.times, np.datetime64(start), side='left')
+        hi = len(self.times) if end is None else np.searchsorted(self.times, np.datetime64(end), side='right')
+        return self.df.iloc[lo:hi]
+
+    def _rollup(self, resolution):
+        if resolution not in self.rollups:
+            df = dashboard_data.load_rollup(self.base, resolution)
+            df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+            self.rollups[resolution] = (df, df.groupby('nickname', sort=False, observed=True).indices)
+        return self.rollups[resolution]
+
+    def series(self, nicknames, start=None, end=None, resolution=None):
+        df, rows_of = (self.df, self.rows_of) if resolution is None else self._rollup(resolution)
+        positions = [rows_of[n] for n in nicknames if n in rows_of]
+        if not positions:
+            return df.iloc[0:0]
+        out = df.iloc[np.sort(np.concatenate(positions))]
+        if start is not None:
+            out = out[out['timestamp'] >= start]
+        if end is not None:
+            out = out[out['timestamp'] <= end]
+        return out
+
+    def character_metrics(self, start, end, target_level, nicknames=None, cohort=None):
+        window = self._slice(start, end) # 구간 밖 행은 미리 잘라서 넘김
+        return metrics.compute_character_metrics(
+            window, pd.Timestamp.min if start is None else start, pd.Timestamp.max if end is None else end,
+            exp_table.target_total_exp(target_level), self.ranks_of(cohort), nicknames
+        )
+
+# ==========================================
+# 2. 응답 캐시
+# ==========================================
+class ResponseCache:
+    """(경로, 쿼리) -> 응답을 만드는 Task. Task 를 넣어 두므로 계산 중인 같은 요청은 기다렸다가 결과를 같이 씀"""
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def get_or_create(self, key, factory):
+        task = self.entries.get(key)
+        failed = task is not None and task.done() and (task.cancelled() or task.exception() is not None)
+        if task is not None and not failed: # 실패한 응답은 캐시하지 않고 다시 계산
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return task
+        self.stats["misses"] += 1
+        task = self.entries[key] = asyncio.ensure_future(factory())
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evicted"] += 1
+        return task
+
+    def clear(self):
+        self.entries.clear()
+
+# ==========================================
+# 3. 서버
+# ==========================================
+def _query_days(query):
+    return float(query["days"]) if query.get("days") else None
+
+def _query_ts(query, name):
+    return pd.Timestamp(query[name]) if query.get(name) else None
+
+class HistoryApi:
+    def __init__(self, base, cache_size=CACHE_SIZE, refresh_sec=REFRESH_SEC):
+        self.base = base
+        self.loader = dashboard_data.IncrementalLoader(base, days=None, min_interval_sec=0)
+        self.refresh_sec = refresh_sec
+        self.cache = ResponseCache(cache_size)
+        self.index = None
+
+    async def refresh(self):
+        """새 수집분을 반영 -> 데이터가 바뀌었으면 색인을 다시 만들고 캐시를 비운 뒤 기본 요청을 미리 계산"""
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, self.loader.refresh)
+        if self.index is not None and df is self.index.source:
+            return False
+        version = (self.index.version + 1) if self.index is not None else 1
+        self.index = await loop.run_in_executor(None, HistoryIndex, df, self.base, version)
+        self.cache.clear()
+        for path, query in WARM_QUERIES:
+            await self.respond(path, query)
+        return True
+
+    async def refresh_forever(self):
+        while True:
+            await asyncio.sleep(self.refresh_sec)
+            try:
+                await self.refresh()
+            except Exception as e: # 저장소를 잠깐 못 읽어도 기존 데이터로 계속 응답
+                print(f"⚠️ 데이터 갱신 실패: {e!r}")
+
+    def respond(self, path, query):
+        """(경로, 쿼리) 에 대한 JSON 바이트 (캐시 우선, 계산은 스레드에서)"""
+        key = (path, tuple(sorted(query.items())))
+        index = self.index
+        build = getattr(self, "_build_" + path.strip("/"))
+        loop = asyncio.get_running_loop()
+        return self.cache.get_or_create(key, lambda: loop.run_in_executor(None, build, index, query))
+
+    # ---- 엔드포인트별 응답 생성 (query: 쿼리 문자열 dict, nickname 만 목록) ----
+    def _build_leaderboard(self, index, query):
+        ranks = index.ranks_of(query.get("cohort"))
+        board = index.latest.set_index('nickname').reindex(ranks.index).rename_axis('nickname').reset_index()
+        board.insert(0, 'rank', ranks.to_numpy())
+        meta = {"version": index.version, "first": _format_ts(index.df['timestamp'].min()), "latest": _format_ts(index.df['timestamp'].max())}
+        columns = ['rank', 'nickname', 'world', 'level', 'exp', 'total_exp', 'exp_percent', 'timestamp']
+        return _json_body(meta, _json_rows(board[columns]))
+
+    def _build_series(self, index, query):
+        start, end = index.window(_query_days(query), _query_ts(query, "start"), _query_ts(query, "end"))
+        resolution = query.get("resolution") or None
+        if resolution not in (None, "hourly", "daily"):
+            raise web.HTTPBadRequest(text=f"resolution 은 hourly / daily 중 하나: {resolution}")
+        df = index.series(query.get("nickname", []), start, end, resolution)
+        columns = ['timestamp', 'nickname', 'world', 'level', 'exp', 'total_exp', 'exp_percent']
+        if resolution is not None:
+            columns.append('speed')
+        return _json_body({"version": index.version, "resolution": resolution}, _json_rows(df[columns]))
+
+    def _build_metrics(self, index, query):
+        start, end = index.window(_query_days(query), _query_ts(query, "start"), _query_ts(query, "end"))
+        target_level = int(query.get("target_level") or DEFAULT_TARGET_LEVEL)
+        cohort = query.get("cohort")
+        ranks = index.ranks_of(cohort)
+        nicknames = query.get("nickname") or None
+        if nicknames is None:
+            nicknames = ranks.index[:int(query["top"])] if query.get("top") else (ranks.index if cohort else None)
+        m = index.character_metrics(start, end, target_level, nicknames, cohort)
+        meta = {"version": index.version, "target_level": target_level}
+        return _json_body(meta, _json_rows(m.rename_axis('nickname').reset_index()))
+
+    def _build_run_metrics(self, index, query):
+        lines = history_store.read_bytes(self.base, run_metrics.RUN_METRICS_NAME).decode("utf-8").splitlines()
+        reports = ",".join(line for line in lines if line.strip())
+        return _json_body({"version": index.version}, f"[{reports}]")
+
+    def _build_cohorts(self, index, query):
+        return _json_body({"version": index.version}, json.dumps(index.cohorts, ensure_ascii=False))
+
+    async def handle(self, request):
+        query = dict(request.query)
+        nicknames = request.query.getall("nickname", [])
+        if nicknames:
+            query["nickname"] = tuple(nicknames)
+        try:
+            body = await self.respond(request.path, query)
+        except (KeyError, ValueError) as e:
+            raise web.HTTPBadRequest(text=f"잘못된 요청: {e}")
+        except FileNotFoundError:
+            raise web.HTTPNotFound()
+        return web.Response(body=body, content_type="application/json")
+
+    async def health(self, request):
+        index = self.index
+        return web.json_response({
+            "version": index.version, "rows": len(index.df), "characters": len(index.rows_of),
+            "latest": _format_ts(index.df['timestamp'].max()) if not index.df.empty else None,
+            "cache": {**self.cache.stats, "entries": len(self.cache.entries)}, "loader": self.loader.stats,
+        })
+
+def build_app(base, cache_size=CACHE_SIZE, refresh_sec=REFRESH_SEC):
+    api = HistoryApi(base, cache_size, refresh_sec)
+
+    async def on_startup(app):
+        await api.refresh()
+        app["refresher"] = asyncio.ensure_future(api.refresh_forever())
+
+    async def on_cleanup(app):
+        app["refresher"].cancel()
+
+    app = web.Application()
+    app["api"] = api
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/health", api.health)
+    for path in ("/leaderboard", "/series", "/metrics", "/run_metrics", "/cohorts"):
+        app.router.add_get(path, api.handle)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="경험치 기록 조회 API 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--history", default=os.environ.get("HISTORY_URL", history_store.HISTORY_DIR),
+                        help="history/ 디렉터리 또는 raw.githubusercontent URL")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    parser.add_argument("--refresh-sec", type=float, default=REFRESH_SEC)
+    args = parser.parse_args()
+    print(f"📡 조회 API: http://{args.host}:{args.port} ({args.history})")
+    web.run_app(build_app(args.history, args.cache_size, args.refresh_sec),
+                host=args.host, port=args.port, access_log=None, print=None)
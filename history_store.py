@@ -0,0 +1,358 @@
+"""
+경험치 기록 저장소 (날짜별 파티션 Parquet)
+
+exp_history.csv 하나에 계속 이어 붙이던 방식을 대체함.
+    history/
+      manifest.json                      <- 파일 목록 + 파일별 시간 범위 (대시보드가 먼저 읽음)
+      date=2025-12-25/part-202512250900.parquet     <- 수집 30분 칸 1개 = 파일 1개 (같은 칸 재실행은 합침)
+      date=2025-12-24/data.parquet                  <- compact 후 하루 = 파일 1개
+      archive/manifest.json, month=2025-11.parquet  <- 보관 기간이 지난 원본 (retention.py, 대시보드는 읽지 않음)
+
+- nickname/world 는 dictionary 인코딩, level 은 int16, exp 는 int64
+- 시간은 기존 CSV와 같이 UTC 기준 (대시보드에서 +9 보정)
+- 대시보드는 manifest 로 조회 구간에 걸치는 파일만 내려받음
+- 수집기는 값이 바뀐 캐릭터만 값을 저장하고(poll_scheduler.py), 안 바뀐 캐릭터도 KEYFRAME_HOURS 마다 한 번은 저장.
+  이번 회차에 추적했지만 값이 그대로인 캐릭터는 level/exp 가 null 인 표시 행(marker)만 남김
+  -> 읽는 쪽은 carry_forward() 로 표시 행에만 직전 값을 채움 (회차에 없던 캐릭터 = 랭킹 이탈 / 조회 실패는 채우지 않음)
+
+사용법:
+    python history_store.py import [exp_history.csv]   # 기존 CSV 1회 변환
+    python history_store.py compact                    # 오늘 이전 파티션 병합
+"""
+import csv
+import io
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("TRACKER_DATA_DIR", BASE_DIR) # 벤치마크 등에서 저장 위치를 통째로 바꿀 때
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+FILE_LEGACY_CSV = os.path.join(BASE_DIR, "exp_history.csv")
+MANIFEST_NAME = "manifest.json"
+ARCHIVE_DIR = "archive" # history/ 안에서 오래된 원본을 월 단위로 모아 두는 곳 (retention.py)
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 값이 그대로인 캐릭터도 이 간격마다 한 번은 저장 -> 읽을 때 이보다 오래된 값은 이어 붙이지 않음
+KEYFRAME_HOURS = float(os.environ.get("KEYFRAME_HOURS", 6))
+
+# 스냅샷 ID 단위 (분). 수집 주기(30분)와 같게 두면 같은 칸의 중복 실행이 한 파일로 합쳐짐
+SNAPSHOT_SLOT_MINUTES = int(os.environ.get("SNAPSHOT_SLOT_MINUTES", 30))
+CARRY_FORWARD_LIMIT = timedelta(hours=KEYFRAME_HOURS + 1) # 수집 주기 지연 여유 1시간
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("s")),
+    ("nickname", pa.dictionary(pa.int32(), pa.string())),
+    ("world", pa.dictionary(pa.int8(), pa.string())),
+    ("level", pa.int16()),
+    ("exp", pa.int64()),
+])
+
+# ==========================================
+# 1. 매니페스트
+# ==========================================
+def load_manifest(history_dir=HISTORY_DIR):
+    path = os.path.join(history_dir, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return {"files": []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest, history_dir=HISTORY_DIR):
+    manifest["files"].sort(key=lambda e: (e["min_ts"], e["path"]))
+    path = os.path.join(history_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def _to_ts_str(value):
+    return value.strftime(TS_FORMAT) if isinstance(value, datetime) else value
+
+def select_files(manifest, start=None, end=None):
+    """[start, end] 구간과 겹치는 파일만 고름 (start/end 는 UTC 기준 datetime 또는 'YYYY-MM-DD HH:MM:SS')"""
+    start, end = _to_ts_str(start), _to_ts_str(end)
+    return [
+        e for e in manifest["files"]
+        if (end is None or e["min_ts"] <= end) and (start is None or e["max_ts"] >= start)
+    ]
+
+# ==========================================
+# 2. 쓰기
+# ==========================================
+def rows_to_table(rows, schema=SCHEMA):
+    """rows: schema 컬럼 순서의 튜플 목록 (기본: timestamp(datetime), nickname, world, level, exp)"""
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.Table.from_arrays(
+        [pa.array(col, type=field.type.value_type if pa.types.is_dictionary(field.type) else field.type).cast(field.type)
+         for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+def write_table(table, rel_path, history_dir=HISTORY_DIR, **options):
+    """테이블을 파일로 쓰고 매니페스트 항목을 반환 (options: pq.write_table 옵션, 기본은 zstd + dictionary 인코딩)"""
+    path = os.path.join(history_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, **{"compression": "zstd", "use_dictionary": True, **options})
+    os.replace(tmp_path, path)
+
+    ts = table.column("timestamp")
+    return {
+        "path": rel_path.replace(os.sep, "/"),
+        "min_ts": pc.min(ts).as_py().strftime(TS_FORMAT),
+        "max_ts": pc.max(ts).as_py().strftime(TS_FORMAT),
+        "rows": table.num_rows,
+        "bytes": os.path.getsize(path),
+    }
+
+def snapshot_slot(timestamp):
+    """수집 시각 -> 스냅샷 ID 가 되는 칸의 시작 시각 (SNAPSHOT_SLOT_MINUTES 단위 내림)"""
+    return timestamp.replace(minute=timestamp.minute - timestamp.minute % SNAPSHOT_SLOT_MINUTES, second=0, microsecond=0)
+
+def append_snapshot(rows, timestamp, history_dir=HISTORY_DIR, unchanged=()):
+    """
+    수집 1회분을 해당 날짜 파티션의 스냅샷 파일로 저장 (임시 파일에 쓰고 rename 이라 중간 상태가 남지 않음).
+    rows: 값을 저장할 (nickname, world, level, exp), unchanged: 추적했지만 값이 그대로인 (nickname, world) -> 표시 행
+    파일 이름이 30분 칸(snapshot_slot) 기준이라 같은 칸에서 다시 실행되면(수동 실행, 재시도) 기존 파일에 합침
+    -> 같은 닉네임은 새 값으로 교체되어 칸마다 캐릭터당 최대 1행 (여러 번 적용해도 결과가 같음).
+       표시 행은 같은 칸에 이미 있는 캐릭터를 덮어쓰지 않음 (그 값이 곧 '그대로'인 값)
+       합친 파일은 행 전체를 마지막 실행 시각으로 맞춤 (칸 하나 = 시각 하나, 앞 실행 행만 예전 시각에 남지 않도록)
+    """
+    stored = {r[0] for r in rows}
+    markers = [(timestamp, nickname, world, None, None) for nickname, world in unchanged if nickname not in stored]
+    table = rows_to_table([(timestamp, *r) for r in rows] + markers)
+    slot = snapshot_slot(timestamp)
+    rel_path = f"date={slot:%Y-%m-%d}/part-{slot:%Y%m%d%H%M}.parquet"
+
+    manifest = load_manifest(history_dir)
+    if any(e["path"] == rel_path for e in manifest["files"]):
+        old = pq.read_table(os.path.join(history_dir, rel_path), schema=SCHEMA)
+        old_names = pc.cast(old["nickname"], pa.string())
+        replaced = pc.is_in(old_names, value_set=pa.array(sorted(stored), pa.string()))
+        old = old.filter(pc.invert(replaced))
+        duplicate_marker = pc.and_(
+            pc.is_null(table["level"]), pc.is_in(pc.cast(table["nickname"], pa.string()), value_set=pc.cast(old["nickname"], pa.string()))
+        )
+        table = pa.concat_tables([old, table.filter(pc.invert(duplicate_marker))]).unify_dictionaries().combine_chunks()
+        stamp = max(timestamp, pc.max(old["timestamp"]).as_py() or timestamp)
+        table = table.set_column(0, "timestamp", pa.array([stamp] * table.num_rows, SCHEMA.field("timestamp").type))
+    entry = write_table(table, rel_path, history_dir)
+    manifest["files"] = [e for e in manifest["files"] if e["path"] != entry["path"]] + [entry]
+    save_manifest(manifest, history_dir)
+    return entry
+
+def compact(before_date=None, history_dir=HISTORY_DIR):
+    """
+    날짜 파티션 안의 part 파일들을 data.parquet 하나로 병합.
+    before_date('YYYY-MM-DD')가 주어지면 그 이전 날짜만 (오늘 파티션은 계속 쓰이므로 제외)
+    """
+    manifest = load_manifest(history_dir)
+    by_date = {}
+    for e in manifest["files"]:
+        by_date.setdefault(e["path"].split("/")[0], []).append(e)
+
+    merged = 0
+    for partition, entries in sorted(by_date.items()):
+        date = partition.split("=", 1)[1]
+        if (before_date and date >= before_date) or len(entries) < 2:
+            continue
+
+        tables = [pq.read_table(os.path.join(history_dir, e["path"]), schema=SCHEMA) for e in entries]
+        table = pa.concat_tables(tables).unify_dictionaries().sort_by("timestamp")
+        entry = write_table(table.combine_chunks(), f"{partition}/data.parquet", history_dir)
+
+        for e in entries:
+            if e["path"] != entry["path"]:
+                os.remove(os.path.join(history_dir, e["path"]))
+        manifest["files"] = [e for e in manifest["files"] if e not in entries] + [entry]
+        merged += len(entries)
+
+    if merged:
+        save_manifest(manifest, history_dir)
+    return merged
+
+def import_csv(csv_path=FILE_LEGACY_CSV, history_dir=HISTORY_DIR):
+    """기존 exp_history.csv 를 날짜별 data.parquet 로 1회 변환 (이미 있는 날짜는 덮어씀)"""
+    by_date = {}
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            ts = datetime.strptime(row["timestamp"], TS_FORMAT)
+            by_date.setdefault(ts.strftime("%Y-%m-%d"), []).append(
+                (ts, row["nickname"], row["world"], int(row["level"]), int(row["exp"]))
+            )
+
+    manifest = load_manifest(history_dir)
+    for date, rows in sorted(by_date.items()):
+        rows.sort(key=lambda r: (r[0], r[1]))
+        entry = write_table(rows_to_table(rows), f"date={date}/data.parquet", history_dir)
+        manifest["files"] = [e for e in manifest["files"] if e["path"] != entry["path"]] + [entry]
+        print(f"   - {date}: {len(rows)}건 -> {entry['bytes']:,} bytes")
+    save_manifest(manifest, history_dir)
+    return sum(len(rows) for rows in by_date.values())
+
+# ==========================================
+# 3. 읽기 (로컬 디렉터리 또는 raw.githubusercontent URL)
+# ==========================================
+def read_bytes(base, rel_path):
+    if base.startswith(("http://", "https://")):
+        with urllib.request.urlopen(f"{base}/{rel_path}", timeout=30) as res:
+            return res.read()
+    with open(os.path.join(base, rel_path), 'rb') as f:
+        return f.read()
+
+def read_manifest(base=HISTORY_DIR):
+    return json.loads(read_bytes(base, MANIFEST_NAME))
+
+def read_manifest_if_changed(base=HISTORY_DIR, validator=None):
+    """
+    매니페스트가 바뀌었을 때만 읽음 -> (manifest 또는 None, 새 validator)
+    URL이면 ETag / Last-Modified 조건부 요청(304면 본문 없음), 로컬이면 파일 수정 시각 비교
+    """
+    validator = validator or {}
+    if base.startswith(("http://", "https://")):
+        req = urllib.request.Request(f"{base}/{MANIFEST_NAME}")
+        if validator.get("etag"):
+            req.add_header("If-None-Match", validator["etag"])
+        if validator.get("last_modified"):
+            req.add_header("If-Modified-Since", validator["last_modified"])
+        try:
+            with urllib.request.urlopen(req, timeout=30) as res:
+                return json.loads(res.read()), {"etag": res.headers.get("ETag"), "last_modified": res.headers.get("Last-Modified")}
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, validator
+            raise
+
+    mtime = os.path.getmtime(os.path.join(base, MANIFEST_NAME))
+    if validator.get("mtime") == mtime:
+        return None, validator
+    return read_manifest(base), {"mtime": mtime}
+
+def mark_carried(table):
+    """
+    표시 행(level/exp 가 null) -> carried=True 컬럼 + 값 자리는 0 (carry_forward 가 직전 저장 값으로 채움).
+    정수 컬럼에 null 이 남으면 pandas 가 float 로 바꾸므로 읽을 때 바로 정리
+    """
+    carried = pc.is_null(table["level"])
+    table = table.set_column(table.schema.get_field_index("level"), "level", pc.fill_null(table["level"], 0))
+    table = table.set_column(table.schema.get_field_index("exp"), "exp", pc.fill_null(table["exp"], 0))
+    return table.append_column("carried", carried)
+
+def read_entries(base, entries, start=None, end=None, schema=SCHEMA):
+    """
+    매니페스트 항목들에 해당하는 파일을 읽어서 구간으로 잘라 pandas DataFrame 으로 반환
+    (스냅샷 스키마면 표시 행을 구분하는 carried 컬럼 포함, mark_carried 참고)
+    """
+    start_s, end_s = _to_ts_str(start), _to_ts_str(end)
+    tables = [pq.read_table(io.BytesIO(read_bytes(base, e["path"])), schema=schema) for e in entries]
+    if not tables:
+        return (mark_carried(schema.empty_table()) if schema is SCHEMA else schema.empty_table()).to_pandas()
+
+    table = pa.concat_tables(tables).unify_dictionaries()
+    if start_s is not None:
+        table = table.filter(pc.greater_equal(table["timestamp"], pa.scalar(datetime.strptime(start_s, TS_FORMAT), pa.timestamp("s"))))
+    if end_s is not None:
+        table = table.filter(pc.less_equal(table["timestamp"], pa.scalar(datetime.strptime(end_s, TS_FORMAT), pa.timestamp("s"))))
+    return (mark_carried(table) if schema is SCHEMA else table).to_pandas()
+
+def read_history(base=HISTORY_DIR, start=None, end=None, manifest=None):
+    """
+    구간에 걸치는 파일만 읽어서 pandas DataFrame 으로 반환.
+    start/end 는 UTC 기준 datetime 또는 문자열 (None이면 제한 없음)
+    """
+    if manifest is None:
+        manifest = read_manifest(base)
+    return read_entries(base, select_files(manifest, start, end), start, end)
+
+# ==========================================
+# 4. 변경분 저장 채우기
+# ==========================================
+def lead_in(start, limit=CARRY_FORWARD_LIMIT):
+    """
+    start 부터의 구간을 채우려면 읽어야 하는 시작 시각 (start 가 None 이면 None).
+    구간 시작 직후의 표시 행은 start 이전에 저장된 값으로 채우므로 limit 만큼 앞에서부터 읽고, 채운 뒤 start 로 자름
+    """
+    return None if start is None else start - limit
+
+def carry_forward(df, previous=None, limit=CARRY_FORWARD_LIMIT):
+    """
+    표시 행(carried=True, 추적했지만 값이 그대로인 캐릭터)에 직전 저장 값을 채움.
+    표시 행마다 그 시각 이전 limit 안에 저장된 같은 캐릭터의 값을 이어 붙이고, 못 찾으면 행을 버림.
+    회차에 저장 행도 표시 행도 없는 캐릭터(랭킹 이탈 / 조회 실패)는 그 회차에 행을 만들지 않음.
+    채운 행은 carried=True 로 남음 (다시 채울 때 원본으로 쓰지 않아서 limit 이 계속 늘어나지 않음)
+    previous: 앞 구간의 캐릭터별 마지막 저장 행 (last_stored() 결과) -> 새 구간만 채울 때 이어받음
+    """
+    import pandas as pd # 읽는 쪽(대시보드/롤업 재생성)에서만 사용 -> 수집기는 pandas 없이 실행
+
+    if df.empty:
+        return df.assign(carried=False)
+    source = df[~df['carried']] if 'carried' in df else df
+    if previous is not None and not previous.empty:
+        source = concat_frames([previous, source])
+    source = source.drop(columns='carried', errors='ignore').sort_values('timestamp', kind='stable', ignore_index=True)
+
+    # 채울 칸 = df 에 있는 행 (저장 행은 자기 자신과, 표시 행은 직전 저장 행과 맞춰짐)
+    grid = df[['timestamp', 'nickname']]
+    if isinstance(source['nickname'].dtype, pd.CategoricalDtype) and isinstance(grid['nickname'].dtype, pd.CategoricalDtype):
+        # merge_asof 의 by 컬럼은 카테고리 목록이 같아야 함 (저장 값이 없는 캐릭터는 NaN -> 제외)
+        grid = grid.assign(nickname=grid['nickname'].cat.set_categories(source['nickname'].cat.categories))
+        grid = grid[grid['nickname'].notna()]
+    grid = grid.sort_values('timestamp', kind='stable')
+
+    # 캐릭터별로 각 행 시각 직전(포함)에 저장된 행 번호를 찾음
+    matched = pd.merge_asof(
+        grid, source[['timestamp', 'nickname']].assign(row=np.arange(len(source))),
+        on='timestamp', by='nickname', tolerance=limit, direction='backward',
+    ).dropna(subset=['row'])
+    rows = matched['row'].to_numpy(dtype='int64')
+    filled = source.iloc[rows].copy()
+    filled['timestamp'] = matched['timestamp'].to_numpy()
+    filled['carried'] = source['timestamp'].to_numpy()[rows] != filled['timestamp'].to_numpy()
+    return filled.sort_values(['timestamp', 'nickname'], kind='stable', ignore_index=True)
+
+def concat_frames(frames):
+    """
+    pd.concat(ignore_index=True) 와 같지만 category 컬럼(nickname, world)은 category 로 유지.
+    카테고리 목록이 서로 다르면 pd.concat 은 문자열(object)로 풀어 버리므로, 앞 프레임 목록 뒤에 새 값만 덧붙여 맞춤
+    (앞 프레임의 코드는 그대로라서 문자열을 다시 해싱하지 않음)
+    """
+    import pandas as pd
+
+    frames = list(frames)
+    for column in frames[0].columns:
+        if not all(column in f and isinstance(f[column].dtype, pd.CategoricalDtype) for f in frames):
+            continue
+        categories = frames[0][column].cat.categories
+        for f in frames[1:]:
+            categories = categories.append(f[column].cat.categories.difference(categories))
+        frames = [f.assign(**{column: f[column].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def last_stored(df, previous=None):
+    """캐릭터별 마지막 저장 행 (채운 행 제외). previous 가 있으면 그 위에 df 를 덮어씀"""
+    stored = df[~df['carried']] if 'carried' in df else df
+    if previous is not None:
+        stored = concat_frames([previous, stored])
+    return stored.drop(columns='carried', errors='ignore').drop_duplicates('nickname', keep='last')
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "import":
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else FILE_LEGACY_CSV
+        print(f"📦 {csv_path} -> {HISTORY_DIR} 변환 중...")
+        print(f"-> 총 {import_csv(csv_path):,}건 변환 완료")
+    elif command == "compact":
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        print(f"🗜️ 파일 {compact(before_date=today)}개 병합 완료")
+    else:
+        print(__doc__)
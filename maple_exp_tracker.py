@@ -1,11 +1,28 @@
-import requests
-import csv
+import aiohttp
+import asyncio
 import os
+import sys
+import math
 import time
-from datetime import datetime, timedelta
+import contextlib
+from datetime import datetime, timedelta, timezone
 from urllib.parse import quote
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import pytz # timezone 처리를 위해 필요
+from zoneinfo import ZoneInfo # 표준 라이브러리 (Windows 는 tzdata 패키지 필요)
+import exp_table
+import history_store
+import retention
+import snapshot_writer
+import targets
+from ocid_cache import OcidCache
+from poll_scheduler import PollScheduler
+from run_metrics import RunMetrics
+from rate_limiter import RateLimiter, RETRYABLE_STATUS, MAX_RETRIES, parse_retry_after, backoff_delay, retry_after_too_long
+
+try:
+    import requests
+except ImportError: # 스레드풀 방식(collect_threaded, 벤치마크 비교용)에서만 사용. 수집기 설치에는 없음
+    requests = None
 
 # ==========================================
 # 1. 환경 설정
@@ -18,16 +35,22 @@ HEADERS = {
 }
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FILE_HISTORY = os.path.join(BASE_DIR, "exp_history.csv") # 소문자 통일
+HISTORY_DIR = history_store.HISTORY_DIR # 날짜별 Parquet 파티션 (기존 exp_history.csv 대체)
 
 MAX_WORKERS = 20 # 서버 부하 방지를 위해 조금 줄임
-RANKER_LIMIT_PER_WORLD = 50
-TARGET_WORLDS = ["챌린저스", "챌린저스2", "챌린저스3", "챌린저스4"]
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", 20)) # 비동기 엔진 동시 요청 수
+# targets.json 이 없을 때의 기본 추적 대상 (그룹 설정은 targets.py 참고)
+RANKER_LIMIT_PER_WORLD = int(os.environ.get("RANKER_LIMIT_PER_WORLD", 50)) # 월드별 추적 깊이 (200 초과 시 여러 페이지 조회)
+TARGET_WORLDS = [w.strip() for w in os.environ.get("TARGET_WORLDS", "챌린저스,챌린저스2,챌린저스3,챌린저스4").split(",") if w.strip()]
+RANKING_PAGE_SIZE = 200 # 랭킹 API 한 페이지당 인원
 
-# URL 설정
-URL_NEXON_RANKING = "https://open.api.nexon.com/maplestory/v1/ranking/overall"
-URL_NEXON_OCID = "https://open.api.nexon.com/maplestory/v1/id"
-URL_NEXON_BASIC = "https://open.api.nexon.com/maplestory/v1/character/basic"
+# URL 설정 (벤치마크용 스텁 서버를 가리킬 수 있도록 환경변수로 덮어쓰기 가능)
+URL_NEXON_BASE = os.environ.get("NEXON_API_BASE", "https://open.api.nexon.com/maplestory/v1")
+URL_NEXON_RANKING = f"{URL_NEXON_BASE}/ranking/overall"
+URL_NEXON_OCID = f"{URL_NEXON_BASE}/id"
+URL_NEXON_BASIC = f"{URL_NEXON_BASE}/character/basic"
+URL_NEXON_GUILD_ID = f"{URL_NEXON_BASE}/guild/id"
+URL_NEXON_GUILD_BASIC = f"{URL_NEXON_BASE}/guild/basic"
 
 # ==========================================
 # 2. 유틸리티 함수
@@ -38,8 +61,7 @@ def get_safe_ranking_date():
     넥슨 랭킹은 보통 오전 8시 30분에 갱신됨.
     따라서 00:00 ~ 08:30 사이에는 '어제' 랭킹도 없으므로 '그저께'를 조회해야 함.
     """
-    kst = pytz.timezone('Asia/Seoul')
-    now_kst = datetime.now(kst)
+    now_kst = datetime.now(ZoneInfo('Asia/Seoul'))
     
     # 오전 9시 이전이면 안전하게 2일 전 랭킹을 조회
     if now_kst.hour < 9:
@@ -47,6 +69,13 @@ def get_safe_ranking_date():
     else:
         return (now_kst - timedelta(days=1)).strftime("%Y-%m-%d")
 
+def print_top_progress(current_status, n=3):
+    """이번 회차 누적 경험치 상위 n명 출력 (레벨 테이블로 누적 경험치/퍼센트 환산)"""
+    ranked = sorted(current_status, key=lambda u: exp_table.to_total_exp(u['current_level'], u['current_exp']), reverse=True)
+    for i, u in enumerate(ranked[:n], 1):
+        percent = exp_table.exp_percent(u['current_level'], u['current_exp'])
+        print(f"   {i}위 {u['nickname']} Lv.{u['current_level']} ({percent:.3f}%)")
+
 # ==========================================
 # 3. Worker 함수들
 # ==========================================
@@ -62,8 +91,8 @@ def fetch_ocid_worker(row):
                 "world": row['world'],
                 "level": row['level']
             }
-    except:
-        pass
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ {row['nickname']} OCID 조회 실패 ({e})")
     return None
 
 def fetch_exp_worker(user):
@@ -79,65 +108,62 @@ def fetch_exp_worker(user):
         elif response.status_code == 400:
             # 혹시라도 날짜 필수라고 에러나면 로그 출력
             print(f"⚠️ {user['nickname']} 400 Error (Date Required?)")
-    except:
-        pass
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ {user['nickname']} 경험치 조회 실패 ({e})")
     return None
 
 # ==========================================
 # 4. 메인 로직
 # ==========================================
 def step1_fetch_rankings():
-    """각 월드별 상위 랭커 명단 수집"""
+    """각 월드별 상위 랭커 명단 수집 (페이지 순서대로)"""
     ranking_date = get_safe_ranking_date()
     print(f"1. 랭킹 시드 수집 중... (기준일: {ranking_date})")
     
     all_rankers = []
+    seen = set()
     
     for world in TARGET_WORLDS:
-        try:
-            # 랭킹 정보 요청
-            params = {"date": ranking_date, "world_name": world, "page": 1}
-            res = requests.get(URL_NEXON_RANKING, headers=HEADERS, params=params, timeout=10)
-            
-            if res.status_code == 200:
+        count = 0
+        for page in range(1, math.ceil(RANKER_LIMIT_PER_WORLD / RANKING_PAGE_SIZE) + 1):
+            try:
+                # 랭킹 정보 요청
+                params = {"date": ranking_date, "world_name": world, "page": page}
+                res = requests.get(URL_NEXON_RANKING, headers=HEADERS, params=params, timeout=10)
+                
+                if res.status_code != 200:
+                    print(f"   - {world} {page}p: 조회 실패 (Code {res.status_code})")
+                    break
                 data = res.json().get("ranking", [])
-                # 설정한 인원수만큼만 가져오기
-                for char in data[:RANKER_LIMIT_PER_WORLD]:
+            except Exception as e:
+                print(f"   - {world} {page}p: 에러 발생 ({e})")
+                break
+
+            # 설정한 인원수만큼만 가져오기
+            for char in data[:RANKER_LIMIT_PER_WORLD - count]:
+                if char['character_name'] not in seen:
+                    seen.add(char['character_name'])
                     all_rankers.append(char)
-                print(f"   - {world}: {len(data[:RANKER_LIMIT_PER_WORLD])}명 확보")
-            else:
-                print(f"   - {world}: 조회 실패 (Code {res.status_code})")
-        except Exception as e:
-            print(f"   - {world}: 에러 발생 ({e})")
+            count += len(data[:RANKER_LIMIT_PER_WORLD - count])
+            if len(data) < RANKING_PAGE_SIZE:
+                break # 마지막 페이지
+        print(f"   - {world}: {count}명 확보")
             
     return all_rankers
 
-def main():
-    # API 키 확인
-    if not API_KEY:
-        print("🚨 API Key가 없습니다. GitHub Secrets를 확인하세요.")
-        return
-
-    # 1. 랭킹 데이터 확보
+def collect_threaded():
+    """[기존 방식] ThreadPoolExecutor + requests.get 으로 1~3단계 수행 (벤치마크 비교용)"""
     raw_rankers = step1_fetch_rankings()
     if not raw_rankers:
-        print("❌ 랭킹 데이터를 가져오지 못했습니다. (점검 중이거나 날짜 문제)")
-        return
-    print(f"-> 총 {len(raw_rankers)}명의 랭커를 추적합니다.")
+        return []
 
-    # 2. OCID 변환
-    print("2. OCID 변환 중...")
     users_with_ocid = []
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         futures = [executor.submit(fetch_ocid_worker, {'nickname': r['character_name'], 'world': r['world_name'], 'level': r['character_level']}) for r in raw_rankers]
         for future in as_completed(futures):
             res = future.result()
             if res: users_with_ocid.append(res)
-    
-    print(f"-> {len(users_with_ocid)}명 OCID 확보 완료")
 
-    # 3. 실시간 경험치 조회
-    print("3. 실시간 경험치 조회 중...")
     current_status = []
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         futures = [executor.submit(fetch_exp_worker, u) for u in users_with_ocid]
@@ -145,36 +171,459 @@ def main():
             res = future.result()
             if res and 'current_exp' in res:
                 current_status.append(res)
-    
-    # 4. 데이터 저장
+    return current_status
+
+# ==========================================
+# 5. 비동기 수집 엔진 (aiohttp 세션 1개를 공유)
+# ==========================================
+async def fetch_json_async(session, limiter, url, params):
+    """
+    호출량 제한기를 거쳐 GET. 성공 시 (200, json), 실패 시 (status, None)
+    429 / 5xx / 네트워크 오류는 지수 백오프로 MAX_RETRIES 번까지 재시도 (Retry-After 가 너무 길면 바로 포기)
+    """
+    endpoint = url[len(URL_NEXON_BASE):] # 예: /character/basic
+    status = None
+    for attempt in range(MAX_RETRIES + 1):
+        retry_after = None
+        async with limiter:
+            t0 = time.perf_counter()
+            try:
+                async with session.get(url, params=params) as res:
+                    status = res.status
+                    if status == 200:
+                        data = await res.json(content_type=None)
+                        limiter.observe(endpoint, time.perf_counter() - t0, True)
+                        limiter.on_success()
+                        return status, data
+                    if status == 429:
+                        limiter.on_throttled()
+                    retry_after = parse_retry_after(res.headers.get("Retry-After"))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                status = None
+            limiter.observe(endpoint, time.perf_counter() - t0, False)
+
+        if status is not None and status not in RETRYABLE_STATUS:
+            break # 400/404 등은 재시도해도 결과가 같음
+        if retry_after_too_long(retry_after):
+            break # 한참 뒤에 오라는 응답 -> 이 회차에서는 포기 (다음 회차가 다시 수집)
+        if attempt < MAX_RETRIES:
+            limiter.stats["retried"] += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    limiter.stats["failed"] += 1
+    return status, None
+
+async def fetch_ranking_page_async(session, limiter, world, ranking_date, page, pages=None):
+    """월드 하나의 랭킹 한 페이지 조회. 실패 시 None (pages: 같은 기준일 랭킹 페이지 캐시, 데몬 모드)"""
+    if pages is not None and (world, page) in pages:
+        return pages[(world, page)]
+    params = {"date": ranking_date, "world_name": world, "page": page}
+    status, data = await fetch_json_async(session, limiter, URL_NEXON_RANKING, params)
+    if data is None:
+        print(f"   - {world} {page}p: 조회 실패 (Code {status})")
+        return None
+    rows = data.get("ranking", [])
+    if pages is not None:
+        pages[(world, page)] = rows
+    return rows
+
+async def fetch_ocid_async(session, limiter, nickname):
+    _, data = await fetch_json_async(session, limiter, URL_NEXON_OCID, {"character_name": nickname})
+    if not data:
+        return None
+    return data.get("ocid")
+
+async def track_user_async(session, limiter, ranker, cache):
+    """랭커 1명에 대해 OCID 변환(캐시 우선) -> 실시간 경험치 조회를 이어서 수행"""
+    user = {'nickname': ranker['character_name'], 'world': ranker['world_name'], 'level': ranker['character_level']}
+
+    ocid = cache.get(user['nickname'])
+    from_cache = ocid is not None
+    if not from_cache:
+        ocid = await fetch_ocid_async(session, limiter, user['nickname'])
+        if not ocid:
+            return None
+        cache.put(user['nickname'], ocid)
+
+    status, data = await fetch_json_async(session, limiter, URL_NEXON_BASIC, {"ocid": ocid})
+    if data is None and from_cache and status in (400, 404):
+        # 캐시된 OCID가 더 이상 유효하지 않을 수 있음 (닉변/삭제) -> 버리고 한 번 더 조회
+        # 429/5xx/시간 초과는 OCID 문제가 아니므로 캐시를 유지 (재조회가 호출량 제한에 부하만 더함)
+        cache.invalidate(user['nickname'])
+        ocid = await fetch_ocid_async(session, limiter, user['nickname'])
+        if not ocid:
+            return None
+        cache.put(user['nickname'], ocid)
+        status, data = await fetch_json_async(session, limiter, URL_NEXON_BASIC, {"ocid": ocid})
+
+    if data is None:
+        if status == 400:
+            print(f"⚠️ {user['nickname']} 400 Error (Date Required?)")
+        return None
+    user['ocid'] = ocid
+    user['world'] = data.get("world_name") or user['world'] # 관심 목록 캐릭터는 조회해야 월드를 앎
+    user['current_level'] = int(data.get("character_level", 0))
+    user['current_exp'] = int(data.get("character_exp", 0))
+    return user
+
+async def world_pipeline_async(session, limiter, world, ranking_date, cache, seen, scheduler=None, now=None,
+                               limit=None, ranking_pages=None):
+    """
+    월드 하나의 랭킹 페이지들을 동시에 요청하고, 도착한 페이지부터 바로 OCID/경험치 조회를 시작
+    - limit(기본 RANKER_LIMIT_PER_WORLD) 명까지만 추적하고, 마지막 페이지를 만나면 뒤 페이지 요청은 취소
+    - seen 으로 여러 페이지/월드에 중복 등장한 캐릭터는 한 번만 추적
+    - scheduler 가 이번 회차에 건너뛰라고 한 캐릭터는 조회 없이 직전 값을 이어 씀
+    반환: (확보 인원, 수집 결과, 실패한 랭커, 랭킹 순서의 닉네임 목록 (다른 월드와 겹친 캐릭터 포함))
+    """
+    limit = limit or RANKER_LIMIT_PER_WORLD
+    page_count = math.ceil(limit / RANKING_PAGE_SIZE)
+    page_of = {
+        asyncio.ensure_future(fetch_ranking_page_async(session, limiter, world, ranking_date, page, ranking_pages)): page
+        for page in range(1, page_count + 1)
+    }
+    last_page = page_count
+    rankers, user_tasks, carried, ranked = [], [], [], []
+
+    pending = set(page_of)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            page = page_of[task]
+            if task.cancelled() or page > last_page:
+                continue
+            rows = task.result()
+            if rows is None:
+                continue
+            if len(rows) < RANKING_PAGE_SIZE:
+                # 랭킹 끝에 도달 -> 더 뒤 페이지는 필요 없음
+                last_page = page
+                for t in pending:
+                    if page_of[t] > page:
+                        t.cancel()
+
+            offset = (page - 1) * RANKING_PAGE_SIZE
+            for i, ranker in enumerate(rows[:max(0, limit - offset)]):
+                ranked.append((offset + i, ranker['character_name']))
+                if ranker['character_name'] in seen:
+                    continue
+                seen.add(ranker['character_name'])
+                if scheduler is not None and not scheduler.should_poll(ranker['character_name'], ranker['character_level'], now):
+                    carried.append(scheduler.carried_user(ranker))
+                    continue
+                rankers.append(ranker)
+                user_tasks.append(asyncio.ensure_future(track_user_async(session, limiter, ranker, cache)))
+
+    print(f"   - {world}: {len(rankers) + len(carried)}명 확보" + (f" (조회 생략 {len(carried)}명)" if carried else ""))
+    results = await asyncio.gather(*user_tasks)
+    failed = [r for r, res in zip(rankers, results) if res is None]
+    return len(rankers) + len(carried), [r for r in results if r] + carried, failed, [name for _, name in sorted(ranked)]
+
+async def names_pipeline_async(session, limiter, label, nicknames, cache, seen, scheduler=None, now=None):
+    """
+    이름으로 지정한 캐릭터들 (관심 목록 / 길드원) 을 랭킹 없이 바로 추적. 반환 형태는 world_pipeline_async 와 같음
+    월드 / 레벨은 조회 전에는 모르므로 직전 상태 값을 쓰고, 조회하면 /character/basic 응답 값으로 바뀜
+    """
+    rankers, user_tasks, carried = [], [], []
+    for nickname in nicknames:
+        if nickname in seen:
+            continue
+        seen.add(nickname)
+        entry = scheduler.entries.get(nickname, {}) if scheduler is not None else {}
+        ranker = {'character_name': nickname, 'world_name': entry.get("world", ""), 'character_level': entry.get("level", 0)}
+        if scheduler is not None and not scheduler.should_poll(nickname, None, now): # 랭킹 레벨이 없음
+            carried.append(scheduler.carried_user(ranker))
+            continue
+        rankers.append(ranker)
+        user_tasks.append(asyncio.ensure_future(track_user_async(session, limiter, ranker, cache)))
+
+    print(f"   - {label}: {len(rankers) + len(carried)}명 확보" + (f" (조회 생략 {len(carried)}명)" if carried else ""))
+    results = await asyncio.gather(*user_tasks)
+    failed = [r for r, res in zip(rankers, results) if res is None]
+    return len(rankers) + len(carried), [r for r in results if r] + carried, failed, list(nicknames)
+
+async def fetch_guild_members_async(session, limiter, guild, world, pages=None):
+    """길드원 닉네임 목록 (/guild/id -> /guild/basic). 실패 시 None (pages: 같은 기준일 캐시, 데몬 모드)"""
+    key = ("guild", world, guild)
+    if pages is not None and key in pages:
+        return pages[key]
+    status, data = await fetch_json_async(session, limiter, URL_NEXON_GUILD_ID, {"guild_name": guild, "world_name": world})
+    if data and data.get("oguild_id"):
+        status, data = await fetch_json_async(session, limiter, URL_NEXON_GUILD_BASIC, {"oguild_id": data["oguild_id"]})
+    if not data or "guild_member" not in data:
+        print(f"   - 길드 {guild}({world}): 조회 실패 (Code {status})")
+        return None
+    members = list(data["guild_member"])
+    if pages is not None:
+        pages[key] = members
+    return members
+
+async def guild_pipeline_async(session, limiter, cohort, cache, seen, scheduler=None, now=None, pages=None, previous=()):
+    """길드원 목록을 받아서 names_pipeline_async 로 추적 (목록 조회에 실패하면 지난 구성원으로)"""
+    members = await fetch_guild_members_async(session, limiter, cohort.guild, cohort.world, pages)
+    if members is None:
+        members = list(previous)
+    return await names_pipeline_async(session, limiter, f"길드 {cohort.guild}", members, cache, seen, scheduler, now)
+
+def new_session():
+    """keep-alive 커넥션을 재사용해서 매 요청마다 TLS 핸드셰이크를 하지 않도록 함"""
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENCY, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=10)
+    return aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout)
+
+class WarmSession:
+    """
+    데몬 모드에서 회차 사이에 유지하는 비동기 엔진 상태 (collector_daemon.py)
+    - aiohttp 세션(커넥션 풀)과 호출량 제한기(429 로 낮춘 속도 포함)를 그대로 재사용
+    - 랭킹은 하루 한 번 갱신되므로 같은 기준일의 랭킹 페이지는 메모리에 두고 다시 조회하지 않음
+    """
+
+    def __init__(self):
+        self.session = None
+        self.limiter = None
+        self.ranking_date = None
+        self.ranking_pages = {} # (world, page) -> 랭킹 행 목록, ("guild", world, guild) -> 길드원 목록
+
+    def open(self, ranking_date, metrics):
+        """이번 회차에 쓸 (session, limiter). 이벤트 루프 안에서 호출"""
+        if self.session is None or self.session.closed:
+            self.session = new_session()
+        if self.limiter is None:
+            self.limiter = RateLimiter(max_concurrency=MAX_CONCURRENCY)
+        self.limiter.metrics = metrics
+        self.limiter.reset_stats()
+        if ranking_date != self.ranking_date:
+            self.ranking_date, self.ranking_pages = ranking_date, {}
+        return self.session, self.limiter
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+def world_limits(cohorts, limit=None):
+    """월드 그룹들 -> 월드별 랭킹 조회 깊이 (같은 월드는 가장 큰 limit, limit 이 있으면 그 이하로)"""
+    limits = {}
+    for cohort in cohorts:
+        if cohort.kind != "worlds":
+            continue
+        depth = cohort.limit or RANKER_LIMIT_PER_WORLD
+        if limit:
+            depth = min(depth, limit)
+        for world in cohort.worlds:
+            limits[world] = max(limits.get(world, 0), depth)
+    return limits
+
+def cohort_members(cohort, names_of):
+    """이번 회차 결과로 본 그룹 구성원 (names_of: 월드 / 길드 -> 닉네임 목록)"""
+    if cohort.kind == "worlds":
+        depth = cohort.limit or RANKER_LIMIT_PER_WORLD
+        return [name for world in cohort.worlds for name in names_of.get(world, [])[:depth]]
+    if cohort.kind == "guild":
+        return names_of.get(("guild", cohort.world, cohort.guild), [])
+    return cohort.nicknames
+
+async def collect_async(cache=None, scheduler=None, metrics=None, warm=None, limit=None, registry=None, cohort_state=None):
+    """
+    1~3단계를 하나의 커넥션 풀 위에서 파이프라인으로 수행 (scheduler 가 있으면 조회 주기 적용)
+    warm: 데몬 모드의 WarmSession (없으면 이번 호출용 세션을 만들고 끝나면 닫음)
+    registry: 추적 대상 그룹 (targets.py, 없으면 targets.json / TARGET_WORLDS 에서 로드)
+    cohort_state: 그룹별 마지막 수집 시각 / 구성원 (history/cohorts.json). 주기가 된 그룹만 수집하고 여기에 기록
+    limit: 월드별 추적 인원 상한 (데몬의 빠른 수집). 있으면 월드 그룹만 수집하고 그룹 상태는 그대로 둠
+           (나머지 그룹 구성원은 scheduler 의 직전 값을 이어 써서 스냅샷에 전원이 남음)
+    """
+    if cache is None:
+        cache = OcidCache().load()
+    if metrics is None:
+        metrics = RunMetrics()
+    if registry is None:
+        registry = targets.load_registry(worlds=TARGET_WORLDS, limit=RANKER_LIMIT_PER_WORLD)
+    if cohort_state is None:
+        cohort_state = {}
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if limit:
+        cohorts = [c for c in registry.cohorts if c.kind == "worlds"]
+    else:
+        cohorts = registry.due(now, cohort_state)
+    limits = world_limits(cohorts, limit)
+    ranking_date = get_safe_ranking_date()
+    print(f"1~3. 랭킹 -> OCID -> 경험치 동시 수집 중... (기준일: {ranking_date}, 그룹 {len(cohorts)}/{len(registry.cohorts)}개, "
+          f"월드 {len(limits)}개, 동시 요청 {MAX_CONCURRENCY})")
+
+    async with contextlib.AsyncExitStack() as stack:
+        if warm is None:
+            limiter = RateLimiter(max_concurrency=MAX_CONCURRENCY, metrics=metrics)
+            session = await stack.enter_async_context(new_session())
+            ranking_pages = None
+        else:
+            session, limiter = warm.open(ranking_date, metrics)
+            ranking_pages = warm.ranking_pages
+
+        # 모든 그룹이 seen 을 같이 써서 여러 그룹에 있는 캐릭터도 한 번만 조회
+        seen = set()
+        pipelines, keys = [], []
+        for world, depth in limits.items():
+            pipelines.append(world_pipeline_async(session, limiter, world, ranking_date, cache, seen, scheduler, now, depth, ranking_pages))
+            keys.append(world)
+        for cohort in cohorts:
+            if cohort.kind == "nicknames":
+                pipelines.append(names_pipeline_async(session, limiter, cohort.name, cohort.nicknames, cache, seen, scheduler, now))
+                keys.append(cohort.name)
+            elif cohort.kind == "guild":
+                previous = cohort_state.get(cohort.name, {}).get("members", [])
+                pipelines.append(guild_pipeline_async(session, limiter, cohort, cache, seen, scheduler, now, ranking_pages, previous))
+                keys.append(("guild", cohort.world, cohort.guild))
+        with metrics.stage("collect"):
+            results = await asyncio.gather(*pipelines)
+
+        total_rankers = sum(n for n, _, _, _ in results)
+        if not total_rankers:
+            print("❌ 랭킹 데이터를 가져오지 못했습니다. (점검 중이거나 날짜 문제)")
+            return []
+        current_status = [u for _, users, _, _ in results for u in users]
+        if not limit:
+            names_of = {key: names for key, (_, _, _, names) in zip(keys, results)}
+            for cohort in cohorts:
+                targets.update_cohort_state(cohort_state, cohort, cohort_members(cohort, names_of), now)
+
+        # 실패한 캐릭터는 마지막에 한 번 더 시도해서 스냅샷 구멍을 줄임
+        failed = [r for _, _, rankers, _ in results for r in rankers]
+        if failed:
+            print(f"   - 실패한 {len(failed)}명 재시도 중...")
+            with metrics.stage("retry"):
+                retried = await asyncio.gather(*(track_user_async(session, limiter, r, cache) for r in failed))
+            current_status += [u for u in retried if u]
+            limiter.stats["dropped"] = sum(1 for u in retried if u is None)
+
+    if limit and scheduler is not None:
+        # 빠른 상위 수집도 스냅샷 하나에 추적 중인 전원이 남도록, 이번에 보지 않은 그룹 구성원은 직전 값을 이어 씀 (표시 행)
+        collected = {u['nickname'] for u in current_status}
+        tracked = dict.fromkeys(name for state in cohort_state.values() for name in state.get("members", []))
+        current_status += scheduler.carried_users(name for name in tracked if name not in collected)
+
+    carried = sum(1 for u in current_status if not u.get('polled', True))
+    metrics.count(
+        ranker_limit=max(limits.values(), default=0), cohorts=len(cohorts), rankers=total_rankers, collected=len(current_status),
+        polled=len(current_status) - carried, carried=carried,
+        ocid_cache_hits=cache.hits, **{f"api_{k}": v for k, v in limiter.stats.items()},
+    )
+    print(f"-> 랭커 {total_rankers}명 중 {len(current_status)}명 경험치 확보")
+    print(f"   {cache.summary()}")
+    print(f"   {limiter.summary()}")
+    return current_status
+
+def _to_rows(users):
+    return [(user['nickname'], user['world'], user['current_level'], user['current_exp']) for user in users]
+
+def save_snapshot(current_status, scheduler=None, metrics=None):
+    """
+    4. 수집 결과를 history/ 저장소의 오늘 날짜 파티션에 추가
+    scheduler 가 있으면 값이 바뀐 캐릭터(+ keyframe 주기가 된 캐릭터)만 저장
+    """
+    if metrics is None:
+        metrics = RunMetrics()
     if current_status:
-        print(f"4. 데이터 {len(current_status)}건 저장 중...")
-        
-        file_exists = os.path.isfile(FILE_HISTORY)
         # UTC 시간으로 저장 (app.py에서 +9 보정하므로)
-        now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        to_store = scheduler.record(current_status, now) if scheduler is not None else current_status
+        print(f"4. 데이터 {len(to_store)}건 저장 중... (수집 {len(current_status)}건)")
+        metrics.count(stored=len(to_store))
         
         try:
-            with open(FILE_HISTORY, 'a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                
-                # 파일이 없으면 헤더 작성
-                if not file_exists:
-                    writer.writerow(["timestamp", "nickname", "world", "level", "exp"])
-                    
-                for user in current_status:
-                    writer.writerow([
-                        now_str,
-                        user['nickname'],
-                        user['world'],
-                        user['current_level'],
-                        user['current_exp']
-                    ])
-            print("💾 exp_history.csv 저장 완료!")
+            # journal 에 먼저 기록한 뒤 저장소 + 시간/일 롤업(이어 쓴 값까지 전원)에 적용
+            with metrics.stage("save_history"):
+                entry = snapshot_writer.commit_snapshot(_to_rows(to_store), _to_rows(current_status), now, HISTORY_DIR)
+            if entry:
+                print(f"💾 {entry['path']} 저장 완료! ({entry['bytes']:,} bytes)")
+
+            # 지난 날짜 파티션은 파일 하나로 병합
+            with metrics.stage("compact"):
+                merged = history_store.compact(before_date=now.strftime("%Y-%m-%d"), history_dir=HISTORY_DIR)
+            if merged:
+                print(f"🗜️ 지난 파티션 파일 {merged}개 병합")
         except Exception as e:
             print(f"❌ 파일 저장 실패: {e}")
     else:
         print("⚠️ 저장할 데이터가 없습니다.")
 
+async def run_collection_async(cache=None, scheduler=None, warm=None, limit=None):
+    """
+    수집 1회 (잠금을 잡은 상태에서 호출)
+    데몬 모드는 cache / scheduler / warm 을 회차 사이에 메모리에 들고 있다가 넘겨줌 (없으면 파일에서 로드)
+    추적 대상(targets.json)은 회차마다 다시 읽으므로 데몬을 재시작하지 않아도 설정 변경이 반영됨
+    """
+    recovered = snapshot_writer.recover(HISTORY_DIR)
+    if recovered:
+        print(f"🩹 중단됐던 {recovered} 회차 저장을 마저 적용했습니다.")
+
+    metrics = RunMetrics()
+
+    # 1~3. 랭킹 -> OCID -> 실시간 경험치 (비동기 파이프라인, OCID는 캐시 우선)
+    with metrics.stage("load_state"):
+        if cache is None:
+            cache = OcidCache().load()
+        if scheduler is None:
+            scheduler = PollScheduler().load()
+        registry = targets.load_registry(worlds=TARGET_WORLDS, limit=RANKER_LIMIT_PER_WORLD)
+        cohort_state = targets.load_cohort_state(HISTORY_DIR)
+    current_status = await collect_async(cache, scheduler, metrics, warm, limit, registry, cohort_state)
+    try:
+        cache.save()
+    except OSError as e:
+        print(f"⚠️ OCID 캐시 저장 실패: {e}")
+
+    print_top_progress(current_status)
+
+    # 4. 데이터 저장 (바뀐 값만). 저장/변화 없음 건수는 save_snapshot 의 scheduler.record 에서 세므로 그 뒤에 출력
+    save_snapshot(current_status, scheduler, metrics)
+    print(f"   {scheduler.summary()}")
+    try:
+        scheduler.save()
+    except OSError as e:
+        print(f"⚠️ 조회 주기 상태 저장 실패: {e}")
+    if current_status:
+        try:
+            targets.save_cohort_state(cohort_state, registry, HISTORY_DIR)
+        except OSError as e:
+            print(f"⚠️ 그룹 상태 저장 실패: {e}")
+
+        # 5. 보관 정책 (하루 한 번: 오래된 원본 -> 아카이브, 오래된 시간 롤업 삭제, 그룹 보관 기간 적용)
+        try:
+            with metrics.stage("retention"):
+                policy = retention.RetentionPolicy.from_registry(registry, cohort_state)
+                result = retention.run_daily(policy, datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0), HISTORY_DIR)
+            if result:
+                metrics.count(**{f"retention_{k}": v for k, v in result.items()})
+                print(f"🧹 보관 정책: {retention.summarize(result)}")
+        except Exception as e:
+            print(f"❌ 보관 정책 적용 실패: {e}")
+
+    # 6. 실행 계측 보고서 (대시보드 '수집기 상태' 패널)
+    print(f"⏱️ {metrics.summary()}")
+    try:
+        metrics.write()
+    except OSError as e:
+        print(f"⚠️ 실행 계측 저장 실패: {e}")
+
+def run_collection():
+    """수집 1회 (GitHub Actions 처럼 매번 새 프로세스로 실행하는 경우)"""
+    asyncio.run(run_collection_async())
+
+def main():
+    # API 키 확인
+    if not API_KEY:
+        print("🚨 API Key가 없습니다. GitHub Secrets를 확인하세요.")
+        return
+
+    # 같은 머신에서 겹친 실행은 순서대로 (저장소/상태 파일을 동시에 쓰지 않도록)
+    try:
+        with snapshot_writer.collector_lock():
+            run_collection()
+    except TimeoutError as e:
+        print(f"🔒 {e}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python maple_exp_tracker.py daemon --every 30 ... : 상주 모드 (collector_daemon.py 참고)
+    if sys.argv[1:2] == ["daemon"]:
+        import collector_daemon
+        collector_daemon.main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,109 @@
+"""
+캐릭터별 속도 / 목표 레벨 ETA / 역전 예상 집계
+
+닉네임마다 df 를 다시 필터링하던 반복문 대신, 구간 데이터를 한 번 정렬하고 groupby 한 번으로
+모든 캐릭터의 시작/끝 스냅샷을 뽑아서 계산함. 문자열 포맷은 화면에 그릴 때만 (format_* 함수).
+"""
+import numpy as np
+import pandas as pd
+
+import exp_table
+
+MIN_HOURS = 0.001 # 시작/끝 시각이 같을 때 0으로 나누지 않도록
+
+def latest_rows(df):
+    """
+    캐릭터별 마지막 행.
+    그룹별 주기 / 빠른 상위 수집 회차는 일부 캐릭터만 저장하므로 가장 최근 시각의 스냅샷만 보면 나머지가 빠짐
+    """
+    return df.loc[df['timestamp'].groupby(df['nickname'], sort=False, observed=True).idxmax()]
+
+def latest_ranking(df):
+    """캐릭터별 마지막 행 기준 누적 경험치 순위 -> nickname 을 인덱스로 하는 순위 Series (1부터)"""
+    latest = latest_rows(df)
+    ordered = latest.sort_values('total_exp', ascending=False, kind='stable')['nickname']
+    return pd.Series(np.arange(1, len(ordered) + 1), index=ordered.to_numpy(), name='rank')
+
+def compute_character_metrics(df, start, end, target_exp, ranks, nicknames=None):
+    """
+    [start, end] 구간의 캐릭터별 지표를 한 번에 계산.
+    ranks: latest_ranking() 결과, nicknames: 대상 캐릭터 (None이면 ranks 전체)
+    반환: nickname 인덱스, 순위 오름차순 DataFrame
+      rank, level, exp_percent, current_total_exp, gained_exp, speed, speed_percent,
+      hours_to_target(달성=0, 멈춤=inf), target_nickname, target_rank, gap, hours_to_overtake,
+      estimated(구간 시작/끝 레벨이 경험치 테이블 추정 구간 -> 누적 경험치 / 퍼센트 / ETA 가 추정치, exp_table.is_exact)
+    """
+    if nicknames is None:
+        nicknames = ranks.index
+    window = df[(df['timestamp'] >= start) & (df['timestamp'] <= end) & df['nickname'].isin(nicknames)]
+    window = window.sort_values('timestamp', kind='stable')
+
+    grouped = window.groupby('nickname', sort=False, observed=True)
+    m = grouped.agg(
+        first_ts=('timestamp', 'first'),
+        last_ts=('timestamp', 'last'),
+        first_exp=('total_exp', 'first'),
+        current_total_exp=('total_exp', 'last'),
+        first_level=('level', 'first'),
+        level=('level', 'last'),
+        exp_percent=('exp_percent', 'last'),
+        points=('timestamp', 'size'),
+    )
+    m = m[m['points'] >= 2]
+    m['rank'] = ranks.reindex(m.index).fillna(999).astype(int)
+    m = m.sort_values('rank')
+
+    hours = ((m['last_ts'] - m['first_ts']).dt.total_seconds() / 3600).replace(0, MIN_HOURS)
+    m['gained_exp'] = m['current_total_exp'] - m['first_exp']
+    m['speed'] = m['gained_exp'] / hours
+    m['speed_percent'] = exp_table.exp_percent(m['level'].to_numpy(), m['speed'].to_numpy())
+    m['estimated'] = ~(exp_table.is_exact(m['first_level'].to_numpy()) & exp_table.is_exact(m['level'].to_numpy()))
+
+    remaining = target_exp - m['current_total_exp']
+    m['hours_to_target'] = np.where(
+        remaining <= 0, 0.0,
+        np.where(m['speed'] > 0, remaining / m['speed'].where(m['speed'] > 0, 1), np.inf)
+    )
+
+    # 바로 윗 순위(지표가 있는 캐릭터 중)와 비교
+    above = m[['current_total_exp', 'speed', 'rank']].shift(1)
+    m['target_nickname'] = pd.Series(m.index, index=m.index).shift(1)
+    m['target_rank'] = above['rank']
+    m['gap'] = above['current_total_exp'] - m['current_total_exp']
+    speed_gap = m['speed'] - above['speed']
+    m['hours_to_overtake'] = np.where((m['gap'] > 0) & (speed_gap > 0), m['gap'] / speed_gap.where(speed_gap > 0, 1), np.nan)
+    m['speed_gap'] = speed_gap
+
+    return m.drop(columns=['first_ts', 'last_ts', 'first_exp', 'first_level', 'points'])
+
+# ==========================================
+# 표시용 포맷 (렌더링하는 행에만 사용)
+# ==========================================
+def format_eta(hours_to_target):
+    if hours_to_target == 0:
+        return "🎉 달성 완료!"
+    if not np.isfinite(hours_to_target):
+        return "측정 불가 (멈춤)"
+    days_left = int(hours_to_target // 24)
+    if days_left > 999: # 너무 오래 걸리면
+        return "측정 불가 (너무 느림)"
+    return f"D-{days_left}일 {int(hours_to_target % 24)}시간"
+
+def format_overtake(row):
+    if pd.isna(row['target_nickname']):
+        return "독주 중 👑"
+    if row['gap'] <= 0:
+        return "이미 역전함"
+    if not row['speed_gap'] > 0:
+        return "추월 불가 (느림)"
+
+    hours_needed = row['hours_to_overtake']
+    days = int(hours_needed // 24)
+    rem_hours = int(hours_needed % 24)
+    mins = int((hours_needed * 60) % 60)
+
+    time_str = []
+    if days > 0: time_str.append(f"{days}일")
+    if rem_hours > 0: time_str.append(f"{rem_hours}시간")
+    time_str.append(f"{mins}분")
+    return " ".join(time_str) + " 후"
@@ -0,0 +1,211 @@
+"""
+로컬 Nexon Open API 대역 서버 (벤치마크 / 회귀 테스트용, 네트워크 불필요)
+
+수집기가 쓰는 엔드포인트만 흉내냄:
+    /ranking/overall?date=&world_name=&page=   <- 월드당 population 명, 페이지당 200명
+    /id?character_name=                        <- 랭킹에 있는 이름만 OCID 발급 (없으면 400)
+    /character/basic?ocid=                     <- 레벨/경험치. active 비율의 캐릭터는 시간이 지나면 경험치가 오름
+    /guild/id?guild_name=&world_name=          <- 아무 길드 이름이나 발급
+    /guild/basic?oguild_id=                    <- 길드원 GUILD_SIZE 명 (길드 이름 해시로 정한 연속 순위 구간)
+
+응답 지연(latency ± jitter), 무작위 5xx(error_rate), 무작위 429(throttle_rate),
+초당 호출 한도(rate_limit, 넘으면 429 + Retry-After)를 조절할 수 있음.
+캐릭터 값은 seed 와 이름으로 정해지므로 같은 설정이면 몇 번을 띄워도 같은 데이터가 나옴.
+
+사용법:
+    python mock_nexon_api.py --port 18080 --population 100000 --latency 0.05 --error-rate 0.01
+    NEXON_API_BASE=http://127.0.0.1:18080 python maple_exp_tracker.py
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+from aiohttp import web
+
+import exp_table
+
+PAGE_SIZE = 200
+GUILD_SIZE = 200
+OCID_PREFIX = "mock-"
+
+class MockWorld:
+    """캐릭터 값 계산 (요청마다 메모리에 들고 있지 않고 이름 해시로 바로 계산)"""
+
+    def __init__(self, population, active_ratio, seed):
+        self.population = population
+        self.active_ratio = active_ratio
+        self.seed = seed
+        self.started_at = time.monotonic()
+
+    def _hash(self, name):
+        digest = hashlib.blake2b(f"{self.seed}:{name}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def name_of(self, world, index):
+        return f"{world}_{index}"
+
+    def parse_name(self, name):
+        """이름 -> (world, index). 랭킹에 없는 이름이면 None"""
+        world, _, index = name.rpartition("_")
+        if not world or not index.isdigit() or int(index) >= self.population:
+            return None
+        return world, int(index)
+
+    def total_exp(self, world, index):
+        """랭킹 순위(index)가 낮을수록 누적 경험치가 큼 + active 캐릭터는 초당 일정량씩 증가"""
+        h = self._hash(self.name_of(world, index))
+        top = int(exp_table.LEVEL_BASE_EXP[285])
+        floor = int(exp_table.LEVEL_BASE_EXP[260])
+        total = top - (top - floor) * index // max(self.population, 1)
+        total += h % (int(exp_table.LEVEL_REQ_EXP[275]) // 100)
+        if (h >> 32) % 1000 < self.active_ratio * 1000:
+            per_sec = int(exp_table.LEVEL_REQ_EXP[280]) // 36000 # 약 1%/분 수준
+            total += int((time.monotonic() - self.started_at) * per_sec)
+        return total
+
+    def guild_members(self, world, guild):
+        start = self._hash(f"guild:{guild}") % max(self.population - GUILD_SIZE, 1)
+        return [self.name_of(world, i) for i in range(start, min(start + GUILD_SIZE, self.population))]
+
+    def character(self, world, index):
+        total = self.total_exp(world, index)
+        level = int(exp_table.from_total_exp(total)[0])
+        return level, total - int(exp_table.LEVEL_BASE_EXP[level])
+
+class ServerLimiter:
+    """서버 쪽 초당 호출 한도 (1초 고정 창)"""
+
+    def __init__(self, rate_limit):
+        self.rate_limit = rate_limit
+        self.window = 0
+        self.count = 0
+
+    def allow(self):
+        if not self.rate_limit:
+            return True
+        now = int(time.monotonic())
+        if now != self.window:
+            self.window, self.count = now, 0
+        self.count += 1
+        return self.count <= self.rate_limit
+
+def build_app(latency=0.05, jitter=0.0, error_rate=0.0, throttle_rate=0.0, rate_limit=0,
+              population=10000, active_ratio=0.3, seed=0):
+    world_model = MockWorld(population, active_ratio, seed)
+    limiter = ServerLimiter(rate_limit)
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "throttled": 0}
+
+    @web.middleware
+    async def faults(request, handler):
+        """지연 + 호출 한도 + 무작위 429/5xx 를 모든 엔드포인트에 공통 적용"""
+        stats["requests"] += 1
+        delay = latency + (rng.uniform(-jitter, jitter) if jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not limiter.allow() or rng.random() < throttle_rate:
+            stats["throttled"] += 1
+            return web.json_response({"error": {"name": "OPENAPI00007"}}, status=429, headers={"Retry-After": "1"})
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return web.json_response({"error": {"name": "OPENAPI00001"}}, status=rng.choice((500, 503)))
+        return await handler(request)
+
+    async def ranking(request):
+        world = request.query.get("world_name", "")
+        page = int(request.query.get("page", 1))
+        start = (page - 1) * PAGE_SIZE
+        rows = []
+        for index in range(start, min(start + PAGE_SIZE, population)):
+            level, _ = world_model.character(world, index)
+            rows.append({
+                "ranking": index + 1,
+                "character_name": world_model.name_of(world, index),
+                "world_name": world,
+                "character_level": level,
+            })
+        return web.json_response({"ranking": rows})
+
+    async def ocid(request):
+        name = request.query.get("character_name", "")
+        if world_model.parse_name(name) is None:
+            return web.json_response({"error": {"name": "OPENAPI00004"}}, status=400)
+        return web.json_response({"ocid": OCID_PREFIX + name})
+
+    async def basic(request):
+        parsed = world_model.parse_name(request.query.get("ocid", "")[len(OCID_PREFIX):])
+        if parsed is None:
+            return web.json_response({"error": {"name": "OPENAPI00004"}}, status=400)
+        level, exp = world_model.character(*parsed)
+        return web.json_response({
+            "character_name": world_model.name_of(*parsed), "world_name": parsed[0],
+            "character_level": level, "character_exp": exp,
+        })
+
+    async def guild_id(request):
+        world, guild = request.query.get("world_name", ""), request.query.get("guild_name", "")
+        if not world or not guild:
+            return web.json_response({"error": {"name": "OPENAPI00004"}}, status=400)
+        return web.json_response({"oguild_id": f"{world}|{guild}"})
+
+    async def guild_basic(request):
+        world, _, guild = request.query.get("oguild_id", "").partition("|")
+        if not guild:
+            return web.json_response({"error": {"name": "OPENAPI00004"}}, status=400)
+        members = world_model.guild_members(world, guild)
+        return web.json_response({"world_name": world, "guild_name": guild, "guild_member_count": len(members), "guild_member": members})
+
+    app = web.Application(middlewares=[faults])
+    app["stats"] = stats
+    app.router.add_get("/ranking/overall", ranking)
+    app.router.add_get("/id", ocid)
+    app.router.add_get("/character/basic", basic)
+    app.router.add_get("/guild/id", guild_id)
+    app.router.add_get("/guild/basic", guild_basic)
+    return app
+
+def start_in_thread(port, **options):
+    """별도 스레드의 이벤트 루프에서 서버 실행 -> 호출 통계(dict) 반환"""
+    ready = threading.Event()
+    app = build_app(**options)
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return app["stats"]
+
+def add_arguments(parser):
+    parser.add_argument("--population", type=int, default=10000, help="월드당 랭킹 인원")
+    parser.add_argument("--latency", type=float, default=0.05, help="응답 지연 (초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="응답 지연 ± 흔들림 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="무작위 5xx 비율")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="무작위 429 비율")
+    parser.add_argument("--rate-limit", type=int, default=0, help="서버 초당 호출 한도 (0 = 무제한)")
+    parser.add_argument("--active-ratio", type=float, default=0.3, help="경험치가 오르는 캐릭터 비율")
+    parser.add_argument("--seed", type=int, default=0)
+
+def server_options(args):
+    return {
+        "latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate, "rate_limit": args.rate_limit,
+        "population": args.population, "active_ratio": args.active_ratio, "seed": args.seed,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 Nexon Open API 대역 서버")
+    parser.add_argument("--port", type=int, default=18080)
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(f"🧪 mock Nexon API: http://127.0.0.1:{args.port} (월드당 {args.population:,}명)")
+    web.run_app(build_app(**server_options(args)), host="127.0.0.1", port=args.port, access_log=None, print=None)
@@ -0,0 +1,72 @@
+"""
+닉네임 -> OCID 영구 캐시
+
+매 실행마다 같은 랭커 400여명의 OCID를 다시 조회하지 않도록 JSON 파일에 저장해 둠.
+- TTL이 지난 항목은 로드 시점에 제거
+- /character/basic 이 실패한 OCID는 invalidate() 로 즉시 제거 (닉변, 캐릭터 삭제 등)
+"""
+import json
+import os
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILE_OCID_CACHE = os.path.join(os.environ.get("TRACKER_DATA_DIR", BASE_DIR), "ocid_cache.json")
+
+OCID_CACHE_TTL_DAYS = float(os.environ.get("OCID_CACHE_TTL_DAYS", 7))
+
+class OcidCache:
+    def __init__(self, path=FILE_OCID_CACHE, ttl_days=OCID_CACHE_TTL_DAYS):
+        self.path = path
+        self.ttl_sec = ttl_days * 86400
+        self.entries = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        """회차별 hit/miss 통계 초기화 (데몬 모드에서 캐시를 계속 들고 있을 때)"""
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.expired = 0
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return self
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ OCID 캐시 로드 실패, 새로 만듭니다. ({e})")
+            return self
+
+        now = time.time()
+        for nickname, entry in entries.items():
+            if now - entry.get("cached_at", 0) > self.ttl_sec:
+                self.expired += 1
+            else:
+                self.entries[nickname] = entry
+        return self
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, nickname):
+        entry = self.entries.get(nickname)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["ocid"]
+
+    def put(self, nickname, ocid):
+        self.entries[nickname] = {"ocid": ocid, "cached_at": int(time.time())}
+
+    def invalidate(self, nickname):
+        if self.entries.pop(nickname, None) is not None:
+            self.invalidated += 1
+
+    def summary(self):
+        return (f"OCID 캐시: hit {self.hits} / miss {self.misses} "
+                f"(무효화 {self.invalidated}, 만료 {self.expired}, 보관 {len(self.entries)})")
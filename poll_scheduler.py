@@ -0,0 +1,164 @@
+"""
+캐릭터별 조회 주기 조절 (hot / warm / cold) + 바뀐 값만 저장
+
+랭커 중 상당수는 몇 시간씩 접속하지 않아서 매 회차 /character/basic 결과가 직전과 똑같음.
+캐릭터마다 마지막으로 경험치가 바뀐 시각을 기억해 두고,
+    hot  : 최근 HOT_IDLE_HOURS 안에 바뀜          -> 매 회차 조회
+    warm : 최근 COLD_IDLE_HOURS 안에 바뀜         -> WARM_INTERVAL_HOURS 마다 조회
+    cold : 그보다 오래 그대로                     -> COLD_INTERVAL_HOURS 마다 조회
+조회하지 않은 캐릭터는 직전 값을 그대로 이어 씀.
+저장은 값이 바뀐 캐릭터만 하고, 그대로인 캐릭터도 history_store.KEYFRAME_HOURS 마다 한 번은 저장함.
+(나머지 추적한 캐릭터는 값 없는 표시 행만 남김 -> history_store.carry_forward)
+
+상태 파일(poll_state.json)이 비어 있으면 history/ 최근 기록에서 처음 상태를 만듦.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import history_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILE_POLL_STATE = os.path.join(os.environ.get("TRACKER_DATA_DIR", BASE_DIR), "poll_state.json")
+
+HOT_IDLE_HOURS = float(os.environ.get("POLL_HOT_IDLE_HOURS", 2))
+COLD_IDLE_HOURS = float(os.environ.get("POLL_COLD_IDLE_HOURS", 12))
+WARM_INTERVAL_HOURS = float(os.environ.get("POLL_WARM_INTERVAL_HOURS", 1))
+COLD_INTERVAL_HOURS = float(os.environ.get("POLL_COLD_INTERVAL_HOURS", 3)) # cold 도 최소 이 간격으로는 조회
+SCHEDULE_SLACK = timedelta(minutes=5) # cron 실행 시각이 조금씩 밀려도 주기를 놓치지 않도록
+
+TIERS = ("hot", "warm", "cold")
+
+def _parse(value):
+    return datetime.strptime(value, history_store.TS_FORMAT)
+
+def _format(value):
+    return value.strftime(history_store.TS_FORMAT)
+
+class PollScheduler:
+    def __init__(self, path=FILE_POLL_STATE):
+        self.path = path
+        self.entries = {} # nickname -> {world, level, exp, changed_at, polled_at, stored_at} (시각은 UTC 문자열)
+        self.reset_stats()
+
+    def reset_stats(self):
+        """회차별 통계 초기화 (데몬 모드는 entries 를 메모리에 둔 채 회차를 반복)"""
+        self.stats = {f"{tier}_{kind}": 0 for tier in TIERS for kind in ("polled", "skipped")}
+        self.stats.update({"new": 0, "stored": 0, "unchanged": 0})
+
+    def load(self):
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 조회 주기 상태 로드 실패, 새로 만듭니다. ({e})")
+        if not self.entries:
+            self.seed_from_history()
+        return self
+
+    def seed_from_history(self, history_dir=history_store.HISTORY_DIR, days=1):
+        """최근 기록에서 캐릭터별 마지막 값 / 마지막으로 값이 바뀐 시각을 복원"""
+        start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+        try:
+            df = history_store.read_history(history_dir, start=start)
+        except (OSError, ValueError, ImportError): # pandas 가 없는 수집기 설치면 빈 상태로 시작 (전원 조회)
+            return self
+        if df.empty:
+            return self
+
+        df = df[~df['carried']] # 표시 행은 값이 없음 (마지막 저장 값 기준으로 복원)
+        if df.empty:
+            return self
+        df['nickname'] = df['nickname'].astype(str)
+        df = df.sort_values(['nickname', 'timestamp'], kind='stable')
+        grouped = df.groupby('nickname', sort=False)
+        changed = grouped['exp'].diff().ne(0) | grouped['level'].diff().ne(0)
+        changed_at = df['timestamp'].where(changed).groupby(df['nickname'], sort=False).max()
+
+        for row in grouped.tail(1).itertuples(index=False):
+            last_ts = _format(row.timestamp)
+            self.entries[row.nickname] = {
+                "world": str(row.world), "level": int(row.level), "exp": int(row.exp),
+                "changed_at": _format(changed_at[row.nickname]), "polled_at": last_ts, "stored_at": last_ts,
+            }
+        return self
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def tier(self, nickname, now):
+        entry = self.entries.get(nickname)
+        if entry is None:
+            return "hot"
+        idle = now - _parse(entry["changed_at"])
+        if idle < timedelta(hours=HOT_IDLE_HOURS):
+            return "hot"
+        if idle < timedelta(hours=COLD_IDLE_HOURS):
+            return "warm"
+        return "cold"
+
+    def should_poll(self, nickname, ranking_level, now):
+        """
+        이번 회차에 /character/basic 을 조회해야 하는지 (ranking_level: 랭킹 API 의 레벨)
+        ranking_level 이 None 이면(관심 목록 / 길드원 등 랭킹 밖) 레벨업을 알아챌 수 없으므로 cold 라도 warm 주기로 조회
+        """
+        entry = self.entries.get(nickname)
+        tier = self.tier(nickname, now)
+        if entry is None:
+            self.stats["new"] += 1
+            poll = True
+        elif tier == "hot" or (ranking_level is not None and ranking_level > entry["level"]): # 랭킹보다 레벨이 낮으면 상태가 낡은 것
+            poll = True
+        else:
+            interval = WARM_INTERVAL_HOURS if tier == "warm" or ranking_level is None else COLD_INTERVAL_HOURS
+            poll = now - _parse(entry["polled_at"]) >= timedelta(hours=interval) - SCHEDULE_SLACK
+        self.stats[f"{tier}_{'polled' if poll else 'skipped'}"] += 1
+        return poll
+
+    def carried_user(self, ranker):
+        """조회를 건너뛴 캐릭터 -> 직전 값을 이어 쓴 수집 결과"""
+        entry = self.entries[ranker['character_name']]
+        return {
+            'nickname': ranker['character_name'], 'world': ranker['world_name'], 'level': ranker['character_level'],
+            'current_level': entry["level"], 'current_exp': entry["exp"], 'polled': False,
+        }
+
+    def carried_users(self, nicknames):
+        """이번 회차에 보지 않은 추적 캐릭터 -> 직전 값을 이어 쓴 수집 결과 (상태가 없는 캐릭터는 건너뜀)"""
+        users = []
+        for nickname in nicknames:
+            entry = self.entries.get(nickname)
+            if entry is not None:
+                users.append(self.carried_user({'character_name': nickname, 'world_name': entry["world"], 'character_level': entry["level"]}))
+        return users
+
+    def record(self, current_status, now):
+        """이번 회차 결과로 상태를 갱신하고, 저장해야 할 사용자만 반환 (값이 바뀌었거나 keyframe 주기 도래)"""
+        keyframe = timedelta(hours=history_store.KEYFRAME_HOURS) - SCHEDULE_SLACK
+        now_str = _format(now)
+        to_store = []
+        for user in current_status:
+            entry = self.entries.get(user['nickname'])
+            value = (user['current_level'], user['current_exp'])
+            changed = entry is None or (entry["level"], entry["exp"]) != value
+            if changed:
+                entry = self.entries[user['nickname']] = {"changed_at": now_str, "stored_at": None}
+            entry.update({"world": user['world'], "level": value[0], "exp": value[1]})
+            if user.get('polled', True):
+                entry["polled_at"] = now_str
+
+            if changed or entry["stored_at"] is None or now - _parse(entry["stored_at"]) >= keyframe:
+                entry["stored_at"] = now_str
+                to_store.append(user)
+            else:
+                self.stats["unchanged"] += 1
+        self.stats["stored"] = len(to_store)
+        return to_store
+
+    def summary(self):
+        tiers = " / ".join(f"{t} {self.stats[f'{t}_polled']}조회·{self.stats[f'{t}_skipped']}생략" for t in TIERS)
+        return f"조회 주기: {tiers} (신규 {self.stats['new']}) | 저장 {self.stats['stored']}건, 변화 없음 {self.stats['unchanged']}건"
@@ -0,0 +1,232 @@
+"""
+순위 분석 배치 작업 (프로세스 풀)
+
+    python rank_analytics.py                                  # history/ -> history/analytics/
+    python rank_analytics.py --days 30 --workers 4 --horizon 168
+
+대시보드 화면을 그리면서 계산하기엔 무거운 전체 캐릭터 순위 분석을 미리 계산해서 파일로 남김.
+- rank_history : 스냅샷마다 전체 캐릭터 순위 (timestamp, nickname, rank)
+- rank_stats   : 캐릭터별 현재/최고/최저/평균 순위, 순위 표준편차, 순위 변동 횟수, 최근 SPEED_HOURS 시간 순위 변화, 속도
+- overtakes    : 모든 (추격자, 앞선 캐릭터) 쌍 중 horizon 시간 안에 역전하는 쌍과 예상 시간
+                 (대시보드 현황표의 '역전 예상'은 바로 윗 순위와만 비교함)
+
+계산:
+- 기록을 (스냅샷 × 캐릭터) 누적 경험치 행렬로 펼친 뒤, 스냅샷 행 묶음을 프로세스 풀에 나눠서
+  행마다 argsort 한 번으로 순위를 매김 (캐릭터별 반복 없음)
+- 역전 예상은 추격자 묶음마다 (묶음 × 전체 캐릭터) 간격 / 속도 차 행렬로 한 번에 계산
+- 속도는 최근 SPEED_HOURS 시간 동안의 시간당 경험치 (metrics.compute_character_metrics 와 같은 방식)
+
+결과는 history/analytics/*.parquet + meta.json (시각은 저장소와 같이 UTC).
+대시보드는 dashboard_data.load_analytics 로 읽기만 함. GitHub Actions 의 analytics.yml 이 매시 실행
+(pandas 가 필요해서 수집기와 따로 설치)
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import exp_table
+import history_store
+
+ANALYTICS_DIR = "analytics" # history/ 안의 결과 위치
+META_NAME = f"{ANALYTICS_DIR}/meta.json"
+DEFAULT_DAYS = float(os.environ.get("ANALYTICS_DAYS", 30)) # 분석 구간 (최근 N일)
+SPEED_HOURS = 24 # 역전 예상에 쓰는 속도 구간
+HORIZON_HOURS = 24 * 7 # 이보다 오래 걸리는 역전은 저장하지 않음
+MIN_HOURS = 0.001
+ROWS_PER_TASK = 256 # 프로세스 하나에 넘기는 스냅샷 행 수
+CHASERS_PER_TASK = 128 # 역전 예상 묶음 (128 × 캐릭터 수 행렬)
+
+NICKNAME = pa.dictionary(pa.int32(), pa.string())
+RANK_HISTORY_SCHEMA = pa.schema([("timestamp", pa.timestamp("s")), ("nickname", NICKNAME), ("rank", pa.int32())])
+RANK_STATS_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("s")), ("nickname", NICKNAME),
+    ("rank", pa.int32()), ("best_rank", pa.int32()), ("worst_rank", pa.int32()),
+    ("mean_rank", pa.float32()), ("rank_std", pa.float32()), ("rank_changes", pa.int32()),
+    ("rank_delta", pa.int32()), ("speed", pa.float64()),
+])
+OVERTAKES_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("s")), ("nickname", NICKNAME), ("target_nickname", NICKNAME),
+    ("gap", pa.float64()), ("speed_gap", pa.float64()), ("hours_to_overtake", pa.float32()),
+])
+
+# ==========================================
+# 1. 행렬 (스냅샷 × 캐릭터)
+# ==========================================
+def fill_forward(matrix):
+    """열마다 NaN 칸을 위쪽(직전 스냅샷)의 마지막 값으로 채움. 처음 값이 나오기 전 칸은 NaN 그대로"""
+    last = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(last, axis=0, out=last)
+    return matrix[last, np.arange(matrix.shape[1])]
+
+def build_matrix(df):
+    """
+    carry_forward 결과 -> (스냅샷 시각, 닉네임, 누적 경험치 행렬)
+    그룹별 주기 / 빠른 상위 수집 회차에는 일부 캐릭터만 있으므로, 빠진 칸은 그 캐릭터의 직전 값으로 채움
+    (순위는 스냅샷마다 그때까지 본 전체 캐릭터 기준. 처음 나오기 전 칸만 NaN)
+    """
+    # 정렬 대신 해시로 번호를 매김 (행 수가 많아서 np.unique 의 전체 정렬이 순위 계산보다 오래 걸림)
+    rows, times = pd.factorize(df['timestamp'], sort=True)
+    nickname = df['nickname'].astype('category')
+    codes = nickname.cat.codes.to_numpy()
+    used = np.bincount(codes, minlength=len(nickname.cat.categories)) > 0 # 구간에 없는 캐릭터는 열을 만들지 않음
+    columns = np.cumsum(used) - 1
+    matrix = np.full((len(times), int(used.sum())), np.nan)
+    matrix[rows, columns[codes]] = exp_table.to_total_exp(df['level'].to_numpy(), df['exp'].to_numpy(dtype='int64'))
+    return np.asarray(times), np.asarray(nickname.cat.categories, dtype=object)[used], fill_forward(matrix)
+
+# ==========================================
+# 2. 프로세스 풀 작업 (모듈 최상위 함수여야 pickle 가능)
+# ==========================================
+def rank_rows(block):
+    """스냅샷 행 묶음 -> 순위 행렬 (1 = 누적 경험치 최대, 값이 없는 칸은 0)"""
+    missing = np.isnan(block)
+    order = np.argsort(np.where(missing, np.inf, -block), axis=1, kind='stable')
+    ranks = np.empty(block.shape, dtype='int32') # 여러 월드 × 여러 페이지 수집이면 캐릭터가 int16 상한(32,767)을 넘을 수 있음
+    np.put_along_axis(ranks, order, np.arange(1, block.shape[1] + 1, dtype='int32')[None, :], axis=1)
+    ranks[missing] = 0
+    return ranks
+
+def overtake_block(task):
+    """추격자 [lo, hi) × 전체 캐릭터 -> horizon 안에 역전하는 (추격자, 대상, 간격, 속도 차, 시간)"""
+    lo, hi, exp_now, speed, horizon = task
+    gap = exp_now[None, :] - exp_now[lo:hi, None] # > 0 : 대상이 앞섬
+    speed_gap = speed[lo:hi, None] - speed[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hours = gap / speed_gap
+    chaser, target = np.nonzero((gap > 0) & (speed_gap > 0) & (hours <= horizon))
+    return chaser + lo, target, gap[chaser, target], speed_gap[chaser, target], hours[chaser, target]
+
+def _blocks(n, size):
+    return [(lo, min(lo + size, n)) for lo in range(0, n, size)]
+
+# ==========================================
+# 3. 분석
+# ==========================================
+def recent_speed(times, matrix, hours=SPEED_HOURS):
+    """캐릭터별 (마지막 누적 경험치, 최근 hours 시간 동안의 시간당 경험치). 구간에 값이 없으면 NaN"""
+    window = times >= times[-1] - np.timedelta64(int(hours * 3600), 's')
+    values, stamps = matrix[window], times[window]
+    present = ~np.isnan(values)
+    first = present.argmax(axis=0)
+    last = len(values) - 1 - present[::-1].argmax(axis=0)
+    columns = np.arange(values.shape[1])
+    elapsed = (stamps[last] - stamps[first]) / np.timedelta64(1, 'h')
+    exp_now = values[last, columns]
+    return exp_now, (exp_now - values[first, columns]) / np.maximum(elapsed, MIN_HOURS)
+
+def rank_stats(times, ranks, hours=SPEED_HOURS):
+    """순위 행렬 -> 캐릭터별 순위 통계 (순위가 한 번도 없는 캐릭터는 NaN)"""
+    present = ranks > 0
+    r = np.where(present, ranks, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # 구간에 한 번도 없는 캐릭터 (전부 NaN) 는 NaN 그대로
+        best, worst = np.nanmin(r, axis=0), np.nanmax(r, axis=0)
+        mean, std = np.nanmean(r, axis=0), np.nanstd(r, axis=0)
+    both = present[1:] & present[:-1]
+    changes = ((np.diff(ranks.astype('int32'), axis=0) != 0) & both).sum(axis=0)
+    # hours 시간 전(그 시각 이전 마지막 스냅샷) 순위 - 지금 순위 (양수 = 상승)
+    before = max(0, np.searchsorted(times, times[-1] - np.timedelta64(int(hours * 3600), 's'), side='right') - 1)
+    delta = np.where(present[-1] & present[before], r[before] - r[-1], 0)
+    return {"best_rank": best, "worst_rank": worst, "mean_rank": mean, "rank_std": std, "rank_changes": changes, "rank_delta": delta}
+
+def analyze(df, horizon=HORIZON_HOURS, pool=None):
+    """
+    carry_forward 결과(UTC) -> (rank_history, rank_stats, overtakes) pyarrow 테이블
+    pool 이 있으면 순위 매기기 / 역전 예상을 프로세스에 나눠서 계산
+    """
+    times, nicknames, matrix = build_matrix(df)
+    run = pool.map if pool is not None else map
+
+    ranks = np.concatenate(list(run(rank_rows, [matrix[lo:hi] for lo, hi in _blocks(len(times), ROWS_PER_TASK)])))
+
+    exp_now, speed = recent_speed(times, matrix)
+    tasks = [(lo, hi, exp_now, speed, horizon) for lo, hi in _blocks(len(nicknames), CHASERS_PER_TASK)]
+    parts = list(run(overtake_block, tasks))
+    chaser, target, gap, speed_gap, hours = (np.concatenate([p[k] for p in parts]) for k in range(5))
+    order = np.argsort(hours, kind='stable')
+
+    as_of = times[-1]
+    t_idx, n_idx = np.nonzero(ranks)
+    history = pa.Table.from_arrays([
+        pa.array(times[t_idx].astype('datetime64[s]')), pa.DictionaryArray.from_arrays(n_idx.astype('int32'), pa.array(nicknames)),
+        pa.array(ranks[t_idx, n_idx]),
+    ], schema=RANK_HISTORY_SCHEMA)
+
+    stats = rank_stats(times, ranks)
+    keep = ~np.isnan(stats["best_rank"])
+    stats_table = pa.Table.from_arrays([
+        pa.array(np.full(keep.sum(), as_of).astype('datetime64[s]')),
+        pa.DictionaryArray.from_arrays(np.flatnonzero(keep).astype('int32'), pa.array(nicknames)),
+        pa.array(ranks[-1][keep]), pa.array(stats["best_rank"][keep].astype('int32')), pa.array(stats["worst_rank"][keep].astype('int32')),
+        pa.array(stats["mean_rank"][keep].astype('float32')), pa.array(stats["rank_std"][keep].astype('float32')),
+        pa.array(stats["rank_changes"][keep].astype('int32')), pa.array(stats["rank_delta"][keep].astype('int32')),
+        pa.array(speed[keep], from_pandas=True),
+    ], schema=RANK_STATS_SCHEMA)
+
+    overtakes = pa.Table.from_arrays([
+        pa.array(np.full(len(order), as_of).astype('datetime64[s]')),
+        pa.DictionaryArray.from_arrays(chaser[order].astype('int32'), pa.array(nicknames)),
+        pa.DictionaryArray.from_arrays(target[order].astype('int32'), pa.array(nicknames)),
+        pa.array(gap[order]), pa.array(speed_gap[order]), pa.array(hours[order].astype('float32')),
+    ], schema=OVERTAKES_SCHEMA)
+    return history, stats_table, overtakes
+
+# ==========================================
+# 4. 실행 (읽기 -> 분석 -> history/analytics/ 에 쓰기)
+# ==========================================
+def run(history_dir=history_store.HISTORY_DIR, days=DEFAULT_DAYS, workers=None, horizon=HORIZON_HOURS):
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    start = None if not days else datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    df = history_store.carry_forward(history_store.read_history(history_dir, start=history_store.lead_in(start)))
+    if start is not None: # 구간 첫 부분의 표시 행은 구간 앞 저장 값으로 채운 뒤 잘라 냄
+        df = df[df['timestamp'] >= start].reset_index(drop=True)
+    if df.empty:
+        print("⚠️ 분석할 기록이 없습니다.")
+        return None
+    t_read = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            tables = analyze(df, horizon, pool)
+    else:
+        tables = analyze(df, horizon)
+    t_analyze = time.perf_counter() - t0
+
+    files = {}
+    for name, table in zip(("rank_history", "rank_stats", "overtakes"), tables):
+        files[name] = history_store.write_table(table, f"{ANALYTICS_DIR}/{name}.parquet", history_dir)
+    meta = {
+        "generated_at": datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0).strftime(history_store.TS_FORMAT),
+        "source_latest": files["rank_stats"]["max_ts"], "days": days, "speed_hours": SPEED_HOURS, "horizon_hours": horizon,
+        "snapshots": int(df['timestamp'].nunique()), "characters": tables[1].num_rows, "workers": workers,
+        "read_sec": round(t_read, 3), "analyze_sec": round(t_analyze, 3), "files": files,
+    }
+    tmp_path = os.path.join(history_dir, META_NAME) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(history_dir, META_NAME))
+    print(f"📐 순위 분석: 스냅샷 {meta['snapshots']:,}개 × 캐릭터 {meta['characters']:,}명, 역전 예상 {tables[2].num_rows:,}쌍 "
+          f"(읽기 {t_read:.2f}s, 분석 {t_analyze:.2f}s, 프로세스 {workers}개)")
+    return meta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="순위 분석 배치 작업 (history/analytics/ 갱신)")
+    parser.add_argument("--history", default=history_store.HISTORY_DIR)
+    parser.add_argument("--days", type=float, default=DEFAULT_DAYS, help="분석 구간 (최근 N일, 0 = 전체)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ANALYTICS_WORKERS", 0)), help="프로세스 수 (0 = CPU 수)")
+    parser.add_argument("--horizon", type=float, default=HORIZON_HOURS, help="이 시간 안의 역전만 저장")
+    args = parser.parse_args(argv)
+    run(args.history, args.days, args.workers, args.horizon)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Nexon Open API 호출량 제한기 + 재시도 정책
+
+- 토큰 버킷: 모든 워커가 하나를 공유하며, 초당 NEXON_RATE_LIMIT 건을 넘지 않음
+- 적응형: 429를 받으면 속도를 절반으로 줄이고, 성공할 때마다 조금씩 원래 속도로 복구
+- 재시도: 429 / 5xx / 타임아웃은 지수 백오프(+지터)로 재시도, Retry-After 헤더가 있으면 우선
+  (단, RETRY_AFTER_MAX_SEC 보다 길게 기다리라고 하면 기다리지 않고 그 요청은 포기)
+"""
+import asyncio
+import os
+import random
+import time
+
+NEXON_RATE_LIMIT = float(os.environ.get("NEXON_RATE_LIMIT", 10)) # 초당 호출 수 (API 키 등급에 맞게 조정)
+MAX_RETRIES = int(os.environ.get("MAX_RETRIES", 3))
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 10.0
+# Retry-After 상한. 이보다 길면 (예: 3600) Actions 실행 안에서 기다릴 수 없으므로 요청을 포기
+RETRY_AFTER_MAX_SEC = float(os.environ.get("RETRY_AFTER_MAX_SEC", 30))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class RateLimiter:
+    """토큰 버킷 + 동시 요청 수 제한. `async with limiter:` 로 사용"""
+
+    def __init__(self, rate=NEXON_RATE_LIMIT, max_concurrency=20, metrics=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.reset_stats()
+        self.metrics = metrics # run_metrics.RunMetrics (응답 시간 기록용, 없으면 생략)
+
+    def reset_stats(self):
+        """회차별 호출 통계 초기화 (데몬 모드에서 제한기를 계속 재사용할 때)"""
+        self.stats = {"requests": 0, "throttled": 0, "retried": 0, "failed": 0, "dropped": 0}
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            await self.acquire()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        self.stats["requests"] += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+    def observe(self, endpoint, seconds, ok):
+        if self.metrics is not None:
+            self.metrics.observe(endpoint, seconds, ok)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+    def on_throttled(self):
+        self.stats["throttled"] += 1
+        self.rate = max(1.0, self.rate / 2)
+
+    def summary(self):
+        s = self.stats
+        return (f"API 호출 {s['requests']}건 (429 {s['throttled']}, 재시도 {s['retried']}, "
+                f"실패 {s['failed']}, 최종 누락 {s['dropped']}) / 현재 속도 {self.rate:.1f}/s")
+
+def parse_retry_after(value):
+    """Retry-After 헤더(초 단위)를 float로. 없거나 날짜 형식이면 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+def retry_after_too_long(retry_after):
+    """Retry-After 가 상한을 넘으면 True -> 재시도하지 않고 실패 처리"""
+    return retry_after is not None and retry_after > RETRY_AFTER_MAX_SEC
+
+def backoff_delay(attempt, retry_after=None):
+    """attempt번째 재시도 전 대기 시간 (full jitter). Retry-After 는 RETRY_AFTER_MAX_SEC 까지만 따름"""
+    if retry_after is not None:
+        return min(retry_after, RETRY_AFTER_MAX_SEC)
+    return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt)))
@@ -0,0 +1,293 @@
+"""
+기록 보관 정책 (단계별 해상도 + 원본 아카이브)
+
+수집이 쌓일수록 history/ 가 계속 커져서 Actions 체크아웃과 대시보드 첫 로드('전체' 기간)가 느려짐.
+오래된 기록일수록 해상도를 낮춰서 보관하고, 대시보드가 읽는 원본은 최근 구간만 남김.
+
+    원본 30분 스냅샷  history/date=*/           최근 raw_days 일     (대시보드 / 조회 API / 순위 분석이 읽음)
+    시간 롤업         history/rollup/hourly/    최근 hourly_days 일
+    일 롤업           history/rollup/daily/     계속 보관 (긴 구간 그래프)
+    원본 아카이브     history/archive/month=YYYY-MM.parquet
+                      raw_days 가 지난 날짜 파티션을 월 단위 파일로 옮김 (대시보드는 읽지 않음)
+
+- 추적 그룹(targets.py)에 retention_days 가 있는 캐릭터는 그 기간이 지난 원본 행을 아카이브까지 포함해서 삭제
+  (롤업은 위 단계별 기간을 따름)
+- 아카이브 파일은 캐릭터별 시각 순 정렬 + 차분 인코딩이라 같은 기간 날짜 파티션보다 약 1/3 작음
+- 설정: targets.json 의 "retention": {"raw_days": 30, "hourly_days": 90}
+  또는 RETENTION_RAW_DAYS / RETENTION_HOURLY_DAYS 환경변수 (targets.json 이 우선)
+- 수집기가 매 회차 저장 뒤에 run_daily() 를 부르지만 실제 정리는 UTC 하루 한 번
+  (history/retention.json 에 마지막 적용 날짜와 정책을 기록, 정책이 바뀌면 그날 다시 적용)
+- 여러 번 적용해도 결과가 같음: 아카이브 파일을 먼저 쓰고(같은 (시각, 닉네임) 행은 하나만 남김) 원본 파티션을 지움
+  -> 중간에 끊기면 다음 실행이 같은 파티션을 다시 옮김
+- 대시보드는 조회 기간이 retention.json 의 raw_days 보다 길면 원본이 없는 앞 구간을 시간 -> 일 롤업 행으로 채움
+  (dashboard_data.extend_with_rollup)
+
+사용법:
+    python retention.py                                   # 지금 바로 적용 (하루 한 번 제한 없이)
+    python retention.py --raw-days 14 --hourly-days 60
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+# numpy / pyarrow / argparse 는 실제로 정리하거나 직접 실행할 때만 불러옴
+# (수집기는 회차마다 run_daily 로 오늘 적용했는지만 확인하므로 시작이 느려지지 않도록)
+import history_store
+import targets
+
+RAW_DAYS = int(os.environ.get("RETENTION_RAW_DAYS", 30))
+HOURLY_DAYS = int(os.environ.get("RETENTION_HOURLY_DAYS", 90))
+# 아카이브는 한 번 쓰면 거의 다시 읽지 않으므로 쓰기 시간보다 크기 우선:
+# 캐릭터별 시각 순으로 정렬해서 시각/레벨/경험치를 차분(delta) 인코딩 + zstd 높은 압축 수준
+ARCHIVE_WRITE_OPTIONS = {
+    "compression_level": 19,
+    "use_dictionary": ["nickname", "world"],
+    "column_encoding": {"timestamp": "DELTA_BINARY_PACKED", "level": "DELTA_BINARY_PACKED", "exp": "DELTA_BINARY_PACKED"},
+}
+STATE_NAME = "retention.json" # history/ 안의 마지막 적용 기록
+
+# ==========================================
+# 1. 정책
+# ==========================================
+class RetentionPolicy:
+    KEYS = ("raw_days", "hourly_days")
+
+    def __init__(self, raw_days=RAW_DAYS, hourly_days=HOURLY_DAYS, nickname_days=None):
+        if raw_days < 1:
+            raise ValueError(f"raw_days 는 1일 이상이어야 합니다: {raw_days}")
+        if hourly_days < raw_days:
+            # 원본이 남아 있는 구간의 긴 그래프는 시간 롤업으로 그리므로 (dashboard_data.CHART_RESOLUTIONS)
+            raise ValueError(f"hourly_days({hourly_days}) 는 raw_days({raw_days}) 이상이어야 합니다")
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.nickname_days = dict(nickname_days or {}) # nickname -> 원본 보관 기간 (추적 그룹 retention_days)
+
+    @classmethod
+    def from_registry(cls, registry, cohort_state):
+        """targets.json 의 retention 항목 + 그룹별 retention_days (cohort_state: targets.load_cohort_state 결과)"""
+        config = registry.retention
+        unknown = set(config) - set(cls.KEYS)
+        if unknown:
+            raise ValueError(f"retention: 알 수 없는 항목 {sorted(unknown)}")
+        return cls(config.get("raw_days", RAW_DAYS), config.get("hourly_days", HOURLY_DAYS), registry.retention_days(cohort_state))
+
+    def fingerprint(self):
+        """retention.json 에 남기는 정책 요약 (바뀌면 같은 날이라도 다시 적용). 그룹 기간은 캐릭터가 많으므로 해시만"""
+        nickname_days = json.dumps(sorted(self.nickname_days.items()), ensure_ascii=False).encode('utf-8')
+        return {"raw_days": self.raw_days, "hourly_days": self.hourly_days,
+                "nickname_days": hashlib.sha1(nickname_days).hexdigest()[:12]}
+
+    def __repr__(self):
+        return f"RetentionPolicy(raw={self.raw_days}d, hourly={self.hourly_days}d, 그룹 기간 {len(self.nickname_days)}명)"
+
+# ==========================================
+# 2. 테이블 정리
+# ==========================================
+def drop_expired(table, nickname_days, now):
+    """그룹 보관 기간이 지난 캐릭터 행을 뺀 테이블 (빠진 행이 없으면 그대로)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not nickname_days or table.num_rows == 0:
+        return table
+    by_days = {}
+    for nickname, days in nickname_days.items():
+        by_days.setdefault(days, []).append(nickname)
+
+    names = pc.cast(table["nickname"], pa.string())
+    expired = None
+    for days, nicknames in by_days.items():
+        cutoff = pa.scalar(now - timedelta(days=days), pa.timestamp("s"))
+        mask = pc.and_(pc.is_in(names, value_set=pa.array(nicknames, pa.string())), pc.less(table["timestamp"], cutoff))
+        expired = mask if expired is None else pc.or_(expired, mask)
+    if not pc.any(expired).as_py():
+        return table
+    return table.filter(pc.invert(expired))
+
+def dedupe(table):
+    """같은 (timestamp, nickname) 행은 마지막 것만 남기고 캐릭터별 시각 순 정렬 (같은 파티션을 두 번 옮겨도 결과가 같도록)"""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = table.unify_dictionaries().combine_chunks()
+    if table.num_rows == 0:
+        return table
+    ts = pc.cast(table["timestamp"], pa.int64()).to_numpy()
+    codes = table["nickname"].chunk(0).indices.to_numpy()
+    order = np.lexsort((np.arange(len(ts)), ts, codes))
+    ts, codes = ts[order], codes[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (ts[1:] != ts[:-1]) | (codes[1:] != codes[:-1])
+    return table.take(pa.array(order[last]))
+
+def _read(directory, entry, schema=history_store.SCHEMA):
+    import pyarrow.parquet as pq
+
+    return pq.read_table(os.path.join(directory, entry["path"]), schema=schema)
+
+def _replace(manifest, directory, rel_path, table, write_options):
+    """rel_path 를 table 로 교체 (빈 테이블이면 파일 삭제). 매니페스트 저장은 호출하는 쪽에서"""
+    manifest["files"] = [e for e in manifest["files"] if e["path"] != rel_path]
+    if table.num_rows:
+        manifest["files"].append(history_store.write_table(table, rel_path, directory, **write_options))
+    elif os.path.isfile(os.path.join(directory, rel_path)):
+        os.remove(os.path.join(directory, rel_path))
+
+# ==========================================
+# 3. 단계별 적용
+# ==========================================
+def archive_raw(cutoff_date, history_dir, nickname_days, now):
+    """cutoff_date('YYYY-MM-DD') 이전 날짜 파티션을 아카이브 월 파일로 옮김 -> (옮긴 파티션 수, 행 수, 그룹 보관 기간이 지나 뺀 행 수)"""
+    import pyarrow as pa
+
+    manifest = history_store.load_manifest(history_dir)
+    by_month = {}
+    for e in manifest["files"]:
+        partition = e["path"].split("/")[0]
+        date = partition.split("=", 1)[1]
+        if date < cutoff_date:
+            by_month.setdefault(date[:7], []).append(e)
+    if not by_month:
+        return 0, 0, 0
+
+    archive_dir = os.path.join(history_dir, history_store.ARCHIVE_DIR)
+    os.makedirs(archive_dir, exist_ok=True)
+    archive = history_store.load_manifest(archive_dir)
+    partitions = rows = expired = 0
+    for month, entries in sorted(by_month.items()):
+        rel_path = f"month={month}.parquet"
+        tables = [_read(history_dir, e) for e in entries]
+        rows += sum(t.num_rows for t in tables)
+        if any(e["path"] == rel_path for e in archive["files"]):
+            tables.insert(0, _read(archive_dir, {"path": rel_path}))
+        merged = dedupe(pa.concat_tables(tables))
+        table = drop_expired(merged, nickname_days, now)
+        expired += merged.num_rows - table.num_rows
+
+        # 아카이브를 먼저 확정한 뒤 원본을 지움 (사이에 끊기면 다음 실행이 다시 옮기고 dedupe 가 겹친 행을 정리)
+        _replace(archive, archive_dir, rel_path, table, ARCHIVE_WRITE_OPTIONS)
+        history_store.save_manifest(archive, archive_dir)
+        for e in entries:
+            os.remove(os.path.join(history_dir, e["path"]))
+        manifest["files"] = [e for e in manifest["files"] if e not in entries]
+        history_store.save_manifest(manifest, history_dir)
+
+        for partition in {e["path"].split("/")[0] for e in entries}:
+            try:
+                os.rmdir(os.path.join(history_dir, partition))
+            except OSError: # 매니페스트에 없는 파일이 남아 있으면 폴더는 그대로 둠
+                pass
+            partitions += 1
+    return partitions, rows, expired
+
+def expire_nicknames(directory, nickname_days, now, write_options=None):
+    """directory 매니페스트의 파일들에서 그룹 보관 기간이 지난 캐릭터 행을 삭제 -> 지운 행 수"""
+    if not nickname_days:
+        return 0
+    oldest_cutoff = (now - timedelta(days=min(nickname_days.values()))).strftime(history_store.TS_FORMAT)
+    manifest = history_store.load_manifest(directory)
+    removed = 0
+    for e in [e for e in manifest["files"] if e["min_ts"] < oldest_cutoff]:
+        table = _read(directory, e)
+        kept = drop_expired(table, nickname_days, now)
+        if kept.num_rows != table.num_rows:
+            removed += table.num_rows - kept.num_rows
+            _replace(manifest, directory, e["path"], kept, write_options or {})
+    if removed:
+        history_store.save_manifest(manifest, directory)
+    return removed
+
+def drop_hourly(cutoff, rollup_dir):
+    """cutoff 이전에 끝나는 시간 롤업 파일 삭제 (일 롤업은 계속 보관) -> 지운 파일 수"""
+    hourly_dir = os.path.join(rollup_dir, "hourly")
+    manifest = history_store.load_manifest(hourly_dir)
+    cutoff_s = cutoff.strftime(history_store.TS_FORMAT)
+    old = [e for e in manifest["files"] if e["max_ts"] < cutoff_s]
+    for e in old:
+        os.remove(os.path.join(hourly_dir, e["path"]))
+    if old:
+        manifest["files"] = [e for e in manifest["files"] if e not in old]
+        history_store.save_manifest(manifest, hourly_dir)
+    return len(old)
+
+def apply(policy, now, history_dir=history_store.HISTORY_DIR):
+    """
+    정책 1회 적용. 오늘 파티션은 raw_days >= 1 이라 옮기지 않음
+    now: UTC (naive 면 UTC 로 봄, 시간대가 있으면 UTC 로 바꿈). 파티션 이름 / timestamp 가 수집 시각(UTC) 기준이라
+         기준 시각도 같은 시계여야 아카이브 날짜와 그룹 보관 기간 만료가 밀리지 않음 (KST 는 대시보드 표시용)
+    반환: {"archived_partitions", "archived_rows", "expired_rows", "hourly_dropped"}
+    """
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    raw_cutoff = (now - timedelta(days=policy.raw_days)).strftime("%Y-%m-%d")
+    archived_partitions, archived_rows, expired_rows = archive_raw(raw_cutoff, history_dir, policy.nickname_days, now)
+    expired_rows += expire_nicknames(history_dir, policy.nickname_days, now)
+    expired_rows += expire_nicknames(
+        os.path.join(history_dir, history_store.ARCHIVE_DIR), policy.nickname_days, now, ARCHIVE_WRITE_OPTIONS
+    )
+    hourly_dropped = drop_hourly(now - timedelta(days=policy.hourly_days), os.path.join(history_dir, "rollup"))
+    return {
+        "archived_partitions": archived_partitions, "archived_rows": archived_rows,
+        "expired_rows": expired_rows, "hourly_dropped": hourly_dropped,
+    }
+
+# ==========================================
+# 4. 하루 한 번 (수집기)
+# ==========================================
+def load_state(history_dir=history_store.HISTORY_DIR):
+    path = os.path.join(history_dir, STATE_NAME)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {} # 기록이 깨졌으면 한 번 더 적용 (여러 번 적용해도 결과가 같음)
+
+def save_state(state, history_dir=history_store.HISTORY_DIR):
+    path = os.path.join(history_dir, STATE_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def run_daily(policy, now, history_dir=history_store.HISTORY_DIR):
+    """오늘(UTC) 같은 정책으로 이미 적용했으면 건너뜀 -> apply 결과 (건너뛰면 None)"""
+    state = load_state(history_dir)
+    today = now.strftime("%Y-%m-%d")
+    if state.get("date") == today and state.get("policy") == policy.fingerprint():
+        return None
+    result = apply(policy, now, history_dir)
+    save_state({"date": today, "applied_at": now.strftime(history_store.TS_FORMAT),
+                "policy": policy.fingerprint(), "result": result}, history_dir)
+    return result
+
+def summarize(result):
+    return (f"원본 파티션 {result['archived_partitions']}개({result['archived_rows']:,}행) 아카이브, "
+            f"그룹 보관 기간 만료 {result['expired_rows']:,}행 삭제, 시간 롤업 {result['hourly_dropped']}개 삭제")
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="기록 보관 정책 적용 (오래된 원본 아카이브, 시간 롤업 정리)")
+    parser.add_argument("--history", default=history_store.HISTORY_DIR)
+    parser.add_argument("--raw-days", type=int, default=None, help="원본 스냅샷 보관 일수 (기본: targets.json / 환경변수)")
+    parser.add_argument("--hourly-days", type=int, default=None, help="시간 롤업 보관 일수")
+    args = parser.parse_args(argv)
+
+    registry = targets.load_registry()
+    policy = RetentionPolicy.from_registry(registry, targets.load_cohort_state(args.history))
+    if args.raw_days is not None or args.hourly_days is not None:
+        policy = RetentionPolicy(
+            args.raw_days if args.raw_days is not None else policy.raw_days,
+            args.hourly_days if args.hourly_days is not None else policy.hourly_days,
+            policy.nickname_days,
+        )
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    print(f"🧹 {policy} 적용 중...")
+    print(f"-> {summarize(apply(policy, now, args.history))}")
+
+if __name__ == "__main__":
+    main()
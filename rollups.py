@@ -0,0 +1,163 @@
+"""
+캐릭터별 시간/일 단위 롤업 (수집기가 매 회차 증분 갱신)
+
+    history/rollup/hourly/manifest.json, date=YYYY-MM-DD.parquet   <- 1시간 버킷, 하루 = 파일 1개
+    history/rollup/daily/manifest.json,  month=YYYY-MM.parquet     <- 1일 버킷, 한 달 = 파일 1개
+
+버킷 행 = 그 구간의 마지막 스냅샷 값 + 직전 버킷 마지막 값(base) 대비 획득량/평균 속도.
+매 회차에는 이번 스냅샷이 속한 버킷 파일(시간/일 각 1개)만 다시 씀.
+버킷의 마지막 스냅샷 시각(last_ts) 이전/같은 시각의 스냅샷은 무시 -> 같은 회차를 다시 적용해도 결과가 같음.
+긴 구간 그래프는 원본 30분 데이터 대신 이 파일들을 읽어서 점 개수를 일정하게 유지함.
+시간 롤업은 보관 기간(retention.py 의 hourly_days)이 지나면 삭제, 일 롤업은 계속 보관.
+
+사용법:
+    python rollups.py rebuild   # history/ 전체에서 롤업을 처음부터 다시 만듦
+"""
+import os
+import sys
+from datetime import timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import exp_table
+import history_store
+
+ROLLUP_DIR = os.path.join(history_store.HISTORY_DIR, "rollup")
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("s")), # 버킷 시작 시각 (UTC)
+    ("nickname", pa.dictionary(pa.int32(), pa.string())),
+    ("world", pa.dictionary(pa.int8(), pa.string())),
+    ("level", pa.int16()),
+    ("exp", pa.int64()),
+    ("total_exp", pa.int64()),
+    ("last_ts", pa.timestamp("s")), # 버킷 안 마지막 스냅샷 시각
+    ("base_total_exp", pa.int64()), # 직전 버킷 마지막 값 (없으면 버킷 첫 스냅샷)
+    ("base_ts", pa.timestamp("s")),
+    ("gained_exp", pa.int64()),
+    ("speed", pa.float64()), # 시간당 경험치
+    ("samples", pa.int32()),
+])
+
+RESOLUTIONS = {
+    # 이름: (버킷 시작 시각 계산, 파일 이름, 이전 파일의 기준 시각)
+    "hourly": (
+        lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+        lambda bucket: f"date={bucket:%Y-%m-%d}.parquet",
+        lambda bucket: bucket.replace(hour=0) - timedelta(days=1),
+    ),
+    "daily": (
+        lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+        lambda bucket: f"month={bucket:%Y-%m}.parquet",
+        lambda bucket: bucket.replace(day=1) - timedelta(days=1),
+    ),
+}
+
+class RollupTable:
+    """해상도 하나(hourly/daily)의 롤업 파일들을 필요할 때만 읽고, 바뀐 파일만 다시 씀"""
+
+    def __init__(self, resolution, root=ROLLUP_DIR, fresh=False):
+        self.resolution = resolution
+        self.fresh = fresh # True 면 기존 파일을 읽지 않고 처음부터 만듦 (rebuild)
+        self.dir = os.path.join(root, resolution)
+        self.bucket_of, self.file_of, self.prev_file_anchor = RESOLUTIONS[resolution]
+        self.files = {} # 파일 이름 -> {(bucket, nickname): row dict}
+        self.dirty = set()
+        self.last = {} # nickname -> 가장 최근 버킷 행
+
+    def _load(self, name):
+        if name not in self.files:
+            path = os.path.join(self.dir, name)
+            rows = pq.read_table(path, schema=SCHEMA).to_pylist() if not self.fresh and os.path.isfile(path) else []
+            self.files[name] = {(r["timestamp"], r["nickname"]): r for r in rows}
+            for r in rows:
+                if r["nickname"] not in self.last or self.last[r["nickname"]]["timestamp"] < r["timestamp"]:
+                    self.last[r["nickname"]] = r
+        return self.files[name]
+
+    def add_snapshot(self, rows, ts):
+        """rows: (nickname, world, level, exp) 목록, ts: 스냅샷 시각 (UTC)"""
+        bucket = self.bucket_of(ts)
+        name = self.file_of(bucket)
+        entries = self._load(name)
+        if any(nick not in self.last for nick, _, _, _ in rows):
+            self._load(self.file_of(self.prev_file_anchor(bucket))) # 직전 기간 파일에서 base 값 보충
+
+        for nickname, world, level, exp in rows:
+            total = int(exp_table.to_total_exp(level, exp))
+            row = entries.get((bucket, nickname))
+            if row is None:
+                prev = self.last.get(nickname)
+                if prev is not None and prev["timestamp"] < bucket:
+                    base_total, base_ts = prev["total_exp"], prev["last_ts"]
+                else:
+                    base_total, base_ts = total, ts
+                row = {"timestamp": bucket, "nickname": nickname, "base_total_exp": base_total, "base_ts": base_ts, "samples": 0}
+                entries[(bucket, nickname)] = row
+            elif row["last_ts"] >= ts:
+                continue # 이미 반영한 스냅샷 (journal 재적용 등) -> samples 를 두 번 세지 않음
+
+            hours = (ts - row["base_ts"]).total_seconds() / 3600
+            row.update({
+                "world": world, "level": level, "exp": exp, "total_exp": total, "last_ts": ts,
+                "gained_exp": total - row["base_total_exp"],
+                "speed": (total - row["base_total_exp"]) / hours if hours > 0 else 0.0,
+                "samples": row["samples"] + 1,
+            })
+            self.last[nickname] = row
+        self.dirty.add(name)
+
+    def save(self):
+        if not self.dirty:
+            return
+        manifest = history_store.load_manifest(self.dir)
+        if self.fresh:
+            # 새로 만든 목록에 없는 예전 파일은 삭제
+            for e in manifest["files"]:
+                if e["path"] not in self.dirty:
+                    os.remove(os.path.join(self.dir, e["path"]))
+            manifest = {"files": []}
+        for name in sorted(self.dirty):
+            rows = sorted(self.files[name].values(), key=lambda r: (r["timestamp"], r["nickname"]))
+            table = history_store.rows_to_table([tuple(r[f.name] for f in SCHEMA) for r in rows], SCHEMA)
+            entry = history_store.write_table(table, name, self.dir)
+            manifest["files"] = [e for e in manifest["files"] if e["path"] != entry["path"]] + [entry]
+        history_store.save_manifest(manifest, self.dir)
+        self.dirty.clear()
+
+def update_rollups(rows, ts, root=ROLLUP_DIR):
+    """수집기에서 매 회차 호출: 이번 스냅샷을 시간/일 롤업에 반영"""
+    for resolution in RESOLUTIONS:
+        table = RollupTable(resolution, root)
+        table.add_snapshot(rows, ts)
+        table.save()
+
+def rebuild(history_dir=history_store.HISTORY_DIR, root=ROLLUP_DIR):
+    """
+    history/ 전체 스냅샷(보관 기간이 지나 archive/ 로 옮긴 원본 포함)을 시간 순서대로 다시 넣어서 롤업 재생성.
+    보관 기간이 지난 시간 롤업도 다시 생기므로 다음 retention.py 적용 때 정리됨
+    """
+    archive_dir = os.path.join(history_dir, history_store.ARCHIVE_DIR)
+    archived = history_store.read_entries(archive_dir, history_store.load_manifest(archive_dir)["files"])
+    df = history_store.concat_frames([archived, history_store.read_history(history_dir)])
+    df['nickname'] = df['nickname'].astype(str)
+    df = history_store.carry_forward(df) # 변경분만 저장된 회차를 전원 행으로 채움
+    tables = [RollupTable(resolution, root, fresh=True) for resolution in RESOLUTIONS]
+
+    snapshots = 0
+    for ts, snap in df.groupby('timestamp', sort=True):
+        rows = list(zip(snap['nickname'].astype(str), snap['world'].astype(str), snap['level'].astype(int), snap['exp'].astype(int)))
+        for table in tables:
+            table.add_snapshot(rows, ts.to_pydatetime())
+        snapshots += 1
+
+    for table in tables:
+        table.save()
+    return snapshots
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        print(f"🧮 롤업 재생성: 스냅샷 {rebuild()}개 반영 완료")
+    else:
+        print(__doc__)
@@ -0,0 +1,95 @@
+"""
+수집기 실행 계측 (단계별 소요 시간 + 엔드포인트별 응답 시간 분포)
+
+수집 1회 = history/run_metrics.jsonl 한 줄 (JSON). 대시보드의 '수집기 상태' 패널이 이 파일을 읽음.
+    {"run_at": "...", "total_sec": 12.3,
+     "stages": {"collect": 9.8, "retry": 0.4, "save_history": 0.2, ...},
+     "endpoints": {"/character/basic": {"count": 400, "ok": 398, "failed": 2, "p50": 0.12, "p95": 0.41, "p99": 0.9, ...}},
+     "counts": {"rankers": 200, "collected": 198, ...}, "items_per_sec": 20.2}
+
+랭킹/OCID/경험치 조회는 비동기 파이프라인에서 겹쳐서 진행되므로 단계 시간은 'collect' 하나로 잡고,
+어느 API가 느린지는 엔드포인트별 분포(p50/p95/p99)와 누적 응답 시간(busy_sec)으로 봄.
+"""
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import history_store
+
+RUN_METRICS_NAME = "run_metrics.jsonl"
+FILE_RUN_METRICS = os.path.join(history_store.HISTORY_DIR, RUN_METRICS_NAME)
+RUN_METRICS_KEEP = int(os.environ.get("RUN_METRICS_KEEP", 2000)) # 30분 주기 기준 약 6주
+
+def percentile(sorted_values, q):
+    """정렬된 목록의 q 분위수 (nearest-rank)"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class RunMetrics:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.run_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        self.stages = {}
+        self.latency = {} # 엔드포인트 -> 응답 시간 목록 (초)
+        self.outcomes = {} # 엔드포인트 -> {"ok": n, "failed": n}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+
+    def observe(self, endpoint, seconds, ok):
+        """HTTP 응답 1건 (재시도는 각각 1건)"""
+        self.latency.setdefault(endpoint, []).append(seconds)
+        outcome = self.outcomes.setdefault(endpoint, {"ok": 0, "failed": 0})
+        outcome["ok" if ok else "failed"] += 1
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def report(self):
+        endpoints = {}
+        for endpoint, values in sorted(self.latency.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "count": len(values), **self.outcomes[endpoint],
+                **{f"p{q}": round(percentile(values, q), 4) for q in (50, 95, 99)},
+                "max": round(values[-1], 4),
+                "busy_sec": round(sum(values), 3),
+            }
+        collect_sec = self.stages.get("collect", 0.0)
+        return {
+            "run_at": self.run_at.strftime(history_store.TS_FORMAT),
+            "total_sec": round(time.perf_counter() - self.started_at, 3),
+            "stages": {name: round(sec, 3) for name, sec in self.stages.items()},
+            "endpoints": endpoints,
+            "counts": self.counts,
+            "items_per_sec": round(self.counts.get("collected", 0) / collect_sec, 2) if collect_sec else None,
+        }
+
+    def summary(self):
+        stages = ", ".join(f"{name} {sec:.2f}s" for name, sec in self.stages.items())
+        latency = ", ".join(f"{ep} p95 {e['p95'] * 1000:.0f}ms" for ep, e in self.report()["endpoints"].items())
+        return f"단계별: {stages}" + (f" | {latency}" if latency else "")
+
+    def write(self, path=FILE_RUN_METRICS, keep=RUN_METRICS_KEEP):
+        """이번 실행 보고서를 JSONL 끝에 추가 (오래된 줄은 keep 개만 남기고 삭제)"""
+        lines = []
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        lines.append(json.dumps(self.report(), ensure_ascii=False, sort_keys=True))
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines[-keep:]) + "\n")
+        os.replace(tmp_path, path)
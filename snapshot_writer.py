@@ -0,0 +1,99 @@
+"""
+스냅샷 저장 안전장치 (실행 중단 / 겹친 실행 대비)
+
+- collector_lock(): 수집기 실행 전체를 파일 잠금으로 직렬화 (같은 머신에서 겹친 실행)
+  GitHub Actions 실행끼리는 workflow 의 concurrency 그룹으로 직렬화함
+- commit_snapshot(): 한 회차 결과를 journal.json 에 먼저 기록 -> 저장소/롤업에 적용 -> journal 삭제.
+  적용 도중 죽으면 다음 실행 시작 때 recover() 가 journal 을 다시 적용함.
+  history_store.append_snapshot 이 30분 칸 단위로 합치므로 두 번 적용돼도 결과가 같음
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError: # Windows 로컬 실행: 잠금 없이 진행
+    fcntl = None
+
+import history_store
+import rollups
+
+JOURNAL_NAME = "journal.json" # 저장소(history_dir) 안의 회차 기록 -> 다른 저장소를 쓰면 journal 도 그 안에 둠
+FILE_LOCK = os.path.join(history_store.DATA_DIR, ".collector.lock")
+LOCK_TIMEOUT_SEC = float(os.environ.get("COLLECTOR_LOCK_TIMEOUT_SEC", 900))
+
+@contextmanager
+def collector_lock(path=FILE_LOCK, timeout=LOCK_TIMEOUT_SEC):
+    """다른 수집기가 실행 중이면 끝날 때까지 기다림 (timeout 초 넘으면 TimeoutError)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"다른 수집기가 {timeout:.0f}초 넘게 실행 중입니다 ({path})")
+                time.sleep(1)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _write_journal(journal, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _apply(journal, history_dir):
+    timestamp = datetime.strptime(journal["timestamp"], history_store.TS_FORMAT)
+    entry = None
+    # 값을 저장하지 않은 나머지(추적했지만 그대로인 캐릭터)는 표시 행으로 -> 읽을 때 이 캐릭터들만 직전 값으로 채움
+    stored = {r[0] for r in journal["stored"]}
+    unchanged = [(r[0], r[1]) for r in journal["all"] if r[0] not in stored]
+    if journal["stored"] or unchanged:
+        entry = history_store.append_snapshot([tuple(r) for r in journal["stored"]], timestamp, history_dir, unchanged)
+    rollups.update_rollups([tuple(r) for r in journal["all"]], timestamp, os.path.join(history_dir, "rollup"))
+    return entry
+
+def commit_snapshot(stored_rows, all_rows, timestamp, history_dir=history_store.HISTORY_DIR, journal_path=None):
+    """
+    stored_rows: 저장소에 값을 쓸 (nickname, world, level, exp) 목록 (바뀐 값만)
+    all_rows   : 이번 회차에 추적한 전체 목록 (이어 쓴 값 포함). 롤업에 반영하고, stored_rows 에 없는 캐릭터는 표시 행으로 저장
+    반환: 저장된 스냅샷 파일의 매니페스트 항목 (추적한 캐릭터가 없으면 None)
+    journal_path: 없으면 {history_dir}/journal.json
+    """
+    journal_path = journal_path or os.path.join(history_dir, JOURNAL_NAME)
+    journal = {
+        "timestamp": timestamp.strftime(history_store.TS_FORMAT),
+        "stored": [list(r) for r in stored_rows],
+        "all": [list(r) for r in all_rows],
+    }
+    _write_journal(journal, journal_path)
+    entry = _apply(journal, history_dir)
+    os.remove(journal_path)
+    return entry
+
+def recover(history_dir=history_store.HISTORY_DIR, journal_path=None):
+    """지난 실행이 적용 도중 끊겼으면 journal 을 다시 적용 -> 복구한 회차 시각 (없으면 None)"""
+    journal_path = journal_path or os.path.join(history_dir, JOURNAL_NAME)
+    if not os.path.isfile(journal_path):
+        return None
+    try:
+        with open(journal_path, encoding='utf-8') as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        os.remove(journal_path) # 읽을 수 없는 journal 은 적용할 방법이 없으므로 버림
+        return None
+    _apply(journal, history_dir)
+    os.remove(journal_path)
+    return journal["timestamp"]
@@ -0,0 +1,171 @@
+"""
+추적 대상 레지스트리 (targets.json)
+
+코드를 고치지 않고 추적 대상을 여러 그룹(cohort)으로 나눠서 설정함.
+    {
+      "github": {"owner": "djhfkgsk", "repo": "maple-exp-tracker", "branch": "master", "workflow": "main.yml"},
+      "cohorts": [
+        {"name": "챌린저스 랭커", "worlds": ["챌린저스", "챌린저스2"], "limit": 50},
+        {"name": "관심 캐릭터", "nicknames": ["닉네임1", "닉네임2"], "every": 10},
+        {"name": "우리 길드", "guild": "길드명", "world": "챌린저스", "every": 60, "retention_days": 30}
+      ],
+      "retention": {"raw_days": 30, "hourly_days": 90}
+    }
+- worlds    : 월드별 종합 랭킹 상위 limit 명 (같은 월드를 여러 그룹이 쓰면 랭킹은 가장 큰 limit 까지 한 번만 조회)
+- nicknames : 이름으로 지정한 캐릭터 (관심 목록)
+- guild     : 길드원 전체 (/guild/id -> /guild/basic, 랭킹 기준일마다 1번)
+- every          : 그룹 수집 주기 (분). 없으면 수집기가 실행될 때마다
+- retention_days : 원본 스냅샷 보관 기간 (일). 없으면 계속 보관. 캐릭터가 여러 그룹에 있으면 가장 긴 값
+- retention      : 저장소 전체의 단계별 보관 기간 (retention.py, 없으면 기본값 / 환경변수)
+
+수집기는 실행 때마다 주기가 된 그룹들을 펼친 뒤 캐릭터 단위로 중복을 없애서 한 번씩만 조회함
+(여러 그룹에 있는 캐릭터도 /character/basic 은 1회). 그룹별 현재 구성원과 마지막 수집 시각은
+history/cohorts.json 에 기록 -> 대시보드의 그룹 필터가 읽음.
+
+targets.json 이 없으면 TARGET_WORLDS / RANKER_LIMIT_PER_WORLD 로 만든 랭킹 그룹 하나 (기존 동작).
+설정 예시는 targets.example.json (경로는 TRACKER_TARGETS 환경변수로 바꿀 수 있음)
+"""
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+import history_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILE_TARGETS = os.environ.get("TRACKER_TARGETS", os.path.join(BASE_DIR, "targets.json"))
+COHORTS_NAME = "cohorts.json" # history/ 안의 그룹별 구성원 / 마지막 수집 시각
+DEFAULT_COHORT = "랭킹"
+SCHEDULE_SLACK = timedelta(minutes=5) # cron 실행 시각이 조금씩 밀려도 주기를 놓치지 않도록
+
+DEFAULT_GITHUB = {"owner": "djhfkgsk", "repo": "maple-exp-tracker", "branch": "master", "workflow": "main.yml"}
+
+# ==========================================
+# 1. 그룹 / 레지스트리
+# ==========================================
+class Cohort:
+    FIELDS = ("name", "worlds", "limit", "nicknames", "guild", "world", "every", "retention_days")
+
+    def __init__(self, name, worlds=(), limit=None, nicknames=(), guild=None, world=None, every=None, retention_days=None):
+        kinds = [kind for kind, value in (("worlds", worlds), ("nicknames", nicknames), ("guild", guild)) if value]
+        if len(kinds) != 1:
+            raise ValueError(f"그룹 '{name}': worlds / nicknames / guild 중 하나만 지정하세요")
+        if guild and not world:
+            raise ValueError(f"그룹 '{name}': guild 는 world 도 지정해야 합니다")
+        if every is not None and every <= 0:
+            raise ValueError(f"그룹 '{name}': every 는 1분 이상이어야 합니다")
+        self.name = name
+        self.kind = kinds[0]
+        self.worlds = list(worlds)
+        self.limit = limit
+        self.nicknames = list(dict.fromkeys(nicknames)) # 순서 유지 중복 제거
+        self.guild = guild
+        self.world = world
+        self.every = every
+        self.retention_days = retention_days
+
+    @classmethod
+    def from_dict(cls, config):
+        unknown = set(config) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"그룹 '{config.get('name')}': 알 수 없는 항목 {sorted(unknown)}")
+        return cls(**config)
+
+    def is_due(self, collected_at, now):
+        """collected_at: 이 그룹을 마지막으로 수집한 시각 (UTC, 없으면 None)"""
+        if self.every is None or collected_at is None:
+            return True
+        return now - collected_at >= timedelta(minutes=self.every) - SCHEDULE_SLACK
+
+    def __repr__(self):
+        return f"Cohort({self.name!r}, {self.kind})"
+
+class TargetRegistry:
+    def __init__(self, cohorts, github=None, retention=None):
+        names = [c.name for c in cohorts]
+        if len(set(names)) != len(names):
+            raise ValueError(f"그룹 이름이 겹칩니다: {names}")
+        self.cohorts = list(cohorts)
+        self.github = {**DEFAULT_GITHUB, **(github or {})}
+        self.retention = dict(retention or {}) # 검증은 retention.RetentionPolicy.from_registry
+
+    def due(self, now, state):
+        """이번 실행에 수집할 그룹 (state: load_cohort_state 결과)"""
+        def collected_at(cohort):
+            value = state.get(cohort.name, {}).get("collected_at")
+            return datetime.strptime(value, history_store.TS_FORMAT) if value else None
+        return [c for c in self.cohorts if c.is_due(collected_at(c), now)]
+
+    def tick_minutes(self):
+        """그룹 주기들의 최대공약수 (데몬 기본 실행 간격). 주기가 지정된 그룹이 없으면 None"""
+        intervals = [c.every for c in self.cohorts if c.every]
+        return math.gcd(*intervals) if intervals else None
+
+    def retention_days(self, state):
+        """nickname -> 보관 기간 (일). 여러 그룹에 있으면 가장 긴 값, 기간 없는 그룹에 있으면 목록에서 빠짐 (계속 보관)"""
+        keep_forever, days = set(), {}
+        for cohort in self.cohorts:
+            members = state.get(cohort.name, {}).get("members", [])
+            if cohort.retention_days is None:
+                keep_forever.update(members)
+                continue
+            for nickname in members:
+                days[nickname] = max(days.get(nickname, 0), cohort.retention_days)
+        return {n: d for n, d in days.items() if n not in keep_forever}
+
+def load_registry(path=FILE_TARGETS, worlds=None, limit=None):
+    """targets.json -> TargetRegistry. 파일이 없으면 worlds/limit 랭킹 그룹 하나"""
+    if not os.path.isfile(path):
+        return TargetRegistry([Cohort(DEFAULT_COHORT, worlds=worlds or [], limit=limit)] if worlds else [])
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return TargetRegistry([Cohort.from_dict(c) for c in config.get("cohorts", [])], config.get("github"), config.get("retention"))
+
+def github_settings(path=FILE_TARGETS):
+    """대시보드의 수집 요청 버튼 / 저장소 주소용 (owner, repo, branch, workflow). 환경변수가 있으면 우선"""
+    github = dict(DEFAULT_GITHUB)
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as f:
+            github.update(json.load(f).get("github") or {})
+    for key in ("owner", "repo", "branch"): # GITHUB_WORKFLOW 는 Actions 가 쓰는 이름이라 제외
+        github[key] = os.environ.get(f"GITHUB_{key.upper()}", github[key])
+    return github
+
+# ==========================================
+# 2. 그룹 상태 (history/cohorts.json)
+# ==========================================
+def load_cohort_state(history_dir=history_store.HISTORY_DIR):
+    """name -> {kind, members, collected_at, every, retention_days}"""
+    path = os.path.join(history_dir, COHORTS_NAME)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get("cohorts", {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 그룹 상태 로드 실패, 새로 만듭니다. ({e})")
+        return {}
+
+def update_cohort_state(state, cohort, members, now):
+    state[cohort.name] = {
+        "kind": cohort.kind, "members": list(members), "collected_at": now.strftime(history_store.TS_FORMAT),
+        "every": cohort.every, "retention_days": cohort.retention_days,
+    }
+
+def save_cohort_state(state, registry, history_dir=history_store.HISTORY_DIR):
+    """설정에서 빠진 그룹은 지우고 저장"""
+    names = {c.name for c in registry.cohorts}
+    os.makedirs(history_dir, exist_ok=True)
+    path = os.path.join(history_dir, COHORTS_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"cohorts": {n: s for n, s in state.items() if n in names}}, f, ensure_ascii=False, indent=0)
+    os.replace(tmp_path, path)
+
+def read_cohorts(base=history_store.HISTORY_DIR):
+    """대시보드 / 조회 API 용: 그룹 이름 -> 현재 구성원 목록 (로컬 경로 또는 URL, 없으면 빈 dict)"""
+    try:
+        state = json.loads(history_store.read_bytes(base, COHORTS_NAME)).get("cohorts", {})
+    except (OSError, ValueError):
+        return {}
+    return {name: entry.get("members", []) for name, entry in state.items()}